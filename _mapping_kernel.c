@@ -0,0 +1,288 @@
+/*
+ * Optional compiled kernel for the per-tick math (see mapping_kernel.py for how to build and use it).
+ * Every function returns exactly what its Python original does, bit for bit:
+ *   deadzone_stick / deadzone_trigger / linearity / squarify - MappingEngine.apply_* and squarify
+ *   winding_step  - mapping_scripts.WindingStickLogic.step (reads and updates the logic object's attributes)
+ *   map_buttons   - the button loop of MappingEngine.update_vjoy
+ */
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <math.h>
+
+#define WINDING_SUBSTEP 0.001
+#define WINDING_MAX_STEPS 250
+
+static const double PI = 3.141592653589793; /* math.pi */
+
+static double linearity(double norm_val, double lin)
+{
+    double curved;
+    if (lin == 0) return norm_val;
+    if (lin > 0) curved = sin(norm_val * (PI / 2));
+    else curved = 1.0 - cos(norm_val * (PI / 2));
+    double strength = fabs(lin) / 100.0;
+    return (norm_val * (1.0 - strength)) + (curved * strength);
+}
+
+static PyObject *zero_division(void)
+{
+    PyErr_SetString(PyExc_ZeroDivisionError, "float division by zero");
+    return NULL;
+}
+
+static int parse_doubles(PyObject *const *args, Py_ssize_t nargs, Py_ssize_t min, Py_ssize_t max, double *out, const char *name)
+{
+    if (nargs < min || nargs > max) {
+        PyErr_Format(PyExc_TypeError, "%s() takes %zd to %zd arguments (%zd given)", name, min, max, nargs);
+        return -1;
+    }
+    for (Py_ssize_t i = 0; i < nargs; i++) {
+        out[i] = PyFloat_AsDouble(args[i]);
+        if (out[i] == -1.0 && PyErr_Occurred()) return -1;
+    }
+    return 0;
+}
+
+static PyObject *k_linearity(PyObject *self, PyObject *const *args, Py_ssize_t nargs)
+{
+    double a[2];
+    if (parse_doubles(args, nargs, 2, 2, a, "linearity")) return NULL;
+    if (a[1] == 0) { Py_INCREF(args[0]); return args[0]; }
+    return PyFloat_FromDouble(linearity(a[0], a[1]));
+}
+
+/* deadzone_stick(value, dz_in, dz_out, anti_dz, linearity, invert=False) */
+static PyObject *k_deadzone_stick(PyObject *self, PyObject *const *args, Py_ssize_t nargs)
+{
+    double a[5];
+    if (parse_doubles(args, nargs < 5 ? nargs : 5, 5, 5, a, "deadzone_stick")) return NULL;
+    if (nargs > 6) return PyErr_Format(PyExc_TypeError, "deadzone_stick() takes 5 to 6 arguments (%zd given)", nargs);
+    int invert = 0;
+    if (nargs == 6 && (invert = PyObject_IsTrue(args[5])) < 0) return NULL;
+    double value = a[0], dz_in = a[1], dz_out = a[2], anti_dz = a[3];
+    double sign = value >= 0 ? 1.0 : -1.0;
+    double val_abs = fabs(value);
+    if (val_abs < dz_in) return PyFloat_FromDouble(0.0);
+    if (val_abs > (1.0 - dz_out)) val_abs = 1.0;
+    else {
+        double span = (1.0 - dz_out) - dz_in;
+        if (span == 0) return zero_division();
+        val_abs = (val_abs - dz_in) / span;
+    }
+    val_abs = linearity(val_abs, a[4]);
+    if (val_abs > 0) val_abs = anti_dz + (val_abs * (1.0 - anti_dz));
+    double result = val_abs * sign;
+    return PyFloat_FromDouble(invert ? -result : result);
+}
+
+/* deadzone_trigger(value, dz_in, dz_out, out_start, out_end, linearity) */
+static PyObject *k_deadzone_trigger(PyObject *self, PyObject *const *args, Py_ssize_t nargs)
+{
+    double a[6];
+    if (parse_doubles(args, nargs, 6, 6, a, "deadzone_trigger")) return NULL;
+    double value = a[0], dz_in = a[1], dz_out = a[2], out_start = a[3], out_end = a[4], norm_val;
+    if (value < dz_in) { Py_INCREF(args[3]); return args[3]; }
+    if (value > (1.0 - dz_out)) norm_val = 1.0;
+    else {
+        double span = (1.0 - dz_out) - dz_in;
+        if (span == 0) return zero_division();
+        norm_val = (value - dz_in) / span;
+    }
+    norm_val = linearity(norm_val, a[5]);
+    return PyFloat_FromDouble(out_start + (norm_val * (out_end - out_start)));
+}
+
+static double clamp_unit(double v) /* max(-1.0, min(1.0, v)), compared in the same order (NaN -> 1.0) */
+{
+    double hi = v < 1.0 ? v : 1.0;
+    return hi > -1.0 ? hi : -1.0;
+}
+
+/* squarify(raw_x, raw_y) -> (x, y) */
+static PyObject *k_squarify(PyObject *self, PyObject *const *args, Py_ssize_t nargs)
+{
+    double a[2];
+    if (parse_doubles(args, nargs, 2, 2, a, "squarify")) return NULL;
+    double nx = a[0] / 32768.0, ny = a[1] / 32768.0;
+    double mag = sqrt(nx * nx + ny * ny);
+    if (mag < 0.01) return Py_BuildValue("(dd)", nx, ny);
+    double ax = fabs(nx), ay = fabs(ny);
+    double max_c = ay > ax ? ay : ax;
+    if (max_c < 0.001) return Py_BuildValue("(dd)", nx, ny);
+    double scale = mag / max_c;
+    return Py_BuildValue("(dd)", clamp_unit(nx * scale), clamp_unit(ny * scale));
+}
+
+/* --- Winding --- */
+static PyObject *s_current, *s_previous, *s_previous_angle, *s_magnitude, *s_accumulator, *s_w_range, *s_buffer, *s_unwind_rate, *s_settled;
+
+static int get_double(PyObject *obj, PyObject *name, double *out)
+{
+    PyObject *value = PyObject_GetAttr(obj, name);
+    if (value == NULL) return -1;
+    *out = PyFloat_AsDouble(value);
+    Py_DECREF(value);
+    return (*out == -1.0 && PyErr_Occurred()) ? -1 : 0;
+}
+
+static int set_double(PyObject *obj, PyObject *name, double v)
+{
+    PyObject *value = PyFloat_FromDouble(v);
+    if (value == NULL) return -1;
+    int r = PyObject_SetAttr(obj, name, value);
+    Py_DECREF(value);
+    return r;
+}
+
+static double py_mod(double a, double b) /* Python's float %: the result takes the sign of b */
+{
+    double mod = fmod(a, b);
+    if (mod) { if ((b < 0) != (mod < 0)) mod += b; }
+    else mod = copysign(0.0, b);
+    return mod;
+}
+
+/* winding_step(logic, stick_x, stick_y, dt) -> output (-1.0..1.0) */
+static PyObject *k_winding_step(PyObject *self, PyObject *const *args, Py_ssize_t nargs)
+{
+    if (nargs != 4) return PyErr_Format(PyExc_TypeError, "winding_step() takes 4 arguments (%zd given)", nargs);
+    PyObject *logic = args[0];
+    double a[3];
+    if (parse_doubles(args + 1, 3, 3, 3, a, "winding_step")) return NULL;
+    double stick_x = a[0], stick_y = a[1], dt = a[2];
+    double angle, previous, magnitude, acc, w_range, buffer, unwind_rate, prev_stick_angle = 0.0;
+    if (get_double(logic, s_current, &angle) || get_double(logic, s_previous, &previous) || get_double(logic, s_magnitude, &magnitude) ||
+        get_double(logic, s_accumulator, &acc) || get_double(logic, s_w_range, &w_range) || get_double(logic, s_buffer, &buffer) ||
+        get_double(logic, s_unwind_rate, &unwind_rate)) return NULL;
+    PyObject *prev_obj = PyObject_GetAttr(logic, s_previous_angle);
+    if (prev_obj == NULL) return NULL;
+    int has_prev = prev_obj != Py_None;
+    if (has_prev) prev_stick_angle = PyFloat_AsDouble(prev_obj);
+    Py_DECREF(prev_obj);
+    if (has_prev && prev_stick_angle == -1.0 && PyErr_Occurred()) return NULL;
+
+    /* Unwind over the time since the last call, with the stick where it was during that time */
+    acc = acc + dt;
+    long steps = (long)(acc / WINDING_SUBSTEP + 1e-6);
+    if (steps) {
+        double rest = acc - steps * WINDING_SUBSTEP;
+        acc = rest > 0.0 ? rest : 0.0;
+        double unwind_amt = magnitude < 0.95 ? unwind_rate * (1.0 - magnitude) * WINDING_SUBSTEP : 0.0;
+        if (unwind_amt) {
+            long n = steps < WINDING_MAX_STEPS ? steps : WINDING_MAX_STEPS;
+            for (long i = 0; i < n; i++) {
+                previous = angle;
+                if (angle == 0.0) break;
+                if (fabs(unwind_amt) >= fabs(angle)) angle = 0.0;
+                else angle -= unwind_amt * (angle > 0 ? 1.0 : -1.0);
+            }
+        }
+        else previous = angle;
+    }
+    acc = acc > 1e-9 ? acc : 0.0;
+
+    /* Rotation since the last stick position */
+    double sx = stick_x / 32768.0, sy = stick_y / 32768.0;
+    double mag = sqrt(pow(sx, 2.0) + pow(sy, 2.0));
+    double stick_angle = 0.0;
+    if (mag > 0.1) {
+        stick_angle = atan2(-sx, sy) * 180.0 / PI;
+        if (has_prev) {
+            double rotation = (py_mod(stick_angle - prev_stick_angle + 180, 360) - 180) * mag;
+            angle += rotation;
+            previous += rotation;
+        }
+    }
+    double max_angle = (w_range / 2.0) + buffer;
+    angle = max_angle < angle ? max_angle : angle;
+    angle = -max_angle > angle ? -max_angle : angle;
+    previous = max_angle < previous ? max_angle : previous;
+    previous = -max_angle > previous ? -max_angle : previous;
+
+    int settled = angle == previous && (angle == 0.0 || mag >= 0.95 || unwind_rate == 0.0);
+    if (set_double(logic, s_current, angle) || set_double(logic, s_previous, previous) || set_double(logic, s_magnitude, mag) ||
+        set_double(logic, s_accumulator, acc)) return NULL;
+    if (mag > 0.1) { if (set_double(logic, s_previous_angle, stick_angle)) return NULL; }
+    else if (PyObject_SetAttr(logic, s_previous_angle, Py_None)) return NULL;
+    if (PyObject_SetAttr(logic, s_settled, settled ? Py_True : Py_False)) return NULL;
+    if (w_range == 0) return zero_division();
+    double output = (previous + (angle - previous) * (acc / WINDING_SUBSTEP)) * 2.0 / w_range;
+    return PyFloat_FromDouble(clamp_unit(output));
+}
+
+/* --- Buttons --- */
+static PyObject *small_ints[2];
+
+/* map_buttons(buttons, button_map, shadow, set_button) -> (issued, pressed_lo, pressed_hi)
+   button_map: [(xinput mask, vJoy button id, bit_lo, bit_hi), ...]; shadow: {vJoy button id: last state written} */
+static PyObject *k_map_buttons(PyObject *self, PyObject *const *args, Py_ssize_t nargs)
+{
+    if (nargs != 4) return PyErr_Format(PyExc_TypeError, "map_buttons() takes 4 arguments (%zd given)", nargs);
+    long buttons = PyLong_AsLong(args[0]);
+    if (buttons == -1 && PyErr_Occurred()) return NULL;
+    PyObject *button_map = PySequence_Fast(args[1], "button_map must be a sequence");
+    if (button_map == NULL) return NULL;
+    PyObject *shadow = args[2], *set_button = args[3];
+    if (!PyDict_Check(shadow)) { Py_DECREF(button_map); PyErr_SetString(PyExc_TypeError, "shadow must be a dict"); return NULL; }
+    Py_ssize_t issued = 0, count = PySequence_Fast_GET_SIZE(button_map);
+    unsigned long long pressed_lo = 0, pressed_hi = 0;
+    PyObject **items = PySequence_Fast_ITEMS(button_map);
+    for (Py_ssize_t i = 0; i < count; i++) {
+        PyObject *entry = items[i];
+        if (!PyTuple_Check(entry) || PyTuple_GET_SIZE(entry) != 4) { PyErr_SetString(PyExc_TypeError, "button_map entries are (mask, id, bit_lo, bit_hi)"); goto error; }
+        long mask = PyLong_AsLong(PyTuple_GET_ITEM(entry, 0));
+        if (mask == -1 && PyErr_Occurred()) goto error;
+        PyObject *vjoy_btn_id = PyTuple_GET_ITEM(entry, 1);
+        int state = (buttons & mask) != 0;
+        PyObject *last = PyDict_GetItemWithError(shadow, vjoy_btn_id);
+        if (last == NULL && PyErr_Occurred()) goto error;
+        int same = 0;
+        if (last != NULL && (same = PyObject_RichCompareBool(last, small_ints[state], Py_EQ)) < 0) goto error;
+        if (!same) {
+            PyObject *r = PyObject_CallFunctionObjArgs(set_button, vjoy_btn_id, small_ints[state], NULL);
+            if (r == NULL) goto error;
+            Py_DECREF(r);
+            if (PyDict_SetItem(shadow, vjoy_btn_id, small_ints[state])) goto error;
+            issued++;
+        }
+        if (state) {
+            unsigned long long lo = PyLong_AsUnsignedLongLong(PyTuple_GET_ITEM(entry, 2));
+            unsigned long long hi = PyLong_AsUnsignedLongLong(PyTuple_GET_ITEM(entry, 3));
+            if (PyErr_Occurred()) goto error;
+            pressed_lo |= lo;
+            pressed_hi |= hi;
+        }
+    }
+    Py_DECREF(button_map);
+    return Py_BuildValue("(nKK)", issued, pressed_lo, pressed_hi);
+error:
+    Py_DECREF(button_map);
+    return NULL;
+}
+
+static PyMethodDef kernel_methods[] = {
+    {"linearity", (PyCFunction)(void (*)(void))k_linearity, METH_FASTCALL, "linearity(norm_val, linearity)"},
+    {"deadzone_stick", (PyCFunction)(void (*)(void))k_deadzone_stick, METH_FASTCALL, "deadzone_stick(value, dz_in, dz_out, anti_dz, linearity, invert=False)"},
+    {"deadzone_trigger", (PyCFunction)(void (*)(void))k_deadzone_trigger, METH_FASTCALL, "deadzone_trigger(value, dz_in, dz_out, out_start, out_end, linearity)"},
+    {"squarify", (PyCFunction)(void (*)(void))k_squarify, METH_FASTCALL, "squarify(raw_x, raw_y) -> (x, y)"},
+    {"winding_step", (PyCFunction)(void (*)(void))k_winding_step, METH_FASTCALL, "winding_step(logic, stick_x, stick_y, dt) -> output"},
+    {"map_buttons", (PyCFunction)(void (*)(void))k_map_buttons, METH_FASTCALL, "map_buttons(buttons, button_map, shadow, set_button) -> (issued, pressed_lo, pressed_hi)"},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef kernel_module = {PyModuleDef_HEAD_INIT, "_mapping_kernel", "Compiled per-tick mapping math.", -1, kernel_methods};
+
+PyMODINIT_FUNC PyInit__mapping_kernel(void)
+{
+    PyObject **names[] = {&s_current, &s_previous, &s_previous_angle, &s_magnitude, &s_accumulator, &s_w_range, &s_buffer, &s_unwind_rate, &s_settled};
+    const char *strings[] = {"current_winding_angle", "previous_winding_angle", "previous_angle", "magnitude", "accumulator", "w_range", "buffer", "unwind_rate", "settled"};
+    for (int i = 0; i < 9; i++) if ((*names[i] = PyUnicode_InternFromString(strings[i])) == NULL) return NULL;
+    if ((small_ints[0] = PyLong_FromLong(0)) == NULL || (small_ints[1] = PyLong_FromLong(1)) == NULL) return NULL;
+    PyObject *m = PyModule_Create(&kernel_module);
+    if (m == NULL) return NULL;
+    if (PyModule_AddObject(m, "WINDING_SUBSTEP", PyFloat_FromDouble(WINDING_SUBSTEP)) || PyModule_AddIntConstant(m, "WINDING_MAX_STEPS", WINDING_MAX_STEPS)) {
+        Py_DECREF(m);
+        return NULL;
+    }
+    return m;
+}
@@ -1,5 +1,7 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+from tkinter import ttk, messagebox, filedialog, simpledialog
+import copy
+import multiprocessing
 import threading
 import time
 import sys
@@ -9,7 +11,13 @@ import winreg
 import ctypes 
 
 from xinput_handler import XInputHandler
-from mapping_engine import MappingEngine
+from mapping_engine import MappingEngine, vjoy_to_float, DEFAULT_PROFILE, PROFILE_DIR, CONFIG_CHECK_INTERVAL
+from telemetry import AXIS_ORDER, AXIS_INDEX, SLOT_AXES, SLOT_BTN_LO, SLOT_BTN_HI, SLOT_T, MAX_UPDATE_RATE, HISTORY_SECONDS, buttons_from_masks
+from scheduler import SCHEDULER_MODES
+from axis_filters import FILTERS
+from device_watcher import create_device_watcher
+from loop_process import LoopClient
+from input_trace import new_trace_path
 
 # Lists
 VJOY_BUTTONS = ["None"] + [str(i) for i in range(1, 129)]
@@ -24,10 +32,11 @@ def is_admin():
 
 # --- INPUT VIEWER ---
 class InputViewerWindow(tk.Toplevel):
+    GRAPH_SECONDS = HISTORY_SECONDS # All of it fits in the telemetry ring, even at MAX_UPDATE_RATE
     def __init__(self, parent, app):
         super().__init__(parent)
         self.title("vJoy Input Viewer")
-        self.geometry("300x450")
+        self.geometry("300x800")
         self.app = app
         self.mapper = app.mapper
         self.lbl_status = tk.Label(self, text="Status: ???", font=("Arial", 12, "bold"))
@@ -35,7 +44,7 @@ class InputViewerWindow(tk.Toplevel):
         frame_axes = tk.LabelFrame(self, text="Axes Output (-1.0 to 1.0)", padx=10, pady=5)
         frame_axes.pack(fill="x", padx=10)
         self.axis_labels = {}
-        self.axis_names = ["X", "Y", "Z", "RX", "RY", "RZ", "SL0", "SL1"]
+        self.axis_names = AXIS_ORDER
         for ax in self.axis_names:
             row = tk.Frame(frame_axes); row.pack(fill="x", pady=1)
             tk.Label(row, text=f"{ax}:", width=5, anchor="w", font=("Consolas", 10)).pack(side="left")
@@ -45,21 +54,56 @@ class InputViewerWindow(tk.Toplevel):
         frame_btns.pack(fill="both", expand=True, padx=10, pady=10)
         self.lbl_btns = tk.Label(frame_btns, text="None", wraplength=250, justify="center", font=("Consolas", 10))
         self.lbl_btns.pack()
+        frame_graph = tk.LabelFrame(self, text=f"History (last {self.GRAPH_SECONDS:.0f}s)", padx=5, pady=5)
+        frame_graph.pack(fill="x", padx=10, pady=(0, 10))
+        self.var_graph_axis = tk.StringVar(value="X")
+        ttk.Combobox(frame_graph, textvariable=self.var_graph_axis, values=self.axis_names, state="readonly", width=6).pack(anchor="w")
+        self.graph = tk.Canvas(frame_graph, width=260, height=100, bg="white", highlightthickness=0)
+        self.graph.pack(pady=5)
+        frame_lat = tk.LabelFrame(self, text="Stage Latency p50 / p99 / max (us)", padx=5, pady=5)
+        frame_lat.pack(fill="x", padx=10, pady=(0, 10))
+        self.lbl_latency = tk.Label(frame_lat, text="Off (enable in Program Settings)", justify="left", font=("Consolas", 8))
+        self.lbl_latency.pack(anchor="w")
         self.update_loop()
     def update_loop(self):
         if not self.winfo_exists(): return
-        if self.app.is_running:
+        sample = self.app.loop.telemetry.latest() if self.app.is_running else None
+        if sample:
             self.lbl_status.config(text="Status: MAPPING RUNNING", fg="green")
-            data = self.mapper.latest_output
-            current_axes = data.get("axes", {})
-            for ax in self.axis_names: self.axis_labels[ax].config(text=f"{current_axes.get(ax, 0.0): .3f}")
-            btns = data.get("buttons", [])
+            for i, ax in enumerate(self.axis_names):
+                v = sample[SLOT_AXES + i]
+                self.axis_labels[ax].config(text=f"{(vjoy_to_float(v) if v else 0.0): .3f}")
+            btns = buttons_from_masks(sample[SLOT_BTN_LO], sample[SLOT_BTN_HI])
             self.lbl_btns.config(text=(", ".join(map(str, btns)) if btns else "None"))
+            self.draw_graph(sample[SLOT_T])
+            self.show_latency()
+        elif self.app.is_running:
+            self.lbl_status.config(text="Status: MAPPING RUNNING", fg="green")
         else:
             self.lbl_status.config(text="Status: STOPPED (No Data)", fg="red")
             for ax in self.axis_names: self.axis_labels[ax].config(text="0.000")
             self.lbl_btns.config(text="-")
-        self.after(50, self.update_loop) 
+            self.graph.delete("all")
+        self.after(50, self.update_loop)
+    def show_latency(self):
+        summary = self.app.loop.stats().get("latency")
+        if summary is None: return
+        self.lbl_latency.config(text="\n".join(f"{name:<15}{s['p50_us']:>8.1f}{s['p99_us']:>8.1f}{s['max_us']:>9.1f}" for name, s in summary.items()) or "Waiting for input...")
+    def draw_graph(self, now_ns):
+        g = self.graph
+        g.delete("all")
+        w, h = int(g["width"]), int(g["height"])
+        g.create_line(0, h / 2, w, h / 2, fill="#ddd")
+        points = self.app.loop.telemetry.history(AXIS_INDEX[self.var_graph_axis.get()], self.GRAPH_SECONDS, now_ns)
+        if not points: return
+        span = self.GRAPH_SECONDS * 1e9
+        # Downsample to at most one point per pixel column
+        step = max(1, len(points) // w)
+        coords = []
+        for t, v in points[::step]:
+            coords += [w - (now_ns - t) / span * w, h / 2 - vjoy_to_float(v) * (h / 2 - 2)]
+        coords += [w, coords[-1]] # Hold the last value up to "now"
+        g.create_line(*coords, fill="blue")
 
 # --- ERROR & WARNING WINDOWS ---
 class VJoyMissingWindow(tk.Toplevel):
@@ -129,7 +173,7 @@ class HidHideConfigWindow(tk.Toplevel):
             "1. UNPLUG your controller from the computer.\n"
             "2. Click 'Start Detection' below.\n"
             "3. You have 10 seconds to PLUG IT BACK IN.\n"
-            "4. The tool will automatically find the device instance."
+            "4. Detection finishes as soon as the device appears."
         )
         tk.Label(instr_frame, text=instr_text, justify="left", font=("Arial", 9)).pack(anchor="w")
 
@@ -156,12 +200,20 @@ class HidHideConfigWindow(tk.Toplevel):
     def clear_list(self): self.listbox.delete(0, "end"); self.mapper.config["hidden_devices"] = []
     def start_detection_thread(self): self.btn_detect.config(state="disabled"); threading.Thread(target=self.detect_logic, daemon=True).start()
     def detect_logic(self):
-        self.lbl_status.config(text="Scanning current...", fg="blue")
-        before = self.hidhide.get_connected_devices_set()
-        for i in range(10, 0, -1): self.lbl_status.config(text=f"PLUG IN CONTROLLER: {i}s", fg="red"); time.sleep(1)
-        self.lbl_status.config(text="Scanning new...", fg="blue")
-        after = self.hidhide.get_connected_devices_set()
-        new = after - before
+        try: watcher = create_device_watcher()
+        except RuntimeError as e: print(f"Device watcher unavailable ({e}), falling back to a full scan."); new = self.detect_by_snapshot()
+        else:
+            # Plug events stream in, so this ends as soon as the controller appears
+            self.lbl_status.config(text="Starting device watch...", fg="blue")
+            watcher.start()
+            new = set()
+            for i in range(10, 0, -1):
+                if watcher.error is not None: break
+                self.lbl_status.config(text=f"PLUG IN CONTROLLER: {i}s", fg="red")
+                new = watcher.wait_for_added(1.0)
+                if new: break
+            watcher.stop()
+            if watcher.error is not None and not new: print("Device watch failed, falling back to a full scan."); new = self.detect_by_snapshot()
         if new:
             self.lbl_status.config(text=f"Found {len(new)} devices.", fg="green")
             cur = self.mapper.config.get("hidden_devices", [])
@@ -170,13 +222,19 @@ class HidHideConfigWindow(tk.Toplevel):
             self.mapper.config["hidden_devices"] = cur
         else: self.lbl_status.config(text="No new devices.", fg="orange")
         self.btn_detect.config(state="normal")
+    def detect_by_snapshot(self):
+        self.lbl_status.config(text="Scanning current...", fg="blue")
+        before = self.hidhide.get_connected_devices_set()
+        for i in range(10, 0, -1): self.lbl_status.config(text=f"PLUG IN CONTROLLER: {i}s", fg="red"); time.sleep(1)
+        self.lbl_status.config(text="Scanning new...", fg="blue")
+        return self.hidhide.get_connected_devices_set() - before
     def save_and_close(self): self.mapper.save_config(); self.destroy()
 
 class AxisSettingsWindow(tk.Toplevel):
     def __init__(self, parent, title, axis_key, axis_data, is_trigger=False, is_stick=False):
         super().__init__(parent)
         self.title(f"Settings: {title}")
-        self.geometry("400x500")
+        self.geometry("400x740")
         self.axis_data = axis_data
         self.create_slider("Input Inner Deadzone (0-0.5)", "dz_in", 0.0, 0.5)
         self.create_slider("Input Outer Deadzone (0-0.5)", "dz_out", 0.0, 0.5)
@@ -189,31 +247,76 @@ class AxisSettingsWindow(tk.Toplevel):
         if is_stick:
             var_inv = tk.BooleanVar(value=self.axis_data.get("inv", False))
             tk.Checkbutton(self, text="Invert Output", variable=var_inv, command=lambda: self.axis_data.update({"inv": var_inv.get()})).pack(pady=10)
+        frame_filter = tk.Frame(self); frame_filter.pack(fill="x", padx=20, pady=5)
+        tk.Label(frame_filter, text="Smoothing Filter:", width=15, anchor="w").pack(side="left")
+        var_filter = tk.StringVar(value=self.axis_data.get("filter", "none"))
+        cb = ttk.Combobox(frame_filter, textvariable=var_filter, values=FILTERS, state="readonly"); cb.pack(side="left", fill="x", expand=True)
+        cb.bind("<<ComboboxSelected>>", lambda e: self.axis_data.update({"filter": var_filter.get()}))
+        self.create_slider("Filter Cutoff (Hz, ema / one_euro)", "filter_cutoff", 0.5, 30.0, resolution=0.5, default=5.0)
+        self.create_slider("Filter Speed Response (one_euro beta)", "filter_beta", 0.0, 10.0, resolution=0.1, default=1.0)
+        self.create_slider("Filter Window (samples, median)", "filter_size", 3, 9, resolution=2, default=5)
         tk.Button(self, text="Close", command=self.destroy).pack(pady=20)
-    def create_slider(self, label_text, key, min_val, max_val, resolution=0.01):
+    def create_slider(self, label_text, key, min_val, max_val, resolution=0.01, default=0):
         frame = tk.Frame(self)
         frame.pack(fill="x", padx=20, pady=5)
         tk.Label(frame, text=label_text).pack(anchor="w")
-        var = tk.DoubleVar(value=self.axis_data.get(key, 0))
+        var = tk.DoubleVar(value=self.axis_data.get(key, default))
         tk.Scale(frame, from_=min_val, to=max_val, orient="horizontal", variable=var, resolution=resolution, command=lambda v: self.axis_data.update({key: float(v)})).pack(fill="x")
 
 class ProgramSettingsWindow(tk.Toplevel):
-    def __init__(self, parent, config_ref):
+    def __init__(self, parent, config_ref, app=None):
         super().__init__(parent)
         self.title("Program Settings")
-        self.geometry("400x250")
+        self.geometry("400x590")
         self.config_ref = config_ref
+        self.app = app
         tk.Label(self, text="General Options", font=("Arial", 12, "bold")).pack(pady=10)
         frame_rate = tk.Frame(self)
         frame_rate.pack(fill="x", padx=20, pady=10)
         tk.Label(frame_rate, text="Update Rate (Hz)").pack(anchor="w")
         current_rate = self.config_ref["global_settings"].get("update_rate", 1000)
         self.var_rate = tk.IntVar(value=current_rate)
-        tk.Scale(frame_rate, from_=60, to=2000, orient="horizontal", variable=self.var_rate, resolution=10, command=self.update_rate).pack(fill="x")
+        tk.Scale(frame_rate, from_=60, to=MAX_UPDATE_RATE, orient="horizontal", variable=self.var_rate, resolution=10, command=self.update_rate).pack(fill="x")
         self.lbl_val = tk.Label(frame_rate, text=f"{current_rate} Hz")
         self.lbl_val.pack(anchor="e")
+        var_lut = tk.BooleanVar(value=self.config_ref["global_settings"].get("use_lut", False))
+        tk.Checkbutton(self, text="Precomputed Response Curves (LUT, lower CPU)", variable=var_lut, command=lambda: self.config_ref["global_settings"].update({"use_lut": var_lut.get()})).pack(anchor="w", padx=20)
+        var_batched = tk.BooleanVar(value=self.config_ref["global_settings"].get("output_mode", "per_call") == "batched")
+        tk.Checkbutton(self, text="Batched vJoy Output (one driver call per tick)", variable=var_batched, command=lambda: self.config_ref["global_settings"].update({"output_mode": "batched" if var_batched.get() else "per_call"})).pack(anchor="w", padx=20)
+        var_adaptive = tk.BooleanVar(value=self.config_ref["global_settings"].get("adaptive_polling", False))
+        tk.Checkbutton(self, text="Adaptive Polling (slow down while the pad is idle)", variable=var_adaptive, command=lambda: self.config_ref["global_settings"].update({"adaptive_polling": var_adaptive.get()})).pack(anchor="w", padx=20)
+        var_latency = tk.BooleanVar(value=self.config_ref["global_settings"].get("instrument_latency", False))
+        tk.Checkbutton(self, text="Measure Stage Latency (shown in the Input Viewer)", variable=var_latency, command=lambda: self.config_ref["global_settings"].update({"instrument_latency": var_latency.get()})).pack(anchor="w", padx=20)
+        var_cache = tk.BooleanVar(value=self.config_ref["global_settings"].get("profile_cache", False))
+        tk.Checkbutton(self, text="Cache Compiled Profile (faster startup)", variable=var_cache, command=lambda: self.config_ref["global_settings"].update({"profile_cache": var_cache.get()})).pack(anchor="w", padx=20)
+        var_priority = tk.BooleanVar(value=self.config_ref["global_settings"].get("high_priority", False))
+        tk.Checkbutton(self, text="High Priority Mapping Process (applied on Start)", variable=var_priority, command=lambda: self.config_ref["global_settings"].update({"high_priority": var_priority.get()})).pack(anchor="w", padx=20)
+        frame_cpus = tk.Frame(self); frame_cpus.pack(fill="x", padx=20, pady=5)
+        tk.Label(frame_cpus, text="Pin to CPUs (e.g. 2,3):", width=20, anchor="w").pack(side="left")
+        var_cpus = tk.StringVar(value=",".join(map(str, self.config_ref["global_settings"].get("cpu_affinity", []))))
+        entry_cpus = tk.Entry(frame_cpus, textvariable=var_cpus); entry_cpus.pack(side="left", fill="x", expand=True)
+        entry_cpus.bind("<KeyRelease>", lambda e: self.config_ref["global_settings"].update({"cpu_affinity": [int(c) for c in var_cpus.get().split(",") if c.strip().isdigit()]}))
+        frame_sched = tk.Frame(self); frame_sched.pack(fill="x", padx=20, pady=5)
+        tk.Label(frame_sched, text="Pacing Mode:", width=15, anchor="w").pack(side="left")
+        var_mode = tk.StringVar(value=self.config_ref["global_settings"].get("scheduler_mode", "hybrid"))
+        cb = ttk.Combobox(frame_sched, textvariable=var_mode, values=SCHEDULER_MODES, state="readonly"); cb.pack(side="left", fill="x", expand=True)
+        cb.bind("<<ComboboxSelected>>", lambda e: self.config_ref["global_settings"].update({"scheduler_mode": var_mode.get()}))
+        frame_spin = tk.Frame(self); frame_spin.pack(fill="x", padx=20, pady=5)
+        tk.Label(frame_spin, text="Hybrid Spin Window (us)").pack(anchor="w")
+        var_spin = tk.IntVar(value=self.config_ref["global_settings"].get("spin_window_us", 2000))
+        tk.Scale(frame_spin, from_=0, to=5000, orient="horizontal", variable=var_spin, resolution=100, command=lambda v: self.config_ref["global_settings"].update({"spin_window_us": int(v)})).pack(fill="x")
+        self.lbl_stats = tk.Label(self, text="Achieved: - (not running)", fg="#555", font=("Consolas", 9))
+        self.lbl_stats.pack(pady=5)
         tk.Button(self, text="Close", command=self.destroy).pack(side="bottom", pady=20)
+        self.update_stats()
     def update_rate(self, val): val = int(val); self.config_ref["global_settings"]["update_rate"] = val; self.lbl_val.config(text=f"{val} Hz")
+    def update_stats(self):
+        if not self.winfo_exists(): return
+        st = self.app.loop.stats() if self.app and self.app.is_running else None
+        if st and "achieved_hz" in st:
+            self.lbl_stats.config(text=f"Achieved: {st['achieved_hz']:.0f} Hz | p99 jitter {st['jitter_p99_us']:.0f}us | missed {st['missed']}\n"
+                                       f"Latency p99 {st['latency_p99_us']:.0f}us max {st['latency_max_us']:.0f}us | idle {st['idle_seconds']:.0f}s, ~{st['cpu_saved_seconds']:.1f}s CPU saved")
+        self.after(500, self.update_stats)
 
 class WindingSettingsWindow(tk.Toplevel):
     def __init__(self, parent, config_ref):
@@ -298,6 +401,28 @@ class AutoClutchSettingsWindow(tk.Toplevel):
         cb = ttk.Combobox(f, textvariable=var, values=values, state="readonly"); cb.pack(side="left", fill="x", expand=True)
         cb.bind("<<ComboboxSelected>>", lambda e: self.data.update({key: var.get()}))
 
+class ProfileSwitchWindow(tk.Toplevel):
+    def __init__(self, parent, config_ref, name):
+        super().__init__(parent)
+        self.title(f"Switch to Profile: {name}")
+        self.geometry("450x400")
+        if "switching" not in config_ref: config_ref["switching"] = {"hotkey": "", "combo": []}
+        self.data = config_ref["switching"]
+        tk.Label(self, text="Switch to this profile while mapping", font=("Arial", 12, "bold")).pack(pady=10)
+        f = tk.Frame(self); f.pack(fill="x", padx=20, pady=5)
+        tk.Label(f, text="Keyboard Hotkey (e.g. ctrl+alt+1):", width=30, anchor="w").pack(side="left")
+        var_hotkey = tk.StringVar(value=self.data.get("hotkey", ""))
+        entry = tk.Entry(f, textvariable=var_hotkey); entry.pack(side="left", fill="x", expand=True)
+        entry.bind("<KeyRelease>", lambda e: self.data.update({"hotkey": var_hotkey.get()}))
+        tk.Label(self, text="Controller Combo (press all at once):").pack(anchor="w", padx=20, pady=(10, 0))
+        grid = tk.Frame(self); grid.pack(padx=20, pady=5)
+        self.combo_vars = {}
+        for i, btn in enumerate(XINPUT_BUTTONS):
+            var = self.combo_vars[btn] = tk.BooleanVar(value=btn in self.data.get("combo", []))
+            tk.Checkbutton(grid, text=btn, variable=var, command=self.update_combo).grid(row=i // 3, column=i % 3, sticky="w", padx=5)
+        tk.Button(self, text="Done", command=self.destroy).pack(side="bottom", pady=20)
+    def update_combo(self): self.data["combo"] = [btn for btn in XINPUT_BUTTONS if self.combo_vars[btn].get()]
+
 # --- MAIN APP ---
 class App:
     def __init__(self, root):
@@ -305,12 +430,15 @@ class App:
         self.root.title("Basic Xinput to vJoy Remapper")
         self.root.geometry("600x800")
         self.xi = XInputHandler()
-        self.mapper = MappingEngine() 
-        if not self.mapper.vjoy_active:
+        # The GUI only edits profiles; the loop process (see loop_process) owns vJoy and does the mapping
+        self.mapper = MappingEngine(profile_dir=PROFILE_DIR, open_vjoy=False)
+        self.loop = LoopClient({"profile_path": DEFAULT_PROFILE, "profile_dir": PROFILE_DIR})
+        if not self.loop.wait_ready() or not self.loop.vjoy_active:
             self.root.after(100, lambda: VJoyMissingWindow(self.root))
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         self.selected_port = -1
         self.is_running = False
-        self.stop_event = threading.Event()
+        self.var_record = tk.BooleanVar(value=False)
         self.frame_step1 = tk.Frame(root)
         self.frame_step2 = tk.Frame(root)
         self.frame_step3 = tk.Frame(root)
@@ -336,19 +464,17 @@ class App:
         if not self.frame_step1.winfo_exists(): return
         
         try:
-            connected = []
             for i in range(4):
-                state = self.xi.get_state(i)
-                if state:
-                    connected.append(f"Port {i}")
-                    if self.xi.is_button_pressed(state) and self.selected_port != i:
-                        self.selected_port = i
-                        self.lbl_status.config(text=f"Auto-Detected Port {i}!", fg="green")
-                        self.btn_next.config(state="normal")
-                        self.step1_combo.set(f"Port {i}")
+                state = self.xi.get_state(i) # Empty ports are only re-probed every so often (see XInputHandler)
+                if state and self.xi.is_button_pressed(state) and self.selected_port != i:
+                    self.selected_port = i
+                    self.lbl_status.config(text=f"Auto-Detected Port {i}!", fg="green")
+                    self.btn_next.config(state="normal")
+                    self.step1_combo.set(f"Port {i}")
             
-            # Update Dropdown List
-            if list(self.step1_combo['values']) != connected:
+            # Update Dropdown List when a controller came or went
+            if self.xi.take_events():
+                connected = [f"Port {i}" for i in range(4) if self.xi.connected[i]]
                 self.step1_combo['values'] = connected
                 if self.step1_combo.get() not in connected:
                     self.step1_combo.set("")
@@ -431,6 +557,7 @@ class App:
             self.setup_step2() 
     def goto_step3(self):
         self.mapper.save_config()
+        self.loop.send_profiles(self.mapper) # The loop process precompiles every profile, so switching later costs nothing
         self.frame_step2.pack_forget()
         self.setup_step3()
         self.frame_step3.pack(fill="both", expand=True)
@@ -439,6 +566,14 @@ class App:
     def setup_step3(self):
         for widget in self.frame_step3.winfo_children(): widget.destroy()
         tk.Label(self.frame_step3, text="Step 3: Advanced & Run", font=("Arial", 14, "bold")).pack(pady=10)
+        prof_frame = tk.LabelFrame(self.frame_step3, text="Profile", padx=10, pady=10)
+        prof_frame.pack(fill="x", padx=20, pady=5)
+        var_profile = tk.StringVar(value=self.mapper.profile_name)
+        cb_profile = ttk.Combobox(prof_frame, textvariable=var_profile, values=list(self.mapper.profiles), state="readonly", width=20)
+        cb_profile.pack(side="left", padx=5)
+        cb_profile.bind("<<ComboboxSelected>>", lambda e: self.select_profile(var_profile.get()))
+        tk.Button(prof_frame, text="Save As New...", command=self.action_new_profile).pack(side="left", padx=5)
+        tk.Button(prof_frame, text="Switching...", command=self.open_switch_settings).pack(side="left", padx=5)
         opts_frame = tk.LabelFrame(self.frame_step3, text="Options", padx=10, pady=10)
         opts_frame.pack(fill="x", padx=20, pady=5)
         
@@ -450,6 +585,7 @@ class App:
         # Options Row 2
         f_o2 = tk.Frame(opts_frame); f_o2.pack(fill="x", pady=5)
         tk.Button(f_o2, text="Open vJoy Input Viewer", command=lambda: InputViewerWindow(self.root, self)).pack(side="left", padx=5)
+        tk.Checkbutton(f_o2, text="Record Input Trace", variable=self.var_record).pack(side="left", padx=5)
 
         scripts_frame = tk.LabelFrame(self.frame_step3, text="Custom Scripts", padx=10, pady=10)
         scripts_frame.pack(fill="both", expand=True, padx=20, pady=5)
@@ -470,10 +606,12 @@ class App:
         ctrl_frame.pack(side="bottom", fill="x", pady=20)
         var_hid = tk.BooleanVar(value=self.mapper.config.get("use_hidhide", True))
         chk_hid = tk.Checkbutton(ctrl_frame, text="Hide Physical Controller (Fixes Double Input)", variable=var_hid, font=("Arial", 10, "bold"), command=lambda: self.mapper.config.update({"use_hidhide": var_hid.get()}))
-        chk_hid.pack(pady=10)
-        self.btn_run = tk.Button(ctrl_frame, text="START MAPPING", bg="green", fg="white", font=("Arial", 12, "bold"), command=self.start_mapping_loop)
+        chk_hid.pack(pady=(10, 0))
+        self.lbl_hidhide = tk.Label(ctrl_frame, text="", fg="#555")
+        self.lbl_hidhide.pack()
+        self.btn_run = tk.Button(ctrl_frame, text="START MAPPING", state=("disabled" if self.is_running else "normal"), bg="green", fg="white", font=("Arial", 12, "bold"), command=self.start_mapping_loop)
         self.btn_run.pack(pady=5, ipadx=20)
-        self.btn_stop = tk.Button(ctrl_frame, text="STOP", state="disabled", bg="red", fg="white", font=("Arial", 12, "bold"), command=self.stop_mapping_loop)
+        self.btn_stop = tk.Button(ctrl_frame, text="STOP", state=("normal" if self.is_running else "disabled"), bg="red", fg="white", font=("Arial", 12, "bold"), command=self.stop_mapping_loop)
         self.btn_stop.pack(pady=5, ipadx=20)
         tk.Button(ctrl_frame, text="< Back to Settings", command=self.go_back_to_step2).pack(pady=10)
 
@@ -495,18 +633,48 @@ class App:
             messagebox.showinfo("Success", "Registry updated!\nYou won't need to do this again.")
         except Exception as e: messagebox.showerror("Registry Error", f"{e}")
 
-    def open_program_settings(self): ProgramSettingsWindow(self.root, self.mapper.config)
+    def open_program_settings(self): ProgramSettingsWindow(self.root, self.mapper.config, self)
     def open_winding_settings(self): WindingSettingsWindow(self.root, self.mapper.config); self.root.after(100, lambda: self.wait_for_window_close())
     def open_range_settings(self): RangeModifierWindow(self.root, self.mapper.config); self.root.after(100, lambda: self.wait_for_window_close())
     def open_autoclutch_settings(self): AutoClutchSettingsWindow(self.root, self.mapper.config); self.root.after(100, lambda: self.wait_for_window_close())
+    def open_switch_settings(self): ProfileSwitchWindow(self.root, self.mapper.config, self.mapper.profile_name); self.root.after(100, lambda: self.wait_for_window_close())
     def wait_for_window_close(self):
         child_wins = self.root.winfo_children()
-        popup_open = any(isinstance(x, (WindingSettingsWindow, RangeModifierWindow, AutoClutchSettingsWindow)) for x in child_wins)
+        popup_open = any(isinstance(x, (WindingSettingsWindow, RangeModifierWindow, AutoClutchSettingsWindow, ProfileSwitchWindow)) for x in child_wins)
         if popup_open: self.root.after(500, self.wait_for_window_close)
         else:
             self.mapper.save_config()
             if self.frame_step3.winfo_viewable(): self.setup_step3()
 
+    # --- PROFILES ---
+    def select_profile(self, name):
+        """Switches the edited (and, while running, the mapped) profile. The loop picks it up on its next tick."""
+        self.mapper.save_config()
+        self.mapper.select_profile(name)
+        self.loop.send_profiles(self.mapper)
+        self.loop.switch_profile(name)
+        self.setup_step3()
+    def action_new_profile(self):
+        name = simpledialog.askstring("New Profile", "Name for a copy of the current profile:", parent=self.root)
+        if not name: return
+        try: self.mapper.add_profile(name, copy.deepcopy(self.mapper.config))
+        except (ValueError, OSError) as e: messagebox.showerror("Profile Error", f"{e}"); return
+        self.select_profile(name.strip())
+    def poll_profiles(self):
+        """Sends settings edits to the loop process and follows its hotkey/combo switches (Tk thread only)."""
+        if not self.is_running: return
+        self.loop.pump()
+        if not self.loop.alive:
+            print("Loop Process Error: the mapping process exited")
+            self.stop_mapping_loop()
+            return
+        self.loop.send_profiles(self.mapper)
+        active = self.loop.active_profile
+        if active in self.mapper.profiles and active != self.mapper.profile_name:
+            self.mapper.select_profile(active)
+            if self.frame_step3.winfo_viewable(): self.setup_step3()
+        self.root.after(int(CONFIG_CHECK_INTERVAL * 1000), self.poll_profiles)
+
     def go_back_to_step2(self):
         if self.is_running: self.stop_mapping_loop()
         self.frame_step3.pack_forget()
@@ -522,37 +690,37 @@ class App:
             self.root.wait_window(win)
             if self.mapper.config.get("use_hidhide", True): pass
         self.is_running = True
-        self.stop_event.clear()
-        if self.mapper.config.get("use_hidhide", True): self.mapper.apply_hiding()
+        if self.mapper.config.get("use_hidhide", True): self.watch_hidhide(self.mapper.apply_hiding(), "Hiding controller...", "Controller hidden.")
         self.btn_run.config(state="disabled")
         self.btn_stop.config(state="normal")
-        self.thread = threading.Thread(target=self.mapping_worker)
-        self.thread.daemon = True
-        self.thread.start()
+        self.loop.send_profiles(self.mapper)
+        self.loop.switch_profile(self.mapper.profile_name)
+        self.loop.start(self.selected_port, new_trace_path() if self.var_record.get() else None)
+        self.poll_profiles()
 
     def stop_mapping_loop(self):
         self.is_running = False
-        self.stop_event.set()
-        self.mapper.disable_hiding()
+        self.loop.stop()
+        self.watch_hidhide(self.mapper.disable_hiding(), "Restoring controller...", "")
         self.btn_run.config(state="normal")
         self.btn_stop.config(state="disabled")
 
-    def mapping_worker(self):
-        print("Mapping Worker Started")
-        last_time = time.perf_counter()
-        while not self.stop_event.is_set():
-            current_time = time.perf_counter()
-            dt = current_time - last_time
-            last_time = current_time
-            rate = self.mapper.config["global_settings"].get("update_rate", 1000)
-            target_sleep = 1.0 / rate
-            state = self.xi.get_state(self.selected_port)
-            if state: self.mapper.update_vjoy(state, dt)
-            elapsed = time.perf_counter() - current_time
-            sleep_needed = target_sleep - elapsed
-            if sleep_needed > 0: time.sleep(sleep_needed)
+    def on_close(self):
+        if self.is_running: self.stop_mapping_loop()
+        self.loop.close()
+        self.root.destroy()
+
+    def watch_hidhide(self, future, busy_text, done_text):
+        """HidHide commands run on a worker thread; this polls their Future from the Tk thread."""
+        if future is None or not self.lbl_hidhide.winfo_exists(): return
+        if not future.done():
+            self.lbl_hidhide.config(text=busy_text, fg="#555")
+            self.root.after(100, lambda: self.watch_hidhide(future, busy_text, done_text))
+        elif future.result(): self.lbl_hidhide.config(text=done_text, fg="green")
+        else: self.lbl_hidhide.config(text="HidHide command failed (see console).", fg="red")
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # A frozen build starts the loop process through this executable
     root = tk.Tk()
     app = App(root)
     root.mainloop()
\ No newline at end of file
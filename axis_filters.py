@@ -0,0 +1,97 @@
+"""
+Per-axis smoothing for jittery sticks and triggers, applied to an axis's value after its deadzone/curve
+math and before it is converted to vJoy units. Each filter is called as filter(value, dt) -> value and
+keeps a fixed amount of state, allocated when the profile is compiled, so a tick costs the same however
+long it has been running.
+
+  ema      - exponential moving average with a cutoff in Hz (the same smoothing at any loop rate)
+  one_euro - 1-euro filter: smooths hard at rest, opens up as the axis moves fast (cutoff + beta)
+  median   - median of the last N samples; removes single-sample spikes without blurring edges
+
+Filters keep changing their output after the input stops changing, so each has .settled (the output has
+reached the input) and counts as a time-dependent stage until it is.
+"""
+import math
+
+FILTERS = ("none", "ema", "one_euro", "median")
+SETTLE_EPSILON = 1e-6 # Closer than this to the input (~1/60 of a vJoy step) snaps to it
+ONE_EURO_D_CUTOFF = 1.0 # Hz, for the 1-euro filter's speed estimate
+
+class EmaFilter:
+    __slots__ = ("tau", "value", "primed", "settled")
+
+    def __init__(self, cutoff):
+        self.tau = 1.0 / (2.0 * math.pi * cutoff)
+        self.reset()
+
+    def reset(self):
+        self.value, self.primed, self.settled = 0.0, False, True
+
+    def __call__(self, x, dt):
+        if not self.primed: self.value, self.primed = x, True; return x
+        y = self.value + (1.0 - math.exp(-dt / self.tau)) * (x - self.value)
+        self.settled = abs(x - y) < SETTLE_EPSILON
+        if self.settled: y = x
+        self.value = y
+        return y
+
+class OneEuroFilter:
+    """Casiez et al. 2012. cutoff is the minimum cutoff (Hz) at rest; beta raises it with the axis speed (units/s)."""
+    __slots__ = ("min_cutoff", "beta", "value", "speed", "primed", "settled")
+
+    def __init__(self, cutoff, beta):
+        self.min_cutoff, self.beta = cutoff, beta
+        self.reset()
+
+    def reset(self):
+        self.value, self.speed, self.primed, self.settled = 0.0, 0.0, False, True
+
+    @staticmethod
+    def _alpha(dt, cutoff): return 1.0 / (1.0 + 1.0 / (2.0 * math.pi * cutoff * dt))
+
+    def __call__(self, x, dt):
+        if not self.primed: self.value, self.speed, self.primed = x, 0.0, True; return x
+        if dt <= 0.0: return self.value
+        a_d = self._alpha(dt, ONE_EURO_D_CUTOFF)
+        self.speed += a_d * ((x - self.value) / dt - self.speed)
+        a = self._alpha(dt, self.min_cutoff + self.beta * abs(self.speed))
+        y = self.value + a * (x - self.value)
+        self.settled = abs(x - y) < SETTLE_EPSILON
+        if self.settled: y = x
+        self.value = y
+        return y
+
+class MedianFilter:
+    """Median of the last `size` samples (made odd, so the median is a sample). dt is unused."""
+    __slots__ = ("size", "window", "scratch", "index", "settled")
+
+    def __init__(self, size):
+        self.size = size = size | 1
+        self.window = [0.0] * size # Ring buffer
+        self.scratch = [0.0] * size # Sorted copy, reused every call
+        self.reset()
+
+    def reset(self):
+        self.index, self.settled = -1, True # -1: empty; the first sample fills the whole window
+
+    def __call__(self, x, dt):
+        window, scratch = self.window, self.scratch
+        if self.index < 0:
+            for i in range(self.size): window[i] = x
+            self.index = 0
+            return x
+        window[self.index] = x
+        self.index = (self.index + 1) % self.size
+        scratch[:] = window
+        scratch.sort()
+        y = scratch[self.size // 2]
+        self.settled = y == x # Repeating x from here can only keep the median at x
+        return y
+
+def create_filter(conf):
+    """The filter for an axis section (profile_schema.StickAxis/TriggerAxis), or None when it has none."""
+    kind = conf.filter
+    if kind == "ema": return EmaFilter(conf.filter_cutoff)
+    if kind == "one_euro": return OneEuroFilter(conf.filter_cutoff, conf.filter_beta)
+    if kind == "median": return MedianFilter(conf.filter_size)
+    return None
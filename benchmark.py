@@ -0,0 +1,180 @@
+"""
+Benchmarks for the mapping hot path. Runs anywhere (fake vJoy device, no XInput needed).
+
+    python benchmark.py [--ticks 20000] [--trace session.xtrace ...] [--json out.json] [--compare old.json]
+
+Reports ns/tick, transient allocation per tick and max sustainable Hz for every script
+combination (winding, range modifier, auto clutch, square mode) with and without LUT curves,
+over synthetic input and any recorded traces. Also checks that winding steering gives the same output
+at every loop rate over those inputs, and measures the cost of scanning XInput ports (fake DLL).
+"""
+import argparse
+import itertools
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+
+from input_sources import GamepadSnapshot
+from input_trace import TraceReader
+from mapping_engine import MappingEngine
+from mapping_scripts import WindingStickLogic, WINDING_SUBSTEP, winding_rate_check
+from vjoy_output import FakeVJoyDevice
+from xinput_handler import XInputHandler, FakeXInputDLL, PROBE_MIN, PROBE_MAX
+
+SCRIPT_FLAGS = ["winding", "range_mod", "auto_clutch", "square"]
+
+def synthetic_samples(count, rate=1000, seed=1):
+    """Deterministic racing-ish input: drifting sticks/throttle, occasional shifts, ~40% of polls repeat the packet."""
+    rng = random.Random(seed)
+    samples = []
+    packet, buttons, lt, rt, lx, ly, rx, ry = 0, 0, 0, 0, 0, 0, 0, 0
+    for i in range(count):
+        if rng.random() < 0.6:
+            packet += 1
+            lx = max(-32768, min(32767, lx + rng.randint(-1500, 1500)))
+            ly = max(-32768, min(32767, ly + rng.randint(-1500, 1500)))
+            rx = max(-32768, min(32767, rx + rng.randint(-300, 300)))
+            rt = max(0, min(255, rt + rng.randint(-8, 8)))
+            lt = max(0, min(255, lt + rng.randint(-8, 8)))
+            if rng.random() < 0.02: buttons ^= rng.choice([0x0100, 0x0200, 0x1000, 0x4000])
+        samples.append((i / rate, packet, buttons, lt, rt, lx, ly, rx, ry))
+    return samples
+
+def make_engine(flags, lut, output_mode):
+    device = FakeVJoyDevice()
+    device.record = False
+    mapper = MappingEngine(vjoy_device=device, profile_path="")
+    config = mapper.get_default_config()
+    config["global_settings"].update({"use_lut": lut, "output_mode": output_mode})
+    scripts = config["scripts"]
+    if flags["winding"]: scripts["winding_steering"].update({"enabled_for": "Left Stick", "target_axis": "X"})
+    if flags["range_mod"]: scripts["range_modifier"].update({"enabled": True, "modifier_key": "X", "modified_axis": "X"})
+    if flags["auto_clutch"]: scripts["auto_clutch"].update({"enabled": True, "auto_blip": True, "auto_lift": True})
+    for axis in ("LX", "LY", "RX", "RY"): config["axes"][axis].update({"square": flags["square"], "dz_in": 0.05, "lin": 30})
+    mapper.config = config
+    return mapper
+
+def run_case(mapper, samples, dt=0.001, alloc_sample=2000):
+    snaps = [GamepadSnapshot(*s[1:]) for s in samples]
+    update = mapper.update_vjoy
+    for snap in snaps[:1000]: update(snap, dt) # Warm-up: compiles the pipeline / builds LUTs
+    mapper.reset_output_state()
+
+    start = time.perf_counter_ns()
+    for snap in snaps: update(snap, dt)
+    ns_per_tick = (time.perf_counter_ns() - start) / len(snaps)
+
+    # Transient allocation: peak traced bytes above the baseline, per tick
+    subset = snaps[:alloc_sample]
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    peak_total = 0
+    blocks_before = sys.getallocatedblocks()
+    for snap in subset:
+        tracemalloc.reset_peak()
+        update(snap, dt)
+        peak_total += tracemalloc.get_traced_memory()[1] - base
+    blocks_after = sys.getallocatedblocks()
+    tracemalloc.stop()
+    return {
+        "ns_per_tick": round(ns_per_tick, 1),
+        "max_hz": round(1e9 / ns_per_tick) if ns_per_tick else 0,
+        "alloc_bytes_per_tick": round(peak_total / len(subset), 1),
+        "retained_blocks_per_tick": round((blocks_after - blocks_before) / len(subset), 3),
+        "driver_calls_per_tick": round(mapper.output.driver_calls / (len(snaps) + len(subset)), 2),
+    }
+
+def micro_benchmarks(number=200000):
+    mapper = make_engine(dict.fromkeys(SCRIPT_FLAGS, False), False, "per_call")
+    winding = WindingStickLogic()
+    results = {}
+    for name, stmt in [
+        ("apply_deadzone_stick", lambda: mapper.apply_deadzone_stick(0.4321, 0.05, 0.02, 0.1, 30, False)),
+        ("apply_deadzone_trigger", lambda: mapper.apply_deadzone_trigger(0.6, 0.05, 0.0, -1.0, 1.0, -40)),
+        ("squarify", lambda: mapper.squarify(12000, -20000)),
+        ("winding_step", lambda: winding.step(15000, 20000, 0.001)),
+    ]:
+        best = min(timeit.repeat(stmt, number=number, repeat=3))
+        results[name] = round(best / number * 1e9, 1)
+    return results
+
+def xinput_scan_benchmark(scans=200, interval=0.05, miss_cost=0.002):
+    """The controller-selection scan (4 ports every 50 ms, one pad on port 0) with and without the connection cache."""
+    results = {}
+    for name, backoff in [("uncached", (0.0, 0.0)), ("cached", (PROBE_MIN, PROBE_MAX))]:
+        dll = FakeXInputDLL(miss_cost)
+        dll.connect(0)
+        now = [0.0]
+        xi = XInputHandler(dll, *backoff, clock=lambda: now[0])
+        start = time.perf_counter()
+        for _ in range(scans):
+            for port in range(4): xi.get_state(port)
+            now[0] += interval
+        results[name] = {"ms_per_scan": round((time.perf_counter() - start) / scans * 1e3, 3), "empty_port_calls": sum(dll.calls[1:])}
+    return results
+
+def git_commit():
+    try: return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception: return None
+
+def compare(old, new):
+    old_cases = {c["name"]: c for c in old.get("cases", [])}
+    print(f"\nvs {old.get('commit')} ({old.get('timestamp')}):")
+    for case in new["cases"]:
+        prev = old_cases.get(case["name"])
+        if not prev: continue
+        delta = (case["ns_per_tick"] - prev["ns_per_tick"]) / prev["ns_per_tick"] * 100.0
+        flag = "  <-- slower" if delta > 10 else ""
+        print(f"  {case['name']:<60} {prev['ns_per_tick']:>9.0f} -> {case['ns_per_tick']:>9.0f} ns ({delta:+.1f}%){flag}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the mapping hot path.")
+    parser.add_argument("--ticks", type=int, default=20000)
+    parser.add_argument("--trace", action="append", default=[], help="Recorded .xtrace to benchmark (repeatable)")
+    parser.add_argument("--output-mode", choices=["per_call", "batched"], default="per_call")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    parser.add_argument("--compare", default=None, help="Compare against a previous JSON result")
+    parser.add_argument("--quick", action="store_true", help="Only all-off and all-on script combinations")
+    args = parser.parse_args(argv)
+
+    inputs = [("synthetic", synthetic_samples(args.ticks))]
+    for path in args.trace:
+        reader = TraceReader(path)
+        inputs.append((path, [reader[i] for i in range(min(len(reader), args.ticks))]))
+
+    combos = list(itertools.product([False, True], repeat=len(SCRIPT_FLAGS)))
+    if args.quick: combos = [combos[0], combos[-1]]
+    results = {"commit": git_commit(), "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"), "python": sys.version.split()[0],
+               "platform": platform.platform(), "ticks": args.ticks, "output_mode": args.output_mode, "cases": []}
+
+    print(f"{'case':<60} {'ns/tick':>9} {'max Hz':>9} {'B/tick':>8} {'calls':>6}")
+    for (input_name, samples), combo, lut in itertools.product(inputs, combos, [False, True]):
+        flags = dict(zip(SCRIPT_FLAGS, combo))
+        name = f"{input_name}|{'+'.join(k for k, v in flags.items() if v) or 'plain'}|{'lut' if lut else 'analytic'}"
+        res = run_case(make_engine(flags, lut, args.output_mode), samples)
+        res.update(name=name, input=input_name, lut=lut, **flags)
+        results["cases"].append(res)
+        print(f"{name:<60} {res['ns_per_tick']:>9.0f} {res['max_hz']:>9} {res['alloc_bytes_per_tick']:>8.0f} {res['driver_calls_per_tick']:>6}")
+
+    results["micro_ns"] = micro_benchmarks()
+    print("\nmicro (ns/call): " + ", ".join(f"{k} {v:.0f}" for k, v in results["micro_ns"].items()))
+    results["winding_rate_diff"] = {name: winding_rate_check(samples) for name, samples in inputs}
+    for name, diffs in results["winding_rate_diff"].items():
+        print(f"winding vs {min(diffs)} Hz ({name}, {WINDING_SUBSTEP * 1000:g} ms substeps): " + ", ".join(f"{rate} Hz max diff {diff:.2g}" for rate, diff in diffs.items() if rate != min(diffs)))
+    results["xinput_scan"] = xinput_scan_benchmark()
+    print("xinput port scan (fake DLL, 2 ms per empty port): " + ", ".join(f"{k} {v['ms_per_scan']:.2f} ms, {v['empty_port_calls']} empty-port calls" for k, v in results["xinput_scan"].items()))
+
+    if args.compare:
+        with open(args.compare) as f: compare(json.load(f), results)
+    if args.json:
+        with open(args.json, "w") as f: json.dump(results, f, indent=2)
+        print(f"\nSaved {args.json}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
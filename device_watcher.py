@@ -0,0 +1,141 @@
+import importlib.util
+import queue
+import sys
+import threading
+import time
+
+ADDED, REMOVED = "add", "remove"
+
+class DeviceWatcher:
+    """
+    Streams device plug/unplug events instead of enumerating every device.
+    start() begins watching on a background thread; events arrive on self.events as (action, device_id).
+    Only changes after start() are reported; start() returns once the subscription is live.
+    """
+    name = "devices"
+
+    def __init__(self):
+        self.events = queue.Queue()
+        self._stop = threading.Event()
+        self.ready = threading.Event() # Set by watch() once it is subscribed
+        self.error = None # Why watch() stopped, if it failed; callers should fall back to a scan
+        self._thread = None
+
+    def start(self, timeout=5.0):
+        self._stop.clear()
+        self.ready.clear()
+        self.error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self.ready.wait(timeout)
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread is not None: self._thread.join(timeout)
+
+    def _run(self):
+        try: self.watch()
+        except Exception as e:
+            self.error = e
+            print(f"DeviceWatcher ({self.name}) Error: {e}")
+        finally: self.ready.set()
+
+    def watch(self): raise NotImplementedError
+
+    def wait_for_added(self, timeout, settle=1.0):
+        """
+        Blocks until a device is added (or timeout), then keeps collecting for `settle` seconds after the
+        last event, because one controller shows up as several device nodes. Returns the set of new IDs.
+        """
+        added = set()
+        deadline = time.perf_counter() + timeout
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0: return added
+            try: action, device_id = self.events.get(timeout=remaining)
+            except queue.Empty: return added
+            if action == ADDED: added.add(device_id)
+            else: added.discard(device_id)
+            if added: deadline = time.perf_counter() + settle
+
+# --- Windows: WMI event subscription ---
+class WmiDeviceWatcher(DeviceWatcher):
+    """
+    __InstanceCreationEvent / __InstanceDeletionEvent on Win32_PnPEntity, scoped to the HID and Xbox
+    controller classes. WMI polls for them inside the service (WITHIN), so no device list is ever read
+    into this process; each event carries the device ID it is about.
+    """
+    name = "WMI"
+    POLL_SECONDS = 1 # WITHIN interval: how late an event can be
+    PNP_CLASSES = ("HIDClass", "XnaComposite", "XboxComposite")
+
+    def __init__(self):
+        if importlib.util.find_spec("wmi") is None or importlib.util.find_spec("pythoncom") is None:
+            raise RuntimeError("WmiDeviceWatcher needs the 'wmi' and 'pywin32' packages")
+        super().__init__()
+
+    @classmethod
+    def query(cls, event_class):
+        classes = " OR ".join(f"TargetInstance.PNPClass = '{name}'" for name in cls.PNP_CLASSES)
+        return f"SELECT * FROM {event_class} WITHIN {cls.POLL_SECONDS} WHERE TargetInstance ISA 'Win32_PnPEntity' AND ({classes})"
+
+    def watch(self):
+        import wmi
+        import pythoncom
+        pythoncom.CoInitialize() # COM is per thread
+        try:
+            c = wmi.WMI()
+            watchers = [(ADDED, c.watch_for(raw_wql=self.query("__InstanceCreationEvent"))),
+                        (REMOVED, c.watch_for(raw_wql=self.query("__InstanceDeletionEvent")))]
+            self.ready.set()
+            while not self._stop.is_set():
+                for action, watcher in watchers:
+                    try: device = watcher(timeout_ms=125)
+                    except wmi.x_wmi_timed_out: continue
+                    if device.DeviceID: self.events.put((action, device.DeviceID.upper()))
+        finally:
+            pythoncom.CoUninitialize()
+
+# --- Linux: udev ---
+class UdevDeviceWatcher(DeviceWatcher):
+    """udev monitor via pyudev. Device IDs are sysfs paths."""
+    name = "udev"
+
+    def __init__(self, subsystems=("input", "hidraw", "usb")):
+        try: import pyudev
+        except ImportError: raise RuntimeError("UdevDeviceWatcher needs the 'pyudev' package (pip install pyudev)")
+        super().__init__()
+        self.monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+        for subsystem in subsystems: self.monitor.filter_by(subsystem)
+        self.monitor.start() # Start listening now, so nothing between start() and the thread running is missed
+
+    def watch(self):
+        self.ready.set()
+        while not self._stop.is_set():
+            device = self.monitor.poll(timeout=0.25)
+            if device is None: continue
+            if device.action == ADDED: self.events.put((ADDED, device.device_path))
+            elif device.action == REMOVED: self.events.put((REMOVED, device.device_path))
+
+# --- Fake ---
+class FakeDeviceWatcher(DeviceWatcher):
+    """Plays a script of (delay_seconds, action, device_id) after start(); inject() adds events by hand."""
+    name = "fake"
+
+    def __init__(self, script=()):
+        super().__init__()
+        self.script = list(script)
+
+    def inject(self, action, device_id): self.events.put((action, device_id))
+
+    def watch(self):
+        self.ready.set()
+        for delay, action, device_id in self.script:
+            if self._stop.wait(delay): return
+            self.events.put((action, device_id))
+
+def create_device_watcher():
+    """The watcher for this platform. Raises RuntimeError if its backend isn't installed."""
+    if sys.platform == "win32": return WmiDeviceWatcher()
+    return UdevDeviceWatcher()
@@ -0,0 +1,153 @@
+"""
+Headless runner: XInputHandler -> MappingEngine without the Tk UI.
+
+    python headless.py [--profile mapping_profile.json] [--source xinput|evdev|synthetic] [--port N] [--vjoy-device 1] [--fake]
+                       [--record trace.xtrace | --replay trace.xtrace]
+    python headless.py --bind 0:1:driver.json --bind 1:2:spotter.json    (or --rig rig.json)
+
+Does not import tkinter, wmi or pythoncom. Stops cleanly on Ctrl+C / SIGTERM.
+--fake swaps in synthetic input and a recording vJoy stand-in so it runs on machines without XInput/vJoy.
+Named profiles in --profile-dir are preloaded; their switching.hotkey/combo switch between them while running.
+"""
+import argparse
+import signal
+import sys
+import time
+
+from mapping_engine import MappingEngine, DEFAULT_PROFILE, PROFILE_DIR
+from mapping_loop import MappingLoop, parse_binding, load_rig
+from vjoy_output import FakeVJoyDevice
+from xinput_handler import XInputHandler
+from input_sources import XInputSource, EvdevSource, SyntheticSource, ReplaySource
+from input_trace import TraceReader, TraceWriter, RecordingSource
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the XInput to vJoy mapping loop without the UI.")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, help="Mapping profile JSON (default: %(default)s)")
+    parser.add_argument("--profile-dir", default=PROFILE_DIR, help="Folder of extra named profiles to preload (default: %(default)s)")
+    parser.add_argument("--source", choices=["xinput", "evdev", "synthetic"], default=None, help="Input backend (default: xinput, or synthetic with --fake)")
+    parser.add_argument("--port", type=int, default=None, help="XInput port 0-3 (default: first connected)")
+    parser.add_argument("--evdev-path", default=None, help="evdev device node (default: first gamepad)")
+    parser.add_argument("--record", default=None, metavar="TRACE", help="Record every input sample to a trace file")
+    parser.add_argument("--replay", default=None, metavar="TRACE", help="Replay a recorded trace in real time instead of reading a controller")
+    parser.add_argument("--vjoy-device", type=int, default=1, help="vJoy device id (default: %(default)s)")
+    parser.add_argument("--fake", action="store_true", help="Use stand-in input/output instead of XInput/vJoy")
+    parser.add_argument("--synthetic-duty", type=float, default=1.0, help="Fraction of each cycle the synthetic pad moves (default: %(default)s)")
+    parser.add_argument("--adaptive", action="store_true", help="Enable adaptive polling (overrides the profile)")
+    parser.add_argument("--latency", action="store_true", help="Time every stage of a tick and save the histograms on stop")
+    parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds")
+    parser.add_argument("--bind", action="append", default=[], metavar="PORT:DEVICE[:PROFILE]", help="Map an XInput port to a vJoy device (repeatable; all serviced by one loop)")
+    parser.add_argument("--rig", default=None, help="JSON file listing bindings (see mapping_loop.load_rig)")
+    parser.add_argument("--no-hidhide", action="store_true", help="Don't touch HidHide, even if the profile enables it")
+    return parser.parse_args(argv)
+
+def wait_for_port(xi, stop_check, poll_interval=0.5):
+    """Returns the first connected XInput port, or None if stopped while waiting."""
+    announced = False
+    while not stop_check():
+        port = XInputSource.find_connected_port(xi)
+        if port is not None: return port
+        if not announced: print("Headless: Waiting for a controller..."); announced = True
+        time.sleep(poll_interval)
+    return None
+
+def build_single(args, loop, stop_check):
+    """The classic setup: one source -> one vJoy device. Returns False if startup failed/was aborted."""
+    source_kind = args.source or ("synthetic" if args.fake else "xinput")
+    device = FakeVJoyDevice(args.vjoy_device) if args.fake else None
+    mapper = MappingEngine(args.vjoy_device, vjoy_device=device, profile_path=args.profile, profile_dir=args.profile_dir)
+    if not mapper.vjoy_active:
+        print("Headless: vJoy is not available (use --fake to run with a stand-in device).")
+        return False
+    if args.replay:
+        try: source = ReplaySource(TraceReader(args.replay), realtime=True)
+        except (OSError, ValueError) as e: print(f"Headless: {e}"); return False
+        source.name = f"replay of {args.replay}"
+    elif source_kind == "xinput":
+        xi = XInputHandler()
+        port = args.port if args.port is not None else wait_for_port(xi, stop_check)
+        if port is None: return False
+        source = XInputSource(port, xi)
+    elif source_kind == "evdev":
+        try: source = EvdevSource(args.evdev_path)
+        except (RuntimeError, OSError) as e: print(f"Headless: {e}"); return False
+    else: source = SyntheticSource(duty=args.synthetic_duty)
+    if args.record: source = RecordingSource(source, TraceWriter(args.record))
+    loop.add_binding(source, mapper)
+    return True
+
+def build_rig(args, loop, specs):
+    """Several XInput ports -> several vJoy devices, each binding with its own profile."""
+    xi = XInputHandler()
+    devices = {}
+    for spec in specs:
+        vjoy_id = spec["vjoy_device"]
+        if vjoy_id not in devices and args.fake: devices[vjoy_id] = FakeVJoyDevice(vjoy_id)
+        mapper = MappingEngine(vjoy_id, vjoy_device=devices.get(vjoy_id), profile_path=spec["profile"] or args.profile, profile_dir=args.profile_dir)
+        if not mapper.vjoy_active:
+            print(f"Headless: vJoy device {vjoy_id} is not available.")
+            return False
+        devices[vjoy_id] = mapper.vjoy_device # Bindings to the same device share it
+        source = SyntheticSource(duty=args.synthetic_duty) if args.fake else XInputSource(spec["port"], xi)
+        source.name = f"port {spec['port']}"
+        loop.add_binding(source, mapper)
+    return True
+
+def main(argv=None):
+    args = parse_args(argv)
+    loop = MappingLoop()
+    stopping = []
+    def request_stop(signum=None, frame=None):
+        stopping.append(signum)
+        loop.stop_event.set()
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+    if hasattr(signal, "SIGBREAK"): signal.signal(signal.SIGBREAK, request_stop)
+
+    if args.rig or args.bind:
+        if args.record or args.replay: print("Headless: --record/--replay only work with a single binding."); return 1
+        try: specs = (load_rig(args.rig) if args.rig else []) + [parse_binding(b) for b in args.bind]
+        except (OSError, ValueError, KeyError) as e: print(f"Headless: Bad rig: {e}"); return 1
+        if not build_rig(args, loop, specs): return 1
+    elif not build_single(args, loop, lambda: bool(stopping)): return 0 if stopping else 1
+
+    for source, mapper in loop.bindings:
+        if args.adaptive: mapper.config["global_settings"]["adaptive_polling"] = True
+        if args.latency: mapper.config["global_settings"]["instrument_latency"] = True
+        if args.fake: mapper.vjoy_device.record = False # Nobody reads the recording in a long run
+        mapper.refresh_pipeline() # Compiles every named profile up front
+        mapper.bind_hotkeys()
+        print(f"Headless: Mapping {source.name} -> vJoy device {mapper.vjoy_device_id} ({mapper.profile_path})")
+        if len(mapper.profiles) > 1: print(f"Headless: Profiles: {', '.join(mapper.profiles)}")
+
+    hiding = []
+    if not args.no_hidhide and not args.fake:
+        seen_profiles = set()
+        for _, mapper in loop.bindings:
+            if mapper.profile_path in seen_profiles or not mapper.config.get("use_hidhide", True): continue
+            seen_profiles.add(mapper.profile_path)
+            if mapper.apply_hiding() is not None: hiding.append(mapper) # None: HidHide isn't installed
+    # The loop gets its own thread; the main thread only waits, so signal handlers run promptly
+    deadline = time.perf_counter() + args.duration if args.duration is not None else None
+    active = [mapper.active_profile for _, mapper in loop.bindings]
+    loop.start()
+    try:
+        while loop.is_running:
+            loop.thread.join(0.2)
+            if deadline is not None and time.perf_counter() >= deadline: loop.stop_event.set()
+            if getattr(loop.source, "finished", False): loop.stop_event.set()
+            for i, (source, mapper) in enumerate(loop.bindings):
+                if mapper.active_profile != active[i]:
+                    active[i] = mapper.active_profile
+                    print(f"Headless: {source.name} switched to profile '{active[i]}'")
+    finally:
+        loop.stop()
+        loop.close_sources()
+        for _, mapper in loop.bindings: mapper.unbind_hotkeys()
+        for future in [mapper.disable_hiding() for mapper in hiding]:
+            if future is not None: future.result(timeout=30)
+    print("Headless: Stopped.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
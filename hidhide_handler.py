@@ -1,12 +1,20 @@
 import os
 import subprocess
-import sys
-import wmi
-import pythoncom
+from concurrent.futures import ThreadPoolExecutor
+
+# Windows caps a command line at 32767 characters; stay well below when batching arguments
+MAX_COMMAND_CHARS = 8000
 
 class HidHideHandler:
+    """
+    Wraps HidHideCLI. The *_async methods queue work on one background thread (so commands still
+    run in order) and return a concurrent.futures.Future. apply()/apply_async() only send what
+    changed since the last successful apply, batched into as few CLI invocations as possible.
+    """
     def __init__(self, cli_path=None):
         self.cli_path = cli_path
+        self._executor = None
+        self.forget_applied()
         
         # clean path (remove quotes if user pasted them)
         if self.cli_path:
@@ -23,6 +31,9 @@ class HidHideHandler:
 
     def get_connected_devices_set(self):
         """Returns a set of all PnP Device Instance Paths currently on the system."""
+        # Imported here so the mapping loop can start without WMI/COM (headless runner)
+        import wmi
+        import pythoncom
         try:
             pythoncom.CoInitialize() 
             c = wmi.WMI()
@@ -35,23 +46,43 @@ class HidHideHandler:
             pythoncom.CoUninitialize()
 
     def run_command(self, args):
-        """Runs a command with HidHideCLI."""
+        """Runs a command with HidHideCLI. Returns True if it exited with 0."""
         if not self.is_installed(): 
             print("HidHideCLI not found. Check path.")
-            return
+            return False
         
         cmd = [self.cli_path] + args
         
         # Hide console window
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        startupinfo = None
+        if hasattr(subprocess, "STARTUPINFO"):
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
         
         try:
             # DEBUG: Uncomment this to see exactly what is running
             # print(f"CMD: {cmd}") 
-            subprocess.run(cmd, startupinfo=startupinfo, check=False)
+            return subprocess.run(cmd, startupinfo=startupinfo, check=False).returncode == 0
         except Exception as e:
             print(f"HidHide Execution Error: {e}")
+            return False
+
+    def run_batch(self, commands):
+        """
+        Runs several commands (each a list like ["--dev-hide", id]) in as few invocations as possible.
+        HidHideCLI processes its arguments in order, so one invocation can carry many commands.
+        """
+        ok = True
+        batch, length = [], 0
+        for command in commands:
+            size = sum(len(arg) + 3 for arg in command)
+            if batch and length + size > MAX_COMMAND_CHARS:
+                ok = self.run_command(batch) and ok
+                batch, length = [], 0
+            batch += command
+            length += size
+        if batch: ok = self.run_command(batch) and ok
+        return ok
 
     def whitelist_application(self, path_to_exe):
         self.run_command(["--app-reg", path_to_exe])
@@ -60,16 +91,54 @@ class HidHideHandler:
         self.run_command(["--app-unreg", path_to_exe])
 
     def hide_devices(self, device_instance_ids):
-        for dev_id in device_instance_ids:
-            self.run_command(["--dev-hide", dev_id])
+        self.run_batch([["--dev-hide", dev_id] for dev_id in device_instance_ids])
 
     def unhide_devices(self, device_instance_ids):
-        for dev_id in device_instance_ids:
-            self.run_command(["--dev-unhide", dev_id])
+        self.run_batch([["--dev-unhide", dev_id] for dev_id in device_instance_ids])
 
     def set_cloaking(self, enable=True):
         # CORRECTED COMMANDS based on your help output
         if enable:
             self.run_command(["--cloak-on"])
         else:
-            self.run_command(["--cloak-off"])
\ No newline at end of file
+            self.run_command(["--cloak-off"])
+
+    # --- Diffed / background operation ---
+    def forget_applied(self):
+        """Drops the record of what was applied, so the next apply() sends everything again."""
+        self._applied_apps = set()
+        self._applied_devices = set()
+        self._applied_cloak = None
+
+    def plan(self, app_paths, device_instance_ids, cloak):
+        """The commands apply() would run: only apps/devices/cloak state that differ from the last apply."""
+        commands = [["--app-reg", path] for path in app_paths if path not in self._applied_apps]
+        if device_instance_ids is not None:
+            devices = set(device_instance_ids)
+            commands += [["--dev-unhide", dev_id] for dev_id in sorted(self._applied_devices - devices)]
+            commands += [["--dev-hide", dev_id] for dev_id in sorted(devices - self._applied_devices)]
+        if cloak is not None and cloak != self._applied_cloak: commands.append(["--cloak-on" if cloak else "--cloak-off"])
+        return commands
+
+    def apply(self, app_paths=(), device_instance_ids=None, cloak=None):
+        """Brings HidHide to the given state. None leaves the device list / cloaking alone. Returns True on success."""
+        commands = self.plan(app_paths, device_instance_ids, cloak)
+        if not commands: return True
+        if not self.run_batch(commands):
+            self.forget_applied() # Unknown what stuck; resend everything next time
+            return False
+        self._applied_apps.update(app_paths)
+        if device_instance_ids is not None: self._applied_devices = set(device_instance_ids)
+        if cloak is not None: self._applied_cloak = cloak
+        return True
+
+    def submit(self, fn, *args):
+        """Runs fn(*args) on the HidHide worker thread. Returns a Future."""
+        if self._executor is None: self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="HidHide")
+        return self._executor.submit(fn, *args)
+
+    def apply_async(self, app_paths=(), device_instance_ids=None, cloak=None):
+        if device_instance_ids is not None: device_instance_ids = tuple(device_instance_ids)
+        return self.submit(self.apply, tuple(app_paths), device_instance_ids, cloak)
+
+    def set_cloaking_async(self, enable=True): return self.submit(self.apply, (), None, enable)
\ No newline at end of file
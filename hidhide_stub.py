@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""
+Stand-in for HidHideCLI.exe, for trying the HidHide code paths without the driver.
+Point hidhide_path at this file (it is executable), or on Windows at a .cmd wrapper that runs it.
+Every invocation appends its arguments as one JSON line to $HIDHIDE_STUB_LOG (default:
+hidhide_stub.log). $HIDHIDE_STUB_DELAY seconds of sleep per invocation simulate the real CLI's
+cost; $HIDHIDE_STUB_EXIT sets the exit code.
+"""
+import json
+import os
+import sys
+import time
+
+def main(argv):
+    time.sleep(float(os.environ.get("HIDHIDE_STUB_DELAY", "0")))
+    with open(os.environ.get("HIDHIDE_STUB_LOG", "hidhide_stub.log"), "a") as f: f.write(json.dumps(argv) + "\n")
+    return int(os.environ.get("HIDHIDE_STUB_EXIT", "0"))
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
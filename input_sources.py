@@ -0,0 +1,198 @@
+import math
+import time
+
+from xinput_handler import XInputHandler
+
+class GamepadSnapshot:
+    """
+    Compact gamepad state in XInput units, independent of where it came from.
+    packet changes whenever the state changes (XInput's dwPacketNumber).
+    """
+    __slots__ = ("packet", "buttons", "lt", "rt", "lx", "ly", "rx", "ry")
+
+    def __init__(self, packet=0, buttons=0, lt=0, rt=0, lx=0, ly=0, rx=0, ry=0):
+        self.packet, self.buttons, self.lt, self.rt = packet, buttons, lt, rt
+        self.lx, self.ly, self.rx, self.ry = lx, ly, rx, ry
+
+    def as_tuple(self): return (self.packet, self.buttons, self.lt, self.rt, self.lx, self.ly, self.rx, self.ry)
+
+    def __repr__(self): return "GamepadSnapshot(%d, 0x%04x, %d, %d, %d, %d, %d, %d)" % self.as_tuple()
+
+def fill_from_xinput(snapshot, state):
+    """Copies an XINPUT_STATE into a snapshot (no allocation)."""
+    gamepad = state.Gamepad
+    snapshot.packet = state.dwPacketNumber
+    snapshot.buttons = gamepad.wButtons
+    snapshot.lt, snapshot.rt = gamepad.bLeftTrigger, gamepad.bRightTrigger
+    snapshot.lx, snapshot.ly = gamepad.sThumbLX, gamepad.sThumbLY
+    snapshot.rx, snapshot.ry = gamepad.sThumbRX, gamepad.sThumbRY
+    return snapshot
+
+class InputSource:
+    """
+    Something the mapping loop can poll once per tick.
+    poll() returns a GamepadSnapshot (the same object may be reused between calls), or None when disconnected.
+    """
+    name = "input"
+
+    def poll(self): raise NotImplementedError
+    def close(self): pass
+
+# --- XInput (Windows) ---
+class XInputSource(InputSource):
+    def __init__(self, port=0, xi=None):
+        self.port = port
+        self.xi = xi if xi is not None else XInputHandler()
+        self.snapshot = GamepadSnapshot()
+        self.name = f"XInput port {port}"
+
+    def poll(self):
+        state = self.xi.get_state(self.port)
+        if state is None: return None
+        return fill_from_xinput(self.snapshot, state)
+
+    @staticmethod
+    def find_connected_port(xi):
+        for port in range(4):
+            if xi.get_state(port): return port
+        return None
+
+# --- evdev (Linux) ---
+EV_KEY, EV_ABS = 0x01, 0x03
+ABS_X, ABS_Y, ABS_Z, ABS_RX, ABS_RY, ABS_RZ, ABS_HAT0X, ABS_HAT0Y = 0x00, 0x01, 0x02, 0x03, 0x04, 0x05, 0x10, 0x11
+# Key code -> XInput button mask (xpad layout; BTN_X/BTN_Y are the codes xpad uses for X/Y)
+EVDEV_BUTTONS = {
+    0x130: 0x1000, 0x131: 0x2000, 0x133: 0x4000, 0x134: 0x8000, # A B X Y
+    0x136: 0x0100, 0x137: 0x0200, # LB RB
+    0x13a: 0x0020, 0x13b: 0x0010, # Back Start
+    0x13d: 0x0040, 0x13e: 0x0080, # LS RS
+}
+
+class EvdevSource(InputSource):
+    """Reads a Linux gamepad through python-evdev (optional dependency)."""
+    def __init__(self, path=None):
+        try: import evdev
+        except ImportError: raise RuntimeError("EvdevSource needs the 'evdev' package (pip install evdev)")
+        if path is None:
+            for candidate in evdev.list_devices():
+                dev = evdev.InputDevice(candidate)
+                if EV_ABS in dev.capabilities() and ABS_X in dict(dev.capabilities()[EV_ABS]): path = candidate; dev.close(); break
+                dev.close()
+            if path is None: raise RuntimeError("EvdevSource: no gamepad found in /dev/input")
+        self.device = evdev.InputDevice(path)
+        self.name = f"evdev {self.device.name} ({path})"
+        self.snapshot = GamepadSnapshot()
+        # (offset, scale) to turn raw values into XInput ranges, from the device's absinfo
+        self._abs = {}
+        for code, info in self.device.capabilities().get(EV_ABS, []):
+            span = max(1, info.max - info.min)
+            if code in (ABS_Z, ABS_RZ): self._abs[code] = (info.min, 255.0 / span)
+            else: self._abs[code] = (info.min, 65535.0 / span)
+
+    def _stick(self, code, value, invert=False):
+        offset, scale = self._abs.get(code, (-32768, 1.0))
+        v = int((value - offset) * scale) - 32768
+        if invert: v = -1 - v # evdev Y points down, XInput Y points up
+        return max(-32768, min(32767, v))
+
+    def poll(self):
+        snap = self.snapshot
+        changed = False
+        while True:
+            try: event = self.device.read_one()
+            except BlockingIOError: break
+            except OSError: return None # Unplugged
+            if event is None: break
+            code, value = event.code, event.value
+            if event.type == EV_KEY:
+                mask = EVDEV_BUTTONS.get(code)
+                if mask is None: continue
+                snap.buttons = (snap.buttons | mask) if value else (snap.buttons & ~mask)
+            elif event.type == EV_ABS:
+                if code == ABS_X: snap.lx = self._stick(code, value)
+                elif code == ABS_Y: snap.ly = self._stick(code, value, True)
+                elif code == ABS_RX: snap.rx = self._stick(code, value)
+                elif code == ABS_RY: snap.ry = self._stick(code, value, True)
+                elif code in (ABS_Z, ABS_RZ):
+                    offset, scale = self._abs.get(code, (0, 1.0))
+                    trig = max(0, min(255, int((value - offset) * scale)))
+                    if code == ABS_Z: snap.lt = trig
+                    else: snap.rt = trig
+                elif code == ABS_HAT0X: snap.buttons = (snap.buttons & ~0x000C) | (0x0004 if value < 0 else 0x0008 if value > 0 else 0)
+                elif code == ABS_HAT0Y: snap.buttons = (snap.buttons & ~0x0003) | (0x0001 if value < 0 else 0x0002 if value > 0 else 0)
+                else: continue
+            else: continue
+            changed = True
+        if changed: snap.packet = (snap.packet + 1) & 0xFFFFFFFF
+        return snap
+
+    def close(self): self.device.close()
+
+# --- Replay / Synthetic ---
+class ReplaySource(InputSource):
+    """
+    Plays back recorded samples: (timestamp_seconds, packet, buttons, lt, rt, lx, ly, rx, ry).
+    realtime=False hands out one sample per poll() (offline, as fast as the caller goes).
+    realtime=True hands out the newest sample whose timestamp has been reached.
+    """
+    def __init__(self, samples, realtime=False, loop=False):
+        self.samples = samples
+        self.realtime = realtime
+        self.loop = loop
+        self.snapshot = GamepadSnapshot()
+        self.name = "replay"
+        self.rewind()
+
+    def rewind(self):
+        self.index = 0
+        self._t0 = None
+
+    @property
+    def finished(self): return not self.loop and self.index >= len(self.samples)
+
+    def poll(self):
+        samples = self.samples
+        count = len(samples)
+        if count == 0: return None
+        if self.index >= count:
+            if not self.loop: return None
+            self.rewind()
+        if self.realtime:
+            now = time.perf_counter()
+            if self._t0 is None: self._t0 = now - samples[0][0]
+            elapsed = now - self._t0
+            while self.index + 1 < count and samples[self.index + 1][0] <= elapsed: self.index += 1
+            sample = samples[self.index]
+            if self.index + 1 >= count: self.index = count
+        else:
+            sample = samples[self.index]
+            self.index += 1
+        snap = self.snapshot
+        (_, snap.packet, snap.buttons, snap.lt, snap.rt, snap.lx, snap.ly, snap.rx, snap.ry) = sample
+        return snap
+
+class SyntheticSource(InputSource):
+    """
+    Stand-in input: a pad that slowly circles the left stick and sweeps the right trigger.
+    duty < 1.0 leaves the pad untouched for the rest of each period (to exercise idle handling).
+    """
+    def __init__(self, period=4.0, duty=1.0):
+        self.period = period
+        self.duty = duty
+        self.snapshot = GamepadSnapshot()
+        self.name = "synthetic"
+        self._t0 = time.perf_counter()
+
+    def poll(self):
+        phase = ((time.perf_counter() - self._t0) / self.period) % 1.0
+        if phase >= self.duty: return self.snapshot
+        angle = 2.0 * math.pi * phase
+        snap = self.snapshot
+        lx, ly = int(32767 * math.sin(angle)), int(32767 * math.cos(angle))
+        if lx != snap.lx or ly != snap.ly:
+            snap.lx, snap.ly = lx, ly
+            snap.rt = int(255 * (0.5 + 0.5 * math.sin(angle)))
+            snap.packet = (snap.packet + 1) & 0xFFFFFFFF
+        return snap
+
+INPUT_SOURCES = {"xinput": XInputSource, "evdev": EvdevSource, "synthetic": SyntheticSource}
@@ -0,0 +1,123 @@
+import mmap
+import os
+import struct
+import time
+
+from input_sources import InputSource, ReplaySource
+
+# File = header + fixed-size records, all little-endian
+TRACE_MAGIC = b"XIVTRACE"
+TRACE_VERSION = 1
+HEADER = struct.Struct("<8sHHI")        # magic, version, record size, reserved
+RECORD = struct.Struct("<qIHBBhhhh")    # t_ns, packet, buttons, lt, rt, lx, ly, rx, ry
+TRACE_EXTENSION = ".xtrace"
+
+class TraceWriter:
+    """Appends one fixed-size record per sample. Records are packed into a preallocated buffer and written in blocks."""
+    def __init__(self, path, block_records=1024):
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(TRACE_MAGIC, TRACE_VERSION, RECORD.size, 0))
+        self._buffer = bytearray(RECORD.size * block_records)
+        self._block_records = block_records
+        self._pending = 0
+        self.count = 0
+
+    def write(self, t_ns, snapshot):
+        RECORD.pack_into(self._buffer, self._pending * RECORD.size, t_ns, snapshot.packet, snapshot.buttons,
+                         snapshot.lt, snapshot.rt, snapshot.lx, snapshot.ly, snapshot.rx, snapshot.ry)
+        self._pending += 1
+        self.count += 1
+        if self._pending == self._block_records: self.flush()
+
+    def flush(self):
+        if self._pending:
+            self.file.write(memoryview(self._buffer)[:self._pending * RECORD.size])
+            self._pending = 0
+        self.file.flush()
+
+    def close(self):
+        if self.file.closed: return
+        self.flush()
+        self.file.close()
+
+class TraceReader:
+    """
+    Memory-maps a trace. Behaves like a read-only sequence of samples in ReplaySource format:
+    (timestamp_seconds, packet, buttons, lt, rt, lx, ly, rx, ry).
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if size < HEADER.size: raise ValueError(f"{path}: not a trace file (too short)")
+        self._map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, _ = HEADER.unpack_from(self._map, 0)
+        if magic != TRACE_MAGIC: raise ValueError(f"{path}: not a trace file")
+        if version != TRACE_VERSION or record_size != RECORD.size: raise ValueError(f"{path}: unsupported trace version {version}")
+        self._count = (size - HEADER.size) // RECORD.size
+
+    def __len__(self): return self._count
+
+    def __getitem__(self, index):
+        if index < 0: index += self._count
+        if not 0 <= index < self._count: raise IndexError(index)
+        t_ns, *rest = RECORD.unpack_from(self._map, HEADER.size + index * RECORD.size)
+        return (t_ns / 1e9, *rest)
+
+    def raw(self, index):
+        """The record as stored (integer nanosecond timestamp)."""
+        return RECORD.unpack_from(self._map, HEADER.size + index * RECORD.size)
+
+    def iter_raw(self):
+        return RECORD.iter_unpack(memoryview(self._map)[HEADER.size:HEADER.size + self._count * RECORD.size])
+
+    @property
+    def duration(self): return self.raw(self._count - 1)[0] / 1e9 if self._count else 0.0
+
+    def close(self):
+        self._map.close()
+        self.file.close()
+
+class RecordingSource(InputSource):
+    """Wraps another source and records every snapshot it returns (disconnected polls are skipped)."""
+    def __init__(self, source, writer):
+        self.source = source
+        self.writer = writer
+        self.name = f"{source.name} (recording to {writer.path})"
+        self._t0 = None
+
+    def poll(self):
+        snapshot = self.source.poll()
+        if snapshot is not None:
+            now = time.perf_counter_ns()
+            if self._t0 is None: self._t0 = now
+            self.writer.write(now - self._t0, snapshot)
+        return snapshot
+
+    def close(self):
+        self.writer.close()
+        self.source.close()
+
+def new_trace_path(folder="traces"):
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, time.strftime("trace_%Y%m%d_%H%M%S") + TRACE_EXTENSION)
+
+def replay_through_engine(trace, mapper):
+    """
+    Feeds a whole trace through a MappingEngine as fast as possible, with dt taken from the
+    recorded timestamps (so time-dependent scripts see the original timing).
+    Returns (samples, wall_seconds, trace_seconds).
+    """
+    source = ReplaySource(trace)
+    mapper.reset_output_state()
+    count = len(trace)
+    start = time.perf_counter()
+    last_t = trace[0][0] if count else 0.0
+    update_vjoy = mapper.update_vjoy
+    for i in range(count):
+        t = trace[i][0]
+        update_vjoy(source.poll(), t - last_t)
+        last_t = t
+    wall = time.perf_counter() - start
+    return count, wall, (trace[count - 1][0] - trace[0][0]) if count else 0.0
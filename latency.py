@@ -0,0 +1,97 @@
+import json
+import os
+import time
+from array import array
+
+# Log-linear buckets: values below SUB_BUCKETS are exact; above, every power of two is split into
+# SUB_BUCKETS linear steps, so any recorded value is off by at most ~3% (1/SUB_BUCKETS).
+SUB_BITS = 5
+SUB_BUCKETS = 1 << SUB_BITS
+MAX_SHIFT = 36 # Largest magnitude: (2 * SUB_BUCKETS) << MAX_SHIFT ns, about 37 minutes
+BUCKET_COUNT = (MAX_SHIFT + 2) * SUB_BUCKETS
+
+def bucket_index(ns):
+    if ns < SUB_BUCKETS: return ns if ns > 0 else 0
+    shift = ns.bit_length() - SUB_BITS - 1
+    if shift > MAX_SHIFT: return BUCKET_COUNT - 1
+    return (shift + 1) * SUB_BUCKETS + (ns >> shift) - SUB_BUCKETS
+
+def bucket_upper(index):
+    """Highest value (ns) that lands in the bucket."""
+    if index < SUB_BUCKETS: return index
+    shift = index // SUB_BUCKETS - 1
+    return ((index % SUB_BUCKETS + SUB_BUCKETS + 1) << shift) - 1
+
+class LatencyHistogram:
+    """HDR-style histogram of durations in nanoseconds. Recording is a couple of integer ops and doesn't allocate."""
+    def __init__(self):
+        self.counts = array("Q", bytes(8 * BUCKET_COUNT))
+        self.reset()
+
+    def reset(self):
+        self.counts[:] = array("Q", bytes(8 * BUCKET_COUNT))
+        self.total = 0
+        self.sum_ns = 0
+        self.max_ns = 0
+
+    def record_ns(self, ns):
+        self.counts[bucket_index(ns)] += 1
+        self.total += 1
+        self.sum_ns += ns
+        if ns > self.max_ns: self.max_ns = ns
+
+    def record(self, seconds): self.record_ns(int(seconds * 1e9))
+
+    @property
+    def max_us(self): return self.max_ns / 1000.0
+
+    def percentile(self, p):
+        """p-th percentile in microseconds (upper edge of its bucket)."""
+        if not self.total: return 0.0
+        target = p / 100.0 * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if not count: continue
+            seen += count
+            if seen >= target: return min(self.max_ns, bucket_upper(i)) / 1000.0
+        return self.max_us
+
+    def summary(self):
+        return {"count": self.total, "mean_us": round(self.sum_ns / self.total / 1000.0, 2) if self.total else 0.0,
+                "p50_us": self.percentile(50), "p90_us": self.percentile(90), "p99_us": self.percentile(99),
+                "p999_us": self.percentile(99.9), "max_us": self.max_us}
+
+class LatencyRecorder:
+    """
+    One histogram per point of a tick, in tick order:
+      read   - the input source's poll (XInputHandler.get_state)
+      <name> - each pipeline stage (stick, trigger and script stages)
+      output - vJoy writes (set_button/set_axis/flush) and telemetry
+      total  - from the input read returning to the last vJoy write
+    Only ticks where the pipeline runs (new input, or a time-dependent script still moving) are timed.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.histograms = {"read": LatencyHistogram()}
+        self.stage_end = 0 # perf_counter_ns() when the last pipeline stage returned (0 = stages didn't run)
+
+    def histogram(self, name):
+        hist = self.histograms.get(name)
+        if hist is None: hist = self.histograms[name] = LatencyHistogram()
+        return hist
+
+    def reset(self):
+        for hist in self.histograms.values(): hist.reset()
+
+    def summary(self):
+        return {name: hist.summary() for name, hist in self.histograms.items() if hist.total}
+
+def new_dump_path(folder="latency"):
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, time.strftime("latency_%Y%m%d_%H%M%S.json"))
+
+def dump_summaries(summaries, path=None):
+    """Writes {binding name: recorder summary} as JSON. Returns the path."""
+    path = path or new_dump_path()
+    with open(path, "w") as f: json.dump(summaries, f, indent=2)
+    return path
@@ -0,0 +1,219 @@
+"""
+The mapping loop in its own process, so Tk (and the GIL it holds while drawing) can't add jitter.
+
+    GUI: LoopClient  --pipe: profile configs, start/stop/switch-->  loop process: serve()
+                     <--pipe: ready / status / stopped------------
+                     <==shared memory: TelemetryRing (every tick)==
+
+The loop process owns vJoy, the input source, compiling and the hotkeys. The GUI only edits configs
+and sends the ones that changed; everything it shows comes from the telemetry block or status messages.
+"""
+import multiprocessing
+import os
+import sys
+from multiprocessing import shared_memory
+
+from input_sources import XInputSource, SyntheticSource
+from input_trace import RecordingSource, TraceWriter
+from mapping_engine import MappingEngine
+from mapping_loop import MappingLoop
+from telemetry import TelemetryRing, DEFAULT_SLOTS
+from vjoy_output import FakeVJoyDevice
+from xinput_handler import XInputHandler
+
+STATUS_INTERVAL = 0.25 # Seconds between status messages while running
+HIGH_PRIORITY_CLASS, NORMAL_PRIORITY_CLASS = 0x80, 0x20
+
+def set_process_priority(high=False, cpus=()):
+    """Sets this process's priority (high or normal) and CPU affinity (cpus, or all when empty). Returns a list of problems."""
+    problems = []
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            handle = kernel32.GetCurrentProcess()
+            if not kernel32.SetPriorityClass(handle, HIGH_PRIORITY_CLASS if high else NORMAL_PRIORITY_CLASS): problems.append("could not set the priority class")
+            process_mask, system_mask = ctypes.c_size_t(), ctypes.c_size_t()
+            kernel32.GetProcessAffinityMask(handle, ctypes.byref(process_mask), ctypes.byref(system_mask))
+            mask = sum(1 << cpu for cpu in cpus) & system_mask.value if cpus else system_mask.value
+            if not mask or not kernel32.SetProcessAffinityMask(handle, ctypes.c_size_t(mask)): problems.append(f"could not pin to CPUs {list(cpus)}")
+        else:
+            os.setpriority(os.PRIO_PROCESS, 0, -10 if high else 0)
+    except (OSError, AttributeError) as e: problems.append(f"priority: {e}")
+    if sys.platform != "win32" and hasattr(os, "sched_setaffinity"):
+        try: os.sched_setaffinity(0, cpus or range(os.cpu_count() or 1))
+        except OSError as e: problems.append(f"CPU affinity {list(cpus)}: {e}")
+    return problems
+
+# --- Loop process ---
+def serve(conn, shm_name, options):
+    """
+    Entry point of the loop process. options: profile_path, profile_dir, vjoy_device, fake (synthetic input + stand-in vJoy).
+    Commands: ("profiles", {name: (path, config)}), ("switch", name), ("start", {"port", "record"}), ("stop",), ("quit",).
+    """
+    shm = shared_memory.SharedMemory(name=shm_name) # The GUI created it and unlinks it; we share its resource tracker
+    fake = options.get("fake", False)
+    mapper = MappingEngine(options.get("vjoy_device", 1), vjoy_device=FakeVJoyDevice() if fake else None,
+                           profile_path=options.get("profile_path", ""), profile_dir=options.get("profile_dir"))
+    if fake: mapper.vjoy_device.record = False
+    mapper.telemetry = TelemetryRing(options.get("slots", DEFAULT_SLOTS), buffer=shm.buf)
+    loop = MappingLoop()
+    xi = None
+    applied_priority = (False, ())
+    handled = 0 # Commands handled so far; lets the GUI ignore status that predates its last command
+    conn.send(("ready", {"vjoy_active": mapper.vjoy_active, "pid": os.getpid()}))
+    def status():
+        stats = loop.stats() if loop.bindings else {}
+        stats.update(running=loop.is_running, active_profile=mapper.active_profile, commands=handled,
+                     latency=mapper.latency.summary() if mapper.latency.enabled else None)
+        return stats
+    try:
+        while True:
+            if not conn.poll(STATUS_INTERVAL if loop.is_running else None):
+                conn.send(("status", status()))
+                continue
+            command, *args = conn.recv()
+            handled += 1
+            if command == "profiles":
+                # Compiled here, on this thread; the loop thread just picks up the result at its next tick
+                for name, (path, config) in args[0].items():
+                    mapper.profiles[name] = config
+                    mapper.profile_paths[name] = path
+                mapper.select_profile(mapper.profile_name)
+                mapper.refresh_pipeline()
+            elif command == "switch":
+                mapper.refresh_pipeline()
+                mapper.switch_profile(args[0])
+            elif command == "start" and not loop.is_running:
+                settings = args[0]
+                mapper.refresh_pipeline()
+                gs = mapper.requested.profile.global_settings
+                wanted = (gs.high_priority, gs.cpu_affinity)
+                if wanted != applied_priority:
+                    for problem in set_process_priority(*wanted): print(f"Loop Process: {problem}")
+                    applied_priority = wanted
+                if fake: source = SyntheticSource()
+                else:
+                    if xi is None: xi = XInputHandler()
+                    source = XInputSource(settings["port"], xi)
+                if settings.get("record"):
+                    source = RecordingSource(source, TraceWriter(settings["record"]))
+                    print(f"Recording input trace to {settings['record']}")
+                loop.bindings = []
+                loop.add_binding(source, mapper)
+                mapper.bind_hotkeys()
+                loop.start()
+            elif command == "stop":
+                loop.stop()
+                loop.close_sources()
+                mapper.unbind_hotkeys()
+                conn.send(("stopped", status()))
+            elif command == "quit": break
+    except (EOFError, OSError): pass # The GUI went away
+    finally:
+        loop.stop()
+        if loop.bindings: loop.close_sources()
+        mapper.unbind_hotkeys()
+        mapper.telemetry.release()
+        shm.close()
+
+# --- GUI side ---
+def start_without_main(process):
+    """
+    Starts a spawn Process with this module as the child's __main__. Spawn otherwise re-imports the parent's
+    __main__ in the child (for app_main: tkinter, winreg, pythoncom) just to run serve().
+    """
+    main = sys.modules["__main__"]
+    sys.modules["__main__"] = sys.modules[__name__]
+    try: process.start()
+    finally: sys.modules["__main__"] = main
+
+class LoopClient:
+    """
+    Starts the loop process and talks to it. Nothing here blocks on the loop: commands are pipe sends,
+    telemetry is read straight from shared memory, and pump() (call it from the UI's timer) takes in status.
+    """
+    def __init__(self, options=None, slots=DEFAULT_SLOTS):
+        options = dict(options or {}, slots=slots)
+        self.shm = shared_memory.SharedMemory(create=True, size=TelemetryRing.buffer_size(slots))
+        self.telemetry = TelemetryRing(slots, buffer=self.shm.buf)
+        ctx = multiprocessing.get_context("spawn")
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=serve, args=(child_conn, self.shm.name, options), name="mapping-loop", daemon=True)
+        start_without_main(self.process)
+        child_conn.close()
+        self.ready = None
+        self.status = {}
+        self.running = False
+        self._sent = {} # Profile name -> repr of the config last sent
+        self._commands = 0
+
+    def wait_ready(self, timeout=15.0):
+        """Blocks until the loop process has opened vJoy. Returns its ready info, or None if it didn't start."""
+        try:
+            if self.ready is None and self.conn.poll(timeout): self._handle(self.conn.recv())
+        except (EOFError, OSError): pass
+        return self.ready
+
+    @property
+    def vjoy_active(self): return bool(self.ready and self.ready["vjoy_active"])
+
+    @property
+    def alive(self): return self.process.is_alive()
+
+    def pump(self):
+        """Handles every message waiting from the loop process."""
+        try:
+            while self.conn.poll(): self._handle(self.conn.recv())
+        except (EOFError, OSError): self.running = False
+
+    def _handle(self, message):
+        kind, data = message
+        if kind == "ready": self.ready = data
+        elif kind == "status": self.status = data
+        elif kind == "stopped": self.status = data; self.running = False
+
+    def _send(self, *message):
+        try: self.conn.send(message)
+        except (OSError, ValueError) as e: print(f"Loop Process Error: {e}"); return False
+        self._commands += 1
+        return True
+
+    def send_profiles(self, mapper):
+        """Sends the profiles whose config changed since the last call (the loop process compiles them)."""
+        changed = {}
+        for name, config in mapper.profiles.items():
+            key = repr(config)
+            if self._sent.get(name) != key:
+                changed[name] = (mapper.profile_paths[name], config)
+                self._sent[name] = key
+        if changed: self._send("profiles", changed)
+        return bool(changed)
+
+    def switch_profile(self, name): self._send("switch", name)
+
+    @property
+    def active_profile(self):
+        """Profile the loop is running, or None until it has caught up with the commands sent so far."""
+        if self.status.get("commands", 0) < self._commands: return None
+        return self.status.get("active_profile")
+
+    def start(self, port, record=None):
+        self.status = {}
+        self.running = self._send("start", {"port": port, "record": record})
+
+    def stop(self):
+        self._send("stop")
+        self.running = False
+
+    def stats(self):
+        """Latest status from the loop process: MappingLoop.stats() plus running/active_profile/latency."""
+        return self.status
+
+    def close(self, timeout=3.0):
+        self._send("quit")
+        self.process.join(timeout)
+        if self.process.is_alive(): self.process.terminate()
+        self.telemetry.release()
+        self.shm.close()
+        self.shm.unlink()
@@ -1,101 +1,197 @@
+import hashlib
 import json
 import math
+from array import array
+import operator
 import os
 import sys
-import pyvjoy
+import threading
+import time
 from hidhide_handler import HidHideHandler
+from vjoy_output import create_output
+from latency import LatencyRecorder
+from axis_filters import create_filter
+from mapping_kernel import kernel
+from mapping_scripts import SCRIPTS
+from profile_schema import parse_profile, XINPUT_MASKS
+from profile_store import WRITER, read_cache
+from telemetry import TelemetryRing, AXIS_ORDER, AXIS_INDEX
+
+try: import pyvjoy
+except ImportError: pyvjoy = None # Headless/Linux runs use a stand-in device
+
+try: import keyboard
+except ImportError: keyboard = None # Optional: system-wide profile hotkeys
 
 DEFAULT_PROFILE = "mapping_profile.json"
+PROFILE_DIR = "profiles" # Extra named profiles: profiles/<name>.json
+DEFAULT_PROFILE_NAME = "Default" # Name of the profile loaded from profile_path
 
+# HID usages (same values as pyvjoy.HID_USAGE_*)
 VJOY_AXES = {
-    "X": pyvjoy.HID_USAGE_X, "Y": pyvjoy.HID_USAGE_Y, "Z": pyvjoy.HID_USAGE_Z,
-    "RX": pyvjoy.HID_USAGE_RX, "RY": pyvjoy.HID_USAGE_RY, "RZ": pyvjoy.HID_USAGE_RZ,
-    "SL0": pyvjoy.HID_USAGE_SL0, "SL1": pyvjoy.HID_USAGE_SL1,
+    "X": 0x30, "Y": 0x31, "Z": 0x32,
+    "RX": 0x33, "RY": 0x34, "RZ": 0x35,
+    "SL0": 0x36, "SL1": 0x37,
 }
 
-class WindingStickLogic:
-    def __init__(self):
-        self.current_winding_angle = 0.0
-        self.previous_stick_pos = (0.0, 0.0)
+VJOY_AXIS_SLOTS = {name: (usage, AXIS_INDEX[name]) for name, usage in VJOY_AXES.items()}
 
-    def process(self, stick_x, stick_y, dt, config):
-        try:
-            w_range = float(config.get("range", 900.0))
-            buffer = float(config.get("buffer", 45.0))
-            unwind_rate = float(config.get("unwind", 1800.0))
-        except: return 0.0
-        sx, sy = stick_x / 32768.0, stick_y / 32768.0
-        mag = math.sqrt(sx**2 + sy**2)
-        if mag > 0.1 and self.previous_stick_pos != (0.0, 0.0):
-            current_angle = math.atan2(-sx, sy) * 180.0 / math.pi
-            prev_angle = math.atan2(-self.previous_stick_pos[0], self.previous_stick_pos[1]) * 180.0 / math.pi
-            diff = (current_angle - prev_angle + 180) % 360 - 180
-            self.current_winding_angle += diff * mag
-        if mag < 0.95:
-            unwind_factor = 1.0 - mag
-            unwind_amt = unwind_rate * unwind_factor * dt
-            if abs(unwind_amt) >= abs(self.current_winding_angle): self.current_winding_angle = 0.0
-            else: self.current_winding_angle -= unwind_amt * (1.0 if self.current_winding_angle > 0 else -1.0)
-        max_angle = (w_range / 2.0) + buffer
-        self.current_winding_angle = max(min(self.current_winding_angle, max_angle), -max_angle)
-        output = self.current_winding_angle * 2.0 / w_range
-        self.previous_stick_pos = (sx, sy) if mag > 0.1 else (0.0, 0.0)
-        return max(-1.0, min(1.0, output))
+# How often (seconds) the UI publishes profile edits to the running loop (see MappingEngine.refresh_pipeline)
+CONFIG_CHECK_INTERVAL = 0.1
+
+# Compiled button loop for update_vjoy (see mapping_kernel), or None for the Python one
+kernel_map_buttons = kernel.map_buttons if kernel is not None else None
+
+def float_to_vjoy(f_val): return int((max(-1.0, min(1.0, f_val)) + 1.0) * 16383.5 + 1)
+def vjoy_to_float(v_val): return (v_val - 1) / 16383.5 - 1.0
+
+class CompiledProfile:
+    """One profile ready to run: its stages, button map and what update_vjoy needs to know about them. Settings never change once built."""
+    __slots__ = ("name", "key", "profile", "stages", "button_map", "lut_active", "range_fold", "time_dependent", "settlers", "states", "filters", "luts")
+
+    def __init__(self, name, key, profile):
+        self.name, self.key, self.profile = name, key, profile
+        self.stages, self.button_map, self.settlers = [], [], [] # settlers: time-dependent stages' state objects; each has .settled
+        self.luts = {} # LUT cache key -> table, for the compiled cache
+        self.lut_active = profile.global_settings.use_lut
+        self.range_fold = None
+        self.time_dependent = False
+        self.states = {} # Script key -> its state object (see mapping_scripts), handed over on a switch
+        self.filters = [] # Axis filters (see axis_filters), reset whenever the profile is installed
 
 class MappingEngine:
-    def __init__(self, vjoy_device_id=1):
+    """
+    Named profiles live in self.profiles (name -> config dict); self.config is the one the UI edits.
+    Each profile is compiled ahead of time into a CompiledProfile by refresh_pipeline(), on the thread
+    that edits the configs. switch_profile() only points self.requested at another compiled profile;
+    update_vjoy() swaps it in at the start of a tick, so a switch never tears, stalls or restarts the loop.
+    """
+    def __init__(self, vjoy_device_id=1, vjoy_device=None, profile_path=DEFAULT_PROFILE, profile_dir=None, open_vjoy=True):
         self.vjoy_active = False
-        try:
-            self.vjoy_device = pyvjoy.VJoyDevice(vjoy_device_id)
-            self.vjoy_active = True
-        except Exception as e:
-            print(f"vJoy Init Failed: {e}")
-            self.vjoy_device = None
+        self.vjoy_device = vjoy_device
+        self.vjoy_device_id = vjoy_device_id
+        self.profile_path = profile_path
+        self.profile_dir = profile_dir
+        if self.vjoy_device is None and open_vjoy: # open_vjoy=False: config-only engine (the GUI, when another process maps)
+            try:
+                if pyvjoy is None: raise RuntimeError("pyvjoy is not installed")
+                self.vjoy_device = pyvjoy.VJoyDevice(vjoy_device_id)
+            except Exception as e: print(f"vJoy Init Failed: {e}")
+        self.vjoy_active = self.vjoy_device is not None
+        self.output = create_output(self.vjoy_device) if self.vjoy_active else None
+        if kernel is not None: # Compiled curves (see mapping_kernel): same results bit for bit, so LUTs and caches are unchanged
+            self.apply_deadzone_stick, self.apply_deadzone_trigger, self.squarify = kernel.deadzone_stick, kernel.deadzone_trigger, kernel.squarify
 
+        self.config_errors = {}
+        self._lut_cache = {}
+        self._cached_keys = {} # Profile name -> repr(config) its compiled cache file holds
+        self.cache_fingerprint = curve_fingerprint(self)
         self.config = self.load_config()
-        self.winding_logic = WindingStickLogic()
+        self.profile = parse_profile(self.config) # Typed view of the running profile
+        self.profile_name = DEFAULT_PROFILE_NAME # Which profile self.config is
+        self.profiles = {DEFAULT_PROFILE_NAME: self.config}
+        self.profile_paths = {DEFAULT_PROFILE_NAME: profile_path}
+        if profile_dir: self.load_profiles(profile_dir)
         self.hidhide = HidHideHandler(self.config.get("hidhide_path", ""))
         
-        # Live Data for Viewer
-        self.latest_output = {"axes": {}, "buttons": []}
+        # Live Data for Viewer (written every tick without allocating)
+        self.telemetry = TelemetryRing()
+        self.latency = LatencyRecorder() # Filled only while global_settings.instrument_latency is on
+        self._tick_out = {}
+        self._tick_axes = array("q", bytes(8 * len(AXIS_ORDER)))
+        self._no_axes = array("q", bytes(8 * len(AXIS_ORDER)))
+
+        # Compiled profiles (rebuilt only when their config changes)
+        self.compiled_profiles = {}
+        self.requested = None # What the worker should run; set by refresh_pipeline()/switch_profile()
+        self.compiled = None # What the worker is running
+        self._switch_lock = threading.Lock()
+        self._combos = () # (button mask, profile name) for profiles with a switching.combo
+        self._combo_buttons = 0
+        self._hotkeys = None # keyboard hotkey handles while bound
+        self._hotkey_specs = ()
+        self.idle = False # Last update_vjoy() had nothing new to write (see MappingLoop adaptive polling)
+
+        # Change detection: last packet seen and last value written per vJoy output
+        self.driver_calls_issued = 0
+        self.driver_calls_skipped = 0
+        self.reset_output_state()
         
-    def load_config(self):
+    def load_config(self, path=None, name=DEFAULT_PROFILE_NAME):
+        path = self.profile_path if path is None else path
         config = self.get_default_config()
-        if os.path.exists(DEFAULT_PROFILE):
+        if os.path.exists(path):
             try:
-                with open(DEFAULT_PROFILE, "r") as f:
-                    loaded = json.load(f)
-                    self._recursive_update(config, loaded)
-            except: pass
+                with open(path, "rb") as f: data = f.read()
+                cached = read_cache(path, data, self.cache_fingerprint) # Skips parsing, merging and LUT building
+                loaded = None if cached else json.loads(data)
+            except (OSError, ValueError) as e:
+                print(f"Profile Error: Could not read {path}, using defaults ({e})")
+                cached = loaded = None
+            if cached:
+                config, luts = cached
+                self._lut_cache.update(luts)
+                self._cached_keys[name] = repr(config)
+            elif isinstance(loaded, dict): self._recursive_update(config, loaded)
+            elif loaded is not None: print(f"Profile Error: {path} is not a profile object, using defaults")
+        self.report_config_errors(parse_profile(config).errors, name)
         return config
 
+    def load_profiles(self, folder):
+        """Adds every <name>.json in folder as a named profile."""
+        if not os.path.isdir(folder): return
+        for file_name in sorted(os.listdir(folder)):
+            name, ext = os.path.splitext(file_name)
+            if ext.lower() != ".json" or name in self.profiles: continue
+            path = os.path.join(folder, file_name)
+            self.profiles[name] = self.load_config(path, name)
+            self.profile_paths[name] = path
+
+    def add_profile(self, name, config):
+        """Saves config as a new named profile in profile_dir. It is compiled by the next refresh_pipeline()."""
+        name = name.strip()
+        if not name or name in self.profiles or not all(c.isalnum() or c in " -_" for c in name):
+            raise ValueError(f"'{name}' can't be used as a profile name")
+        folder = self.profile_dir or PROFILE_DIR
+        os.makedirs(folder, exist_ok=True)
+        self.profiles[name] = config
+        self.profile_paths[name] = os.path.join(folder, f"{name}.json")
+        self.save_config(name)
+
+    def report_config_errors(self, errors, name=DEFAULT_PROFILE_NAME):
+        """Prints profile problems (field path + message) when they change."""
+        if errors == self.config_errors.get(name, []): return
+        self.config_errors[name] = errors
+        where = "" if name == DEFAULT_PROFILE_NAME else f"[{name}] "
+        for path, message in errors: print(f"Profile Error: {where}{path}: {message}")
+
     def _recursive_update(self, default, loaded):
         for key, value in loaded.items():
             if key in default and isinstance(default[key], dict) and isinstance(value, dict):
                 self._recursive_update(default[key], value)
             else: default[key] = value
 
-    def save_config(self):
-        self.config["hidhide_path"] = self.hidhide.cli_path
-        with open(DEFAULT_PROFILE, "w") as f:
-            json.dump(self.config, f, indent=4)
-        print("Configuration Saved.")
+    def save_config(self, name=None):
+        """Saves a named profile (default: the one being edited) in the background; see profile_store.ProfileWriter."""
+        config, path = (self.config, self.profile_path) if name is None else (self.profiles[name], self.profile_paths[name])
+        config["hidhide_path"] = self.hidhide.cli_path
+        WRITER.save(path, config)
 
     def apply_hiding(self):
-        if not self.hidhide.is_installed(): return
-        self.hidhide.whitelist_application(sys.executable)
-        devices = self.config.get("hidden_devices", [])
-        if devices: self.hidhide.hide_devices(devices)
-        self.hidhide.set_cloaking(True)
-        print("HidHide: Devices Hidden.")
+        """Whitelists us, hides the profile's devices and turns cloaking on, on the HidHide worker thread. Returns a Future (None if HidHide is missing)."""
+        if not self.hidhide.is_installed(): return None
+        future = self.hidhide.apply_async([sys.executable], self.config.get("hidden_devices", []), True)
+        future.add_done_callback(lambda f: print("HidHide: Devices Hidden." if f.result() else "HidHide: Some commands failed."))
+        return future
 
     def disable_hiding(self):
-        if not self.hidhide.is_installed(): return
-        self.hidhide.set_cloaking(False)
-        print("HidHide: Cloaking Disabled.")
+        if not self.hidhide.is_installed(): return None
+        future = self.hidhide.set_cloaking_async(False)
+        future.add_done_callback(lambda f: print("HidHide: Cloaking Disabled." if f.result() else "HidHide: Could not disable cloaking."))
+        return future
 
     def reset_to_defaults(self):
-        self.config = self.get_default_config()
+        self.config = self.profiles[self.profile_name] = self.get_default_config() # Keep the named profile pointing at what the UI edits
         self.save_config()
 
     def unmap_all(self):
@@ -105,10 +201,11 @@ class MappingEngine:
 
     def get_default_config(self):
         return {
-            "global_settings": { "update_rate": 1000 },
+            "global_settings": { "update_rate": 1000, "use_lut": False, "output_mode": "per_call", "scheduler_mode": "hybrid", "spin_window_us": 2000, "adaptive_polling": False, "idle_rate": 125, "idle_after_ms": 100, "instrument_latency": False, "profile_cache": False, "high_priority": False, "cpu_affinity": [] },
             "hidhide_path": r"C:\Program Files\Nefarius Software Solutions\HidHide\x64\HidHideCLI.exe",
             "hidden_devices": [],
             "use_hidhide": True,
+            "switching": { "hotkey": "", "combo": [] },
             "scripts": {
                 "winding_steering": { "enabled_for": "Disabled", "target_axis": "X", "range": "900", "buffer": "45", "unwind": "1800" },
                 "range_modifier": { "enabled": False, "modifier_key": "X", "mute_key": False, "modified_axis": "X", "press_mult": 1.0, "release_mult": 0.5 },
@@ -119,12 +216,12 @@ class MappingEngine:
                 "LS_Click": 9, "RS_Click": 10, "DPad_Up": 11, "DPad_Down": 12, "DPad_Left": 13, "DPad_Right": 14
             },
             "axes": {
-                "LT": {"target": "Z", "dz_in": 0.0, "dz_out": 0.0, "start": -1.0, "end": 1.0, "lin": 0},
-                "RT": {"target": "RZ", "dz_in": 0.0, "dz_out": 0.0, "start": -1.0, "end": 1.0, "lin": 0},
-                "LX": {"target": "X", "dz_in": 0.0, "dz_out": 0.0, "anti_dz": 0.0, "lin": 0, "inv": False, "square": False},
-                "LY": {"target": "Y", "dz_in": 0.0, "dz_out": 0.0, "anti_dz": 0.0, "lin": 0, "inv": False, "square": False},
-                "RX": {"target": "RX", "dz_in": 0.0, "dz_out": 0.0, "anti_dz": 0.0, "lin": 0, "inv": False, "square": False},
-                "RY": {"target": "RY", "dz_in": 0.0, "dz_out": 0.0, "anti_dz": 0.0, "lin": 0, "inv": False, "square": False}
+                "LT": {"target": "Z", "dz_in": 0.0, "dz_out": 0.0, "start": -1.0, "end": 1.0, "lin": 0, "filter": "none", "filter_cutoff": 5.0, "filter_beta": 1.0, "filter_size": 5},
+                "RT": {"target": "RZ", "dz_in": 0.0, "dz_out": 0.0, "start": -1.0, "end": 1.0, "lin": 0, "filter": "none", "filter_cutoff": 5.0, "filter_beta": 1.0, "filter_size": 5},
+                "LX": {"target": "X", "dz_in": 0.0, "dz_out": 0.0, "anti_dz": 0.0, "lin": 0, "inv": False, "square": False, "filter": "none", "filter_cutoff": 5.0, "filter_beta": 1.0, "filter_size": 5},
+                "LY": {"target": "Y", "dz_in": 0.0, "dz_out": 0.0, "anti_dz": 0.0, "lin": 0, "inv": False, "square": False, "filter": "none", "filter_cutoff": 5.0, "filter_beta": 1.0, "filter_size": 5},
+                "RX": {"target": "RX", "dz_in": 0.0, "dz_out": 0.0, "anti_dz": 0.0, "lin": 0, "inv": False, "square": False, "filter": "none", "filter_cutoff": 5.0, "filter_beta": 1.0, "filter_size": 5},
+                "RY": {"target": "RY", "dz_in": 0.0, "dz_out": 0.0, "anti_dz": 0.0, "lin": 0, "inv": False, "square": False, "filter": "none", "filter_cutoff": 5.0, "filter_beta": 1.0, "filter_size": 5}
             }
         }
 
@@ -162,89 +259,452 @@ class MappingEngine:
         scale = mag / max_c
         return max(-1.0, min(1.0, nx * scale)), max(-1.0, min(1.0, ny * scale))
 
-    def update_vjoy(self, xinput_state, dt):
+    # --- COMPILED PIPELINE ---
+    def refresh_pipeline(self, force=False):
+        """
+        Follows switches made from other threads, then recompiles every profile whose config changed since it
+        was compiled (all of them on the first call). Call it from the thread that edits the configs (the UI);
+        the worker only ever sees finished CompiledProfiles. Returns True if anything was recompiled.
+        """
+        requested = self.requested
+        if requested is not None and requested.name != self.profile_name: self.select_profile(requested.name)
+        self.profiles[self.profile_name] = self.config # Callers may have replaced the dict (reset_to_defaults)
+        changed = False
+        for name, config in list(self.profiles.items()):
+            key = repr(config)
+            compiled = self.compiled_profiles.get(name)
+            if not force and compiled is not None and compiled.key == key: continue
+            compiled = self.compile_profile(name, config, key)
+            self.report_config_errors(compiled.profile.errors, name)
+            self.compiled_profiles[name] = compiled
+            self._update_cache(name, compiled, config)
+            changed = True
+        if changed: self._publish()
+        return changed
+
+    def _update_cache(self, name, compiled, config):
+        """Queues the compiled cache for a profile with profile_cache on (and drops it when turned off)."""
+        path = self.profile_paths.get(name)
+        if not path: return
+        if not compiled.profile.global_settings.profile_cache:
+            self._cached_keys.pop(name, None)
+            WRITER.remove_cache(path)
+        elif self._cached_keys.get(name) != compiled.key:
+            self._cached_keys[name] = compiled.key
+            WRITER.save_cache(path, config, compiled.luts, self.cache_fingerprint)
+
+    def _publish(self):
+        """Points the worker at the fresh build of the profile it is running, and updates switch triggers."""
+        combos = []
+        for name, compiled in self.compiled_profiles.items():
+            mask = 0
+            for button in compiled.profile.switching.combo: mask |= XINPUT_MASKS[button]
+            if mask: combos.append((mask, name))
+        self._combos = tuple(combos)
+        with self._switch_lock:
+            current = self.requested
+            self.requested = self.compiled_profiles[current.name if current is not None else self.profile_name]
+        if self._hotkeys is not None and self._hotkey_specs != self._wanted_hotkeys(): self.bind_hotkeys()
+
+    def select_profile(self, name):
+        """Makes `name` the profile being edited (self.config). Doesn't change what the worker runs."""
+        self.profile_name, self.config, self.profile_path = name, self.profiles[name], self.profile_paths[name]
+
+    def switch_profile(self, name):
+        """Runs the named profile from the next tick. Safe from any thread; False if it isn't compiled yet."""
+        compiled = self.compiled_profiles.get(name)
+        if compiled is None: return False
+        with self._switch_lock: self.requested = compiled
+        return True
+
+    @property
+    def active_profile(self):
+        """Name of the profile the worker is running (or about to)."""
+        requested = self.requested
+        return requested.name if requested is not None else self.profile_name
+
+    def _wanted_hotkeys(self):
+        return tuple((name, c.profile.switching.hotkey) for name, c in self.compiled_profiles.items() if c.profile.switching.hotkey)
+
+    def bind_hotkeys(self):
+        """Registers every profile's switching.hotkey system-wide (needs the 'keyboard' package). Returns how many were bound."""
+        self.unbind_hotkeys()
+        self._hotkeys = []
+        self._hotkey_specs = self._wanted_hotkeys()
+        if not self._hotkey_specs: return 0
+        if keyboard is None:
+            print("Profile hotkeys need the 'keyboard' package (pip install keyboard)")
+            return 0
+        for name, hotkey in self._hotkey_specs:
+            try: self._hotkeys.append(keyboard.add_hotkey(hotkey, self.switch_profile, args=(name,)))
+            except Exception as e: print(f"Profile Error: [{name}] switching.hotkey {hotkey!r}: {e}")
+        return len(self._hotkeys)
+
+    def unbind_hotkeys(self):
+        if self._hotkeys and keyboard is not None:
+            for handle in self._hotkeys: keyboard.remove_hotkey(handle)
+        self._hotkeys = None
+
+    def compile_profile(self, name, config, key=None):
+        """
+        Turns a config into a CompiledProfile: a flat list of stages with their settings already bound.
+        Each stage is called as stage(gamepad_snapshot, output_axes_values, dt).
+
+        In LUT mode the axis stages index precomputed curves and every stage writes
+        final vJoy units (1-32768) instead of -1.0..1.0 floats. The range modifier is
+        folded into the stages that write its target axis, so the LUT output stays
+        bit-for-bit identical to the analytic path.
+        """
+        profile = parse_profile(config)
+        build = CompiledProfile(name, key, profile)
+        axes = profile.axes
+        range_mod = self._parse_range_modifier(profile.range_modifier)
+        build.range_fold = range_mod if build.lut_active else None
+
+        sections = [
+            ("left_stick", self._compile_stick, ("lx", "ly", axes["LX"], axes["LY"])),
+            ("right_stick", self._compile_stick, ("rx", "ry", axes["RX"], axes["RY"])),
+            ("left_trigger", self._compile_trigger, ("lt", axes["LT"])),
+            ("right_trigger", self._compile_trigger, ("rt", axes["RT"])),
+        ]
+        stages = build.stages
+        timed = []
+        for section, compile_section, args in sections:
+            start = len(stages)
+            compile_section(build, *args)
+            if len(stages) > start: timed.append(self._timed_stage(stages[start:], self.latency.histogram(section)))
+        # Then the enabled scripts, in their declared order, each timed on its own
+        for script_class in SCRIPTS:
+            script = script_class(profile.scripts[script_class.key])
+            if not script.enabled: continue
+            stage = script.compile(self, build)
+            if stage is None: continue
+            if script.skip_unchanged and script.inputs: stage = self._skip_unchanged(stage, script)
+            if script.state is not None: build.states[script.key] = script.state
+            if script.time_dependent:
+                # Runs even without new input until its state settles (e.g. winding unwinding while the stick rests)
+                build.time_dependent = True
+                build.settlers.append(script.state)
+            stages.append(stage)
+            timed.append(self._timed_stage([stage], self.latency.histogram(script.key)))
+        # Instrumented builds run the same stages wrapped in timers; plain builds are untouched
+        if profile.global_settings.instrument_latency: build.stages = timed + [self._latency_mark_stage()]
+
+        muted_btn_name = profile.range_modifier.modifier_key if range_mod and profile.range_modifier.mute_key else None
+        for button, vjoy_btn_id in profile.buttons:
+            # A muted button keeps its slot but can never read as pressed
+            bit = 1 << (vjoy_btn_id - 1)
+            build.button_map.append((0 if button == muted_btn_name else XINPUT_MASKS[button], vjoy_btn_id, bit & 0xFFFFFFFFFFFFFFFF, bit >> 64))
+        return build
+
+    def _install(self, compiled):
+        """Worker side of a switch/recompile: takes over the running state and forces the next tick through."""
+        old = self.compiled
+        for key, state in compiled.states.items(): state.take_over(old.states.get(key) if old is not None else None)
+        for axis_filter in compiled.filters: axis_filter.reset() # No smoothing from whenever this profile last ran
+        output_mode = compiled.profile.global_settings.output_mode
+        if self.output is not None and self.output.mode != output_mode:
+            self.output = create_output(self.vjoy_device, output_mode)
+            self.reset_output_state()
+        self.latency.enabled = compiled.profile.global_settings.instrument_latency
+        self.compiled = compiled
+        self.profile = compiled.profile
+        self._last_packet = None
+
+    def _check_combos(self, buttons):
+        """Switches when a profile's whole button combo has just been pressed. Returns True if it did."""
+        previous, self._combo_buttons = self._combo_buttons, buttons
+        for mask, name in self._combos:
+            if buttons & mask == mask and previous & mask != mask and name != self.compiled.name:
+                return self.switch_profile(name)
+        return False
+
+    @staticmethod
+    def _skip_unchanged(stage, script):
+        """Runs a script's stage only when its inputs or the axes it touches changed (or its state is still moving); otherwise replays its last writes."""
+        get_inputs = operator.attrgetter(*script.inputs)
+        axes = tuple(dict.fromkeys(script.reads + script.writes))
+        writes = script.writes
+        state = script.state if script.time_dependent else None
+        last = [None, {}] # Key of the last run, {axis: value} it wrote
+        def run(gamepad, out, dt):
+            key = (get_inputs(gamepad), [out.get(axis) for axis in axes])
+            if key == last[0] and (state is None or state.settled):
+                out.update(last[1])
+                return
+            stage(gamepad, out, dt)
+            last[0] = key
+            last[1] = {axis: out[axis] for axis in writes if axis in out}
+        return run
+
+    @staticmethod
+    def _timed_stage(section_stages, hist):
+        record = hist.record_ns
+        clock = time.perf_counter_ns
+        if len(section_stages) == 1:
+            inner = section_stages[0]
+            def stage(gamepad, out, dt):
+                t = clock()
+                inner(gamepad, out, dt)
+                record(clock() - t)
+        else:
+            def stage(gamepad, out, dt):
+                t = clock()
+                for inner in section_stages: inner(gamepad, out, dt)
+                record(clock() - t)
+        return stage
+
+    def _latency_mark_stage(self):
+        recorder = self.latency
+        clock = time.perf_counter_ns
+        def stage(gamepad, out, dt): recorder.stage_end = clock()
+        return stage
+
+    # --- LOOKUP TABLES ---
+    def build_stick_lut(self, args, mult=None):
+        """vJoy output for every raw stick value (-32768..32767), indexed by raw + 32768."""
+        dz = self.apply_deadzone_stick
+        if mult is None: return array("H", [float_to_vjoy(dz(raw / 32768.0, *args)) for raw in range(-32768, 32768)])
+        return array("H", [float_to_vjoy(max(-1.0, min(1.0, dz(raw / 32768.0, *args) * mult))) for raw in range(-32768, 32768)])
+
+    def build_trigger_lut(self, args, mult=None):
+        """vJoy output for every raw trigger value (0..255)."""
+        dz = self.apply_deadzone_trigger
+        if mult is None: return array("H", [float_to_vjoy(dz(raw / 255.0, *args)) for raw in range(256)])
+        return array("H", [float_to_vjoy(max(-1.0, min(1.0, dz(raw / 255.0, *args) * mult))) for raw in range(256)])
+
+    def _get_lut(self, builder, args, mult=None, used=None):
+        key = (builder.__name__, args, mult)
+        lut = self._lut_cache.get(key)
+        if lut is None:
+            if len(self._lut_cache) >= 32: self._lut_cache.clear()
+            lut = self._lut_cache[key] = builder(args, mult)
+        if used is not None: used[key] = lut
+        return lut
+
+    def _compile_lut_axis(self, build, field, target, builder, args, offset):
+        """Adds a single-index LUT stage. Returns False if the curve can't be tabulated."""
+        fold = build.range_fold
+        try:
+            if fold and fold[0] == target:
+                lut_press, lut_release = self._get_lut(builder, args, fold[2], build.luts), self._get_lut(builder, args, fold[3], build.luts)
+            else: lut = self._get_lut(builder, args, used=build.luts)
+        except ArithmeticError: return False
+        if fold and fold[0] == target:
+            mask = fold[1]
+            def stage(gamepad, out, dt): out[target] = (lut_press if gamepad.buttons & mask else lut_release)[getattr(gamepad, field) + offset]
+        else:
+            def stage(gamepad, out, dt): out[target] = lut[getattr(gamepad, field) + offset]
+        build.stages.append(stage)
+        return True
+
+    def _vjoy_emitter(self, build, target):
+        """LUT mode writer for values that can only be computed at runtime (square sticks, winding)."""
+        fold = build.range_fold
+        if fold and fold[0] == target:
+            _, mask, press_mult, release_mult = fold
+            def emit(out, value, buttons): out[target] = float_to_vjoy(max(-1.0, min(1.0, value * (press_mult if buttons & mask else release_mult))))
+        else:
+            def emit(out, value, buttons): out[target] = float_to_vjoy(value)
+        return emit
+
+    def _float_writer(self, build, target):
+        """Writer for a -1.0..1.0 value: stored as is, or converted (and range-folded) to vJoy units in LUT mode."""
+        if build.lut_active: return self._vjoy_emitter(build, target)
+        def write(out, value, buttons): out[target] = value
+        return write
+
+    @staticmethod
+    def _add_filter(build, axis_filter):
+        # A filter's output keeps moving after its input stops, so it runs like a time-dependent script until settled
+        build.filters.append(axis_filter)
+        build.settlers.append(axis_filter)
+        build.time_dependent = True
+
+    # --- STAGES ---
+    def _compile_stick(self, build, field_x, field_y, conf_x, conf_y):
+        target_x, target_y = conf_x.target, conf_y.target
+        if target_x == "None" and target_y == "None": return
+        filter_x = create_filter(conf_x) if target_x != "None" else None
+        filter_y = create_filter(conf_y) if target_y != "None" else None
+        if filter_x or filter_y: return self._compile_filtered_stick(build, field_x, field_y, conf_x, conf_y, filter_x, filter_y)
+        args_x, args_y = conf_x.args, conf_y.args
+        dz, squarify = self.apply_deadzone_stick, self.squarify
+        square = conf_x.square
+
+        stages = build.stages
+        if build.lut_active:
+            if not square:
+                # Each axis only depends on its own raw value, so it can be tabulated
+                for field, target, args in ((field_x, target_x, args_x), (field_y, target_y, args_y)):
+                    if target != "None" and not self._compile_lut_axis(build, field, target, self.build_stick_lut, args, 32768):
+                        emit = self._vjoy_emitter(build, target)
+                        def stage(gamepad, out, dt, field=field, args=args, emit=emit): emit(out, dz(getattr(gamepad, field) / 32768.0, *args), gamepad.buttons)
+                        stages.append(stage)
+                return
+            emit_x = self._vjoy_emitter(build, target_x) if target_x != "None" else None
+            emit_y = self._vjoy_emitter(build, target_y) if target_y != "None" else None
+            def stage(gamepad, out, dt):
+                x, y = squarify(getattr(gamepad, field_x), getattr(gamepad, field_y))
+                if emit_x: emit_x(out, dz(x, *args_x), gamepad.buttons)
+                if emit_y: emit_y(out, dz(y, *args_y), gamepad.buttons)
+            stages.append(stage)
+            return
+
+        if target_y == "None":
+            if square:
+                def stage(gamepad, out, dt): out[target_x] = dz(squarify(getattr(gamepad, field_x), getattr(gamepad, field_y))[0], *args_x)
+            else:
+                def stage(gamepad, out, dt): out[target_x] = dz(getattr(gamepad, field_x) / 32768.0, *args_x)
+        elif target_x == "None":
+            if square:
+                def stage(gamepad, out, dt): out[target_y] = dz(squarify(getattr(gamepad, field_x), getattr(gamepad, field_y))[1], *args_y)
+            else:
+                def stage(gamepad, out, dt): out[target_y] = dz(getattr(gamepad, field_y) / 32768.0, *args_y)
+        elif square:
+            def stage(gamepad, out, dt):
+                x, y = squarify(getattr(gamepad, field_x), getattr(gamepad, field_y))
+                out[target_x] = dz(x, *args_x)
+                out[target_y] = dz(y, *args_y)
+        else:
+            def stage(gamepad, out, dt):
+                out[target_x] = dz(getattr(gamepad, field_x) / 32768.0, *args_x)
+                out[target_y] = dz(getattr(gamepad, field_y) / 32768.0, *args_y)
+        stages.append(stage)
+
+    def _compile_filtered_stick(self, build, field_x, field_y, conf_x, conf_y, filter_x, filter_y):
+        """Stick stage with smoothing on one or both axes: deadzone/curve -> filter -> output. Never tabulated (filters hold state)."""
+        dz, squarify, square = self.apply_deadzone_stick, self.squarify, conf_x.square
+        axes = []
+        for index, conf, axis_filter in ((0, conf_x, filter_x), (1, conf_y, filter_y)):
+            if conf.target == "None": continue
+            if axis_filter: self._add_filter(build, axis_filter)
+            axes.append((index, conf.args, axis_filter, self._float_writer(build, conf.target)))
+        def stage(gamepad, out, dt):
+            raw_x, raw_y = getattr(gamepad, field_x), getattr(gamepad, field_y)
+            values = squarify(raw_x, raw_y) if square else (raw_x / 32768.0, raw_y / 32768.0)
+            buttons = gamepad.buttons
+            for index, args, axis_filter, write in axes:
+                value = dz(values[index], *args)
+                if axis_filter: value = axis_filter(value, dt)
+                write(out, value, buttons)
+        build.stages.append(stage)
+
+    def _compile_trigger(self, build, field, conf):
+        target = conf.target
+        if target == "None": return
+        args = conf.args
+        dz = self.apply_deadzone_trigger
+        axis_filter = create_filter(conf)
+        if axis_filter:
+            self._add_filter(build, axis_filter)
+            write = self._float_writer(build, target)
+            def stage(gamepad, out, dt): write(out, axis_filter(dz(getattr(gamepad, field) / 255.0, *args), dt), gamepad.buttons)
+            build.stages.append(stage)
+            return
+        if build.lut_active:
+            if self._compile_lut_axis(build, field, target, self.build_trigger_lut, args, 0): return
+            emit = self._vjoy_emitter(build, target)
+            def stage(gamepad, out, dt): emit(out, dz(getattr(gamepad, field) / 255.0, *args), gamepad.buttons)
+        else:
+            def stage(gamepad, out, dt): out[target] = dz(getattr(gamepad, field) / 255.0, *args)
+        build.stages.append(stage)
+
+    def _parse_range_modifier(self, rm_conf):
+        """Returns (target_axis, modifier_mask, press_mult, release_mult) for a profile_schema.RangeModifier, or None when disabled."""
+        if not rm_conf.enabled: return None
+        return (rm_conf.modified_axis, XINPUT_MASKS[rm_conf.modifier_key], rm_conf.press_mult, rm_conf.release_mult)
+
+    def _settled(self):
+        for settler in self.compiled.settlers:
+            if not settler.settled: return False
+        return True
+
+    def reset_output_state(self):
+        """Forgets what was last written to vJoy, so the next tick writes every output again."""
+        self._last_packet = None
+        self.idle = False
+        self._button_shadow = {}
+        self._axis_shadow = {}
+        self._last_tick_writes = 0
+
+    def update_vjoy(self, gamepad, dt):
+        """Maps one GamepadSnapshot (see input_sources) to vJoy. dt is the time since the previous tick."""
         if not self.vjoy_active: return
-        
-        gamepad = xinput_state.Gamepad
-        xinput_masks = {
-            "A": 0x1000, "B": 0x2000, "X": 0x4000, "Y": 0x8000,
-            "LB": 0x0100, "RB": 0x0200, "Back": 0x0020, "Start": 0x0010,
-            "LS_Click": 0x0040, "RS_Click": 0x0080,
-            "DPad_Up": 0x0001, "DPad_Down": 0x0002, "DPad_Left": 0x0004, "DPad_Right": 0x0008
-        }
-        output_axes_values = {} 
-        axes_conf = self.config["axes"]
 
-        lx, ly = gamepad.sThumbLX, gamepad.sThumbLY
-        if axes_conf["LX"].get("square", False): lx_proc, ly_proc = self.squarify(lx, ly)
-        else: lx_proc, ly_proc = lx / 32768.0, ly / 32768.0
-        
-        conf_lx = axes_conf["LX"]
-        if conf_lx["target"] != "None": output_axes_values[conf_lx["target"]] = self.apply_deadzone_stick(lx_proc, conf_lx["dz_in"], conf_lx["dz_out"], conf_lx["anti_dz"], conf_lx["lin"], conf_lx.get("inv", False))
-        conf_ly = axes_conf["LY"]
-        if conf_ly["target"] != "None": output_axes_values[conf_ly["target"]] = self.apply_deadzone_stick(ly_proc, conf_ly["dz_in"], conf_ly["dz_out"], conf_ly["anti_dz"], conf_ly["lin"], conf_ly.get("inv", False))
-
-        rx, ry = gamepad.sThumbRX, gamepad.sThumbRY
-        if axes_conf["RX"].get("square", False): rx_proc, ry_proc = self.squarify(rx, ry)
-        else: rx_proc, ry_proc = rx / 32768.0, ry / 32768.0
-        conf_rx = axes_conf["RX"]
-        if conf_rx["target"] != "None": output_axes_values[conf_rx["target"]] = self.apply_deadzone_stick(rx_proc, conf_rx["dz_in"], conf_rx["dz_out"], conf_rx["anti_dz"], conf_rx["lin"], conf_rx.get("inv", False))
-        conf_ry = axes_conf["RY"]
-        if conf_ry["target"] != "None": output_axes_values[conf_ry["target"]] = self.apply_deadzone_stick(ry_proc, conf_ry["dz_in"], conf_ry["dz_out"], conf_ry["anti_dz"], conf_ry["lin"], conf_ry.get("inv", False))
-
-        for axis, raw_val in [("LT", gamepad.bLeftTrigger), ("RT", gamepad.bRightTrigger)]:
-            conf = axes_conf[axis]
-            if conf["target"] != "None": output_axes_values[conf["target"]] = self.apply_deadzone_trigger(raw_val/255.0, conf["dz_in"], conf["dz_out"], conf["start"], conf["end"], conf["lin"])
-
-        w_conf = self.config["scripts"].get("winding_steering", {})
-        if w_conf.get("enabled_for", "Disabled") != "Disabled":
-            target = w_conf.get("target_axis", "X")
-            if w_conf["enabled_for"] == "Left Stick": sx, sy = gamepad.sThumbLX, gamepad.sThumbLY
-            else: sx, sy = gamepad.sThumbRX, gamepad.sThumbRY
-            winding_val = self.winding_logic.process(sx, sy, dt, w_conf)
-            if target != "None": output_axes_values[target] = winding_val
-
-        rm_conf = self.config["scripts"].get("range_modifier", {})
-        mute_key_active = False 
-        if rm_conf.get("enabled", False):
-            mod_key = rm_conf.get("modifier_key", "X")
-            target_axis = rm_conf.get("modified_axis", "X")
-            is_mod_pressed = False
-            if mod_key in xinput_masks: is_mod_pressed = (gamepad.wButtons & xinput_masks[mod_key]) != 0
-            mult = float(rm_conf.get("press_mult", 1.0)) if is_mod_pressed else float(rm_conf.get("release_mult", 0.5))
-            if target_axis in output_axes_values:
-                new_val = output_axes_values[target_axis] * mult
-                output_axes_values[target_axis] = max(-1.0, min(1.0, new_val))
-            if rm_conf.get("mute_key", False): mute_key_active = True; muted_btn_name = mod_key
-
-        ac_conf = self.config["scripts"].get("auto_clutch", {})
-        if ac_conf.get("enabled", False):
-            up_btn = ac_conf.get("upshift_btn", "RB")
-            dn_btn = ac_conf.get("downshift_btn", "LB")
-            is_up = (gamepad.wButtons & xinput_masks.get(up_btn, 0)) != 0
-            is_dn = (gamepad.wButtons & xinput_masks.get(dn_btn, 0)) != 0
-            if is_up or is_dn:
-                output_axes_values[ac_conf.get("clutch_axis", "RY")] = 1.0
-                if is_dn and ac_conf.get("auto_blip", False): output_axes_values[ac_conf.get("throttle_axis", "RZ")] = 1.0
-                if is_up and ac_conf.get("auto_lift", False): output_axes_values[ac_conf.get("throttle_axis", "RZ")] = -1.0
-
-        # --- Capture State for Viewer (AND Send to vJoy) ---
-        active_buttons_list = []
-        for name, vjoy_btn_id in self.config["buttons"].items():
-            if vjoy_btn_id == "None" or name not in xinput_masks: continue
-            if mute_key_active and name == muted_btn_name:
-                self.vjoy_device.set_button(int(vjoy_btn_id), 0)
-                continue
-            is_pressed = (gamepad.wButtons & xinput_masks[name]) != 0
-            self.vjoy_device.set_button(int(vjoy_btn_id), 1 if is_pressed else 0)
-            if is_pressed: active_buttons_list.append(int(vjoy_btn_id))
-
-        # Update viewer data
-        self.latest_output = {
-            "axes": output_axes_values.copy(),
-            "buttons": sorted(active_buttons_list)
-        }
+        # Tick boundary: pick up a switch or a recompiled profile (one reference read, nothing to parse)
+        compiled = self.requested
+        if compiled is None: self.refresh_pipeline(); compiled = self.requested # Nothing compiled yet
+        if compiled is not self.compiled: self._install(compiled)
+
+        # Same packet = same input. Only time-dependent scripts that haven't settled can still change the output.
+        packet = gamepad.packet
+        if packet == self._last_packet and (not compiled.time_dependent or self._settled()):
+            self.driver_calls_skipped += self._last_tick_writes
+            self.idle = True
+            return
+        self._last_packet = packet
+        self.idle = False
+        if self._combos and gamepad.buttons != self._combo_buttons and self._check_combos(gamepad.buttons):
+            compiled = self.requested
+            self._install(compiled)
+            self._last_packet = packet
+
+        output_axes_values = self._tick_out
+        output_axes_values.clear()
+        for stage in compiled.stages: stage(gamepad, output_axes_values, dt)
 
-        def float_to_vjoy(f_val): return int((max(-1.0, min(1.0, f_val)) + 1.0) * 16383.5 + 1)
+        # --- Send to vJoy (and capture the tick for the viewer) ---
+        if kernel_map_buttons is not None:
+            issued, pressed_lo, pressed_hi = kernel_map_buttons(gamepad.buttons, compiled.button_map, self._button_shadow, self.output.set_button)
+        else:
+            issued = 0
+            set_button = self.output.set_button
+            button_shadow = self._button_shadow
+            buttons = gamepad.buttons
+            pressed_lo = pressed_hi = 0
+            for mask, vjoy_btn_id, bit_lo, bit_hi in compiled.button_map:
+                state = 1 if (buttons & mask) != 0 else 0
+                if button_shadow.get(vjoy_btn_id) != state:
+                    set_button(vjoy_btn_id, state)
+                    button_shadow[vjoy_btn_id] = state
+                    issued += 1
+                if state: pressed_lo |= bit_lo; pressed_hi |= bit_hi
+
+        set_axis = self.output.set_axis
+        axis_shadow = self._axis_shadow
+        tick_axes = self._tick_axes
+        tick_axes[:] = self._no_axes
+        lut_active = compiled.lut_active # Stages already produced vJoy units
+        writes = len(compiled.button_map)
         for axis_name, val in output_axes_values.items():
-            if axis_name in VJOY_AXES: self.vjoy_device.set_axis(VJOY_AXES[axis_name], float_to_vjoy(val))
\ No newline at end of file
+            slot = VJOY_AXIS_SLOTS.get(axis_name)
+            if slot is None: continue
+            usage, index = slot
+            writes += 1
+            if not lut_active: val = float_to_vjoy(val)
+            tick_axes[index] = val
+            if axis_shadow.get(usage) != val:
+                set_axis(usage, val)
+                axis_shadow[usage] = val
+                issued += 1
+        self.telemetry.write(time.perf_counter_ns(), tick_axes, pressed_lo, pressed_hi)
+
+        if issued: self.output.flush()
+        self._last_tick_writes = writes
+        self.driver_calls_issued += issued
+        self.driver_calls_skipped += writes - issued
+
+def curve_fingerprint(engine):
+    """Changes whenever the curve code or the default profile changes, which makes old compiled caches stale."""
+    h = hashlib.sha1()
+    def add_code(code):
+        h.update(code.co_code)
+        for const in code.co_consts:
+            if hasattr(const, "co_code"): add_code(const) # Nested comprehensions (their repr has an address)
+            else: h.update(repr(const).encode())
+    cls = type(engine)
+    for fn in (float_to_vjoy, cls.apply_linearity, cls.apply_deadzone_stick, cls.apply_deadzone_trigger, cls.build_stick_lut, cls.build_trigger_lut):
+        add_code(fn.__code__)
+    h.update(repr(engine.get_default_config()).encode())
+    return h.hexdigest()
@@ -0,0 +1,136 @@
+"""
+Optional compiled kernel for the per-tick math: the deadzone/linearity curves, squarify, winding steering
+and the button mask loop. It returns exactly what the Python code does, bit for bit, so LUTs, traces and
+cached profiles don't change; MappingEngine and WindingStickLogic use it whenever it is built.
+
+It is a plain C extension (_mapping_kernel.c) built in place next to this file:
+
+    Linux/macOS:  cc -O2 -shared -fPIC $(python3-config --includes) _mapping_kernel.c -o _mapping_kernel$(python3-config --extension-suffix)
+    Windows:      cl /O2 /LD /I "<python>\\include" _mapping_kernel.c "<python>\\libs\\python3XX.lib" /Fe:_mapping_kernel.pyd
+                  (from a Visual Studio developer prompt; the .pyd must match the Python that runs the app)
+
+Without it (or with REMAPPER_NO_KERNEL=1) everything runs the pure-Python code.
+python mapping_kernel.py checks the kernel against the Python code and times both; the same check runs
+in tests/test_mapping_kernel.py (skipped when the kernel isn't built).
+"""
+import math
+import os
+import sys
+
+try:
+    if os.environ.get("REMAPPER_NO_KERNEL"): raise ImportError("disabled by REMAPPER_NO_KERNEL")
+    import _mapping_kernel as kernel
+except ImportError: kernel = None
+
+# --- Parity self-check (python mapping_kernel.py, tests/test_mapping_kernel.py); not used per tick ---
+def _random_args(rng):
+    value = rng.choice([rng.uniform(-1.0, 1.0), 0.0, -0.0, 1.0, -1.0, rng.randint(-32768, 32767) / 32768.0, math.nan])
+    dz_in, dz_out = rng.choice([0.0, rng.uniform(0, 0.5)]), rng.choice([0.0, rng.uniform(0, 0.5)])
+    lin = rng.choice([0, 0.0, rng.uniform(-100, 100), rng.randint(-100, 100), 100.0, -100.0])
+    return value, dz_in, dz_out, lin
+
+def _same(a, b):
+    """Equal including type, float sign and exceptions (a and b are (kind, value) results)."""
+    if a[0] != b[0]: return False
+    if a[0] == "error": return type(a[1]) is type(b[1])
+    return repr(a[1]) == repr(b[1])
+
+def _call(fn, *args):
+    try: return ("ok", fn(*args))
+    except ArithmeticError as e: return ("error", e)
+
+def parity_mismatches(cases=20000, seed=1):
+    """Runs random inputs through the kernel and the Python code. Returns [(function, args, kernel, python), ...]."""
+    if kernel is None: return []
+    import random
+    from mapping_engine import MappingEngine
+    from mapping_scripts import WindingStickLogic
+    from vjoy_output import FakeVJoyDevice
+    rng = random.Random(seed)
+    engine = MappingEngine(vjoy_device=FakeVJoyDevice(), profile_path="")
+    py = MappingEngine # Unbound: the class functions are always the Python code
+    mismatches = []
+    def check(name, k, p, args):
+        if not _same(k, p): mismatches.append((name, args, k, p))
+    for _ in range(cases):
+        value, dz_in, dz_out, lin = _random_args(rng)
+        anti_dz, invert = rng.choice([0.0, rng.uniform(0, 0.5)]), rng.random() < 0.5
+        args = (value, dz_in, dz_out, anti_dz, lin, invert)
+        check("deadzone_stick", _call(kernel.deadzone_stick, *args), _call(py.apply_deadzone_stick, engine, *args), args)
+        args = (abs(value), dz_in, dz_out, rng.uniform(-1, 1), rng.uniform(-1, 1), lin)
+        check("deadzone_trigger", _call(kernel.deadzone_trigger, *args), _call(py.apply_deadzone_trigger, engine, *args), args)
+        args = (abs(value), lin)
+        check("linearity", _call(kernel.linearity, *args), _call(py.apply_linearity, engine, *args), args)
+        args = (rng.choice([rng.randint(-32768, 32767), 0, 200, -32768, 32767, math.nan]), rng.choice([rng.randint(-32768, 32767), 0, -200]))
+        check("squarify", _call(kernel.squarify, *args), _call(py.squarify, engine, *args), args)
+
+    # Winding: the same random stick motion through both, comparing output and state every step
+    for trial in range(max(1, cases // 200)):
+        k_logic, p_logic = WindingStickLogic(), WindingStickLogic()
+        settings = {"range": rng.choice(["900", "540", rng.uniform(1, 1800)]), "buffer": rng.choice(["45", rng.uniform(-10, 90)]),
+                    "unwind": rng.choice(["1800", rng.uniform(-100, 5000), "0"])}
+        k_logic.configure(settings); p_logic.configure(settings)
+        angle, mag = rng.uniform(-math.pi, math.pi), rng.random()
+        for _ in range(400):
+            if rng.random() < 0.7: angle += rng.uniform(-0.5, 0.5); mag = min(1.0, max(0.0, mag + rng.uniform(-0.3, 0.3)))
+            x, y = int(-32767 * mag * math.sin(angle)), int(32767 * mag * math.cos(angle))
+            dt = rng.choice([0.001, 0.0005, 0.004, 0.000125, rng.uniform(0, 0.02), 0.3])
+            args = (x, y, dt)
+            k_out, p_out = _call(kernel.winding_step, k_logic, *args), _call(WindingStickLogic.step, p_logic, *args)
+            check("winding_step", k_out, p_out, args)
+            k_state, p_state = _winding_state(k_logic), _winding_state(p_logic)
+            if k_state != p_state: mismatches.append(("winding_state", args, k_state, p_state)); break
+
+    # Buttons: random masks against a random map, shadows carried over between calls
+    calls_k, calls_p = [], []
+    shadow_k, shadow_p = {}, {}
+    for _ in range(max(1, cases // 20)):
+        button_map = []
+        for _ in range(rng.randint(0, 14)):
+            vjoy_btn_id = rng.randint(1, 128)
+            bit = 1 << (vjoy_btn_id - 1)
+            button_map.append((rng.choice([0, 1 << rng.randint(0, 15)]), vjoy_btn_id, bit & 0xFFFFFFFFFFFFFFFF, bit >> 64))
+        buttons = rng.getrandbits(16)
+        k = kernel.map_buttons(buttons, button_map, shadow_k, lambda *a: calls_k.append(a))
+        p = _map_buttons(buttons, button_map, shadow_p, lambda *a: calls_p.append(a))
+        if k != p or calls_k != calls_p or shadow_k != shadow_p: mismatches.append(("map_buttons", (buttons, button_map), k, p)); break
+    return mismatches
+
+def _winding_state(logic):
+    return repr((logic.current_winding_angle, logic.previous_winding_angle, logic.previous_angle, logic.magnitude, logic.accumulator, logic.settled))
+
+def _map_buttons(buttons, button_map, button_shadow, set_button):
+    """The Python button loop from MappingEngine.update_vjoy, as a function."""
+    issued = pressed_lo = pressed_hi = 0
+    for mask, vjoy_btn_id, bit_lo, bit_hi in button_map:
+        state = 1 if (buttons & mask) != 0 else 0
+        if button_shadow.get(vjoy_btn_id) != state:
+            set_button(vjoy_btn_id, state)
+            button_shadow[vjoy_btn_id] = state
+            issued += 1
+        if state: pressed_lo |= bit_lo; pressed_hi |= bit_hi
+    return issued, pressed_lo, pressed_hi
+
+def main():
+    if kernel is None:
+        print("Mapping Kernel: not built (see mapping_kernel.py); the Python code is in use.")
+        return 1
+    mismatches = parity_mismatches()
+    for name, args, k, p in mismatches[:10]: print(f"  {name}{args}: kernel {k} != python {p}")
+    print(f"Parity: {'OK' if not mismatches else f'{len(mismatches)} mismatches'}")
+    import timeit
+    from mapping_engine import MappingEngine
+    from mapping_scripts import WindingStickLogic
+    engine = MappingEngine.__new__(MappingEngine)
+    logic = WindingStickLogic()
+    for name, py_call, k_call in [
+        ("deadzone_stick", lambda: MappingEngine.apply_deadzone_stick(engine, 0.4321, 0.05, 0.02, 0.1, 30, False), lambda: kernel.deadzone_stick(0.4321, 0.05, 0.02, 0.1, 30, False)),
+        ("squarify", lambda: MappingEngine.squarify(engine, 12000, -20000), lambda: kernel.squarify(12000, -20000)),
+        ("winding_step", lambda: WindingStickLogic.step(logic, 15000, 20000, 0.001), lambda: kernel.winding_step(logic, 15000, 20000, 0.001)),
+    ]:
+        py_ns, k_ns = (min(timeit.repeat(fn, number=100000, repeat=3)) / 100000 * 1e9 for fn in (py_call, k_call))
+        print(f"  {name:<16} python {py_ns:6.0f} ns  kernel {k_ns:6.0f} ns  ({py_ns / k_ns:.1f}x)")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
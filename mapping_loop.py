@@ -0,0 +1,171 @@
+import json
+import threading
+import time
+
+from latency import LatencyHistogram, dump_summaries
+from scheduler import LoopScheduler
+
+class MappingLoop:
+    """
+    The real-time input source -> MappingEngine loop, independent of any UI.
+    Services any number of bindings (source, mapper) from one thread: every tick polls every
+    source and updates its engine. The first binding's profile sets the update rate/pacing.
+    With adaptive_polling on, the loop drops to idle_rate while no source has new input and no
+    time-dependent script is still moving, and returns to update_rate on the first new packet.
+    run() blocks the calling thread; start() runs it on a daemon thread.
+    """
+    def __init__(self, source=None, mapper=None):
+        self.bindings = []
+        if source is not None or mapper is not None: self.add_binding(source, mapper)
+        self.scheduler = LoopScheduler()
+        self.latency = LatencyHistogram()
+        self.idle_seconds = self.idle_cpu_seconds = self.cpu_seconds = 0.0
+        self.started = time.perf_counter()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def add_binding(self, source, mapper): self.bindings.append([source, mapper])
+
+    # Single-binding shorthands (what the UI uses)
+    @property
+    def source(self): return self.bindings[0][0]
+    @source.setter
+    def source(self, value): self.bindings[0][0] = value
+    @property
+    def mapper(self): return self.bindings[0][1]
+
+    @property
+    def is_running(self): return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=1.0):
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+
+    def close_sources(self):
+        for source, _ in self.bindings: source.close()
+
+    def run(self):
+        print(f"Mapping Worker Started ({len(self.bindings)} binding{'s' if len(self.bindings) != 1 else ''})")
+        self.stop_event.clear()
+        bindings = [(source.poll, mapper.update_vjoy, mapper) for source, mapper in self.bindings]
+        last_packets = [None] * len(bindings)
+        for _, mapper in self.bindings:
+            if mapper.requested is None: mapper.refresh_pipeline() # Compile before the first tick, not during it
+            mapper.reset_output_state()
+            mapper.latency.reset()
+        primary = self.mapper
+        scheduler = self.scheduler
+        latency = self.latency
+        latency.reset()
+        sched_profile = None
+        scheduler.start()
+        cpu_start = time.thread_time()
+        self.idle_seconds = self.idle_cpu_seconds = 0.0
+        slow, slow_cpu = False, 0.0
+        last_time = idle_since = self.started = time.perf_counter()
+        while not self.stop_event.is_set():
+            current_time = time.perf_counter()
+            dt = current_time - last_time
+            # The engine swaps in a new typed profile on a profile switch or after a config edit
+            if primary.profile is not sched_profile:
+                sched_profile = primary.profile
+                gs = sched_profile.global_settings
+                rate, adaptive, idle_after, instrumented = gs.update_rate, gs.adaptive_polling, gs.idle_after_ms / 1000.0, gs.instrument_latency
+                scheduler.configure(rate, gs.scheduler_mode, gs.spin_window_us / 1e6)
+                idle_rate = min(rate, gs.idle_rate)
+                if slow: self.idle_cpu_seconds += time.thread_time() - slow_cpu; slow = False
+            changed = False
+            idle = True
+            if not instrumented:
+                for i, (poll, update_vjoy, mapper) in enumerate(bindings):
+                    snapshot = poll()
+                    if not snapshot: continue
+                    if snapshot.packet != last_packets[i]:
+                        last_packets[i] = snapshot.packet
+                        changed = True
+                    update_vjoy(snapshot, dt)
+                    if not mapper.idle: idle = False
+            else:
+                # Same as above, with timestamps around the input read and the vJoy writes (see latency.LatencyRecorder)
+                for i, (poll, update_vjoy, mapper) in enumerate(bindings):
+                    t_poll = time.perf_counter_ns()
+                    snapshot = poll()
+                    t_read = time.perf_counter_ns()
+                    if not snapshot: continue
+                    recorder = mapper.latency
+                    if snapshot.packet != last_packets[i]:
+                        last_packets[i] = snapshot.packet
+                        changed = True
+                    recorder.stage_end = 0
+                    update_vjoy(snapshot, dt)
+                    if recorder.enabled and recorder.stage_end:
+                        t_written = time.perf_counter_ns()
+                        recorder.histogram("read").record_ns(t_read - t_poll)
+                        recorder.histogram("output").record_ns(t_written - recorder.stage_end)
+                        recorder.histogram("total").record_ns(t_written - t_read)
+                    if not mapper.idle: idle = False
+            # Worst case input -> output: the input arrived right after the previous poll
+            if changed: latency.record(time.perf_counter() - last_time)
+            if slow: self.idle_seconds += dt
+            last_time = current_time
+            if adaptive:
+                # Idle = no new packets and nothing left for time-dependent scripts to do.
+                # Polling slows to idle_rate, so an idle -> active change is seen within 1/idle_rate.
+                if not idle:
+                    idle_since = current_time
+                    if slow:
+                        scheduler.set_rate(rate); slow = False
+                        self.idle_cpu_seconds += time.thread_time() - slow_cpu
+                elif not slow and current_time - idle_since >= idle_after:
+                    scheduler.set_rate(idle_rate); slow = True
+                    slow_cpu = time.thread_time()
+            scheduler.wait()
+            if not scheduler.ticks & 255: self.cpu_seconds = time.thread_time() - cpu_start
+        if slow: self.idle_cpu_seconds += time.thread_time() - slow_cpu
+        self.cpu_seconds = time.thread_time() - cpu_start
+        stats = self.stats()
+        print(f"Scheduler ({stats['mode']}): {stats['achieved_hz']:.0f}/{stats['target_hz']:.0f} Hz, jitter p50 {stats['jitter_p50_us']:.0f}us p99 {stats['jitter_p99_us']:.0f}us, {stats['missed']} missed")
+        print(f"Input->output latency: p50 {stats['latency_p50_us']:.0f}us p99 {stats['latency_p99_us']:.0f}us max {stats['latency_max_us']:.0f}us over {stats['latency_samples']} changes")
+        if sched_profile and sched_profile.global_settings.adaptive_polling:
+            print(f"Adaptive polling: idle {stats['idle_seconds']:.1f}s, CPU {stats['cpu_seconds']:.2f}s used, ~{stats['cpu_saved_seconds']:.2f}s saved")
+        for source, mapper in self.bindings:
+            print(f"{source.name}: vJoy driver calls: {mapper.driver_calls_issued} issued, {mapper.driver_calls_skipped} skipped")
+        summaries = {name: summary for name, summary in ((source.name, mapper.latency.summary()) for source, mapper in self.bindings) if summary}
+        if summaries:
+            try: print(f"Stage latency saved to {dump_summaries(summaries)}")
+            except OSError as e: print(f"Could not save stage latency: {e}")
+
+    def stats(self):
+        """Scheduler stats plus input->output latency percentiles and adaptive polling savings."""
+        stats = self.scheduler.stats()
+        latency = self.latency
+        cpu, idle = self.cpu_seconds, self.idle_seconds
+        active = time.perf_counter() - self.started - idle
+        # Saved = idle time x (CPU use per second while active - CPU use per second while idle)
+        saved = 0.0
+        if idle > 0 and active > 0: saved = max(0.0, idle * ((cpu - self.idle_cpu_seconds) / active - self.idle_cpu_seconds / idle))
+        if self.bindings: stats["target_hz"] = self.mapper.profile.global_settings.update_rate
+        stats.update(latency_p50_us=latency.percentile(50), latency_p99_us=latency.percentile(99), latency_max_us=latency.max_us,
+                     latency_samples=latency.total, idle_seconds=self.idle_seconds, cpu_seconds=cpu,
+                     cpu_saved_seconds=saved)
+        return stats
+
+def parse_binding(text):
+    """'PORT:DEVICE[:PROFILE]' -> {"port": int, "vjoy_device": int, "profile": str or None}"""
+    parts = text.split(":", 2)
+    if len(parts) < 2: raise ValueError(f"Binding '{text}' should look like PORT:DEVICE[:PROFILE]")
+    return {"port": int(parts[0]), "vjoy_device": int(parts[1]), "profile": parts[2] if len(parts) > 2 and parts[2] else None}
+
+def load_rig(path):
+    """A rig file lists bindings: {"bindings": [{"port": 0, "vjoy_device": 1, "profile": "mapping_profile.json"}, ...]}"""
+    with open(path, "r") as f: rig = json.load(f)
+    bindings = []
+    for entry in rig.get("bindings", []):
+        bindings.append({"port": int(entry["port"]), "vjoy_device": int(entry.get("vjoy_device", 1)), "profile": entry.get("profile")})
+    return bindings
@@ -0,0 +1,229 @@
+"""
+Per-tick mapping scripts: winding steering, range modifier, auto clutch, and any plugin added with register_script().
+
+A script class declares:
+  key            - its settings section under the profile's "scripts" (also its latency histogram)
+  schema         - the profile_schema.Section class those settings parse into
+  order          - run order; scripts run after the axis stages, lowest order first
+  time_dependent - its output can change without new input (e.g. unwinding), so it runs until its state settles
+  skip_unchanged - let the engine skip it while its inputs are unchanged (off for scripts cheaper than the check)
+
+The engine builds one instance per compiled profile from the parsed settings. The instance sets
+  enabled        - False leaves the script out of the profile entirely
+  inputs         - gamepad fields it reads ("buttons", "lx", ...)
+  reads, writes  - output axes it reads / may write
+  state          - its state object or None; state.take_over(other) carries it across a profile switch,
+                   and a time-dependent script's state has .settled
+and compile(engine, build) returns its stage(gamepad, out, dt), or None when there is nothing to run.
+A stage given the same inputs and the same values on its reads/writes axes must write the same values
+(once its state has settled), so the engine can skip it and replay its last writes.
+"""
+import math
+from types import MethodType
+
+from mapping_kernel import kernel
+from profile_schema import Winding, RangeModifier, AutoClutch, SCRIPT_SECTIONS, XINPUT_MASKS
+from vjoy_output import VJOY_MIN, VJOY_MAX
+
+SCRIPTS = [] # Registered script classes, in run order
+
+def register_script(cls):
+    """Adds (or replaces, by key) a script class. Usable as a class decorator."""
+    SCRIPT_SECTIONS[cls.key] = cls.schema
+    SCRIPTS[:] = sorted([s for s in SCRIPTS if s.key != cls.key] + [cls], key=lambda s: s.order)
+    return cls
+
+class MappingScript:
+    key = None
+    schema = None
+    order = 0
+    time_dependent = False
+    skip_unchanged = True
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.enabled = False
+        self.inputs, self.reads, self.writes = (), (), ()
+        self.state = None
+
+    def compile(self, engine, build): raise NotImplementedError
+
+# --- Winding stick steering ---
+WINDING_SUBSTEP = 0.001 # Seconds per unwind step, whatever rate the loop runs at
+WINDING_MAX_STEPS = 250 # A longer gap (e.g. after the loop idled) only unwinds this many steps
+# Compiled step() (see mapping_kernel), unless the kernel was built with other substep settings
+kernel_winding_step = kernel.winding_step if kernel is not None and (kernel.WINDING_SUBSTEP, kernel.WINDING_MAX_STEPS) == (WINDING_SUBSTEP, WINDING_MAX_STEPS) else None
+
+class WindingStickLogic:
+    """
+    Steering angle from stick rotation. Rotation is added as each new stick position arrives; unwinding is
+    integrated in fixed WINDING_SUBSTEP steps with the stick magnitude held since the previous call, and the
+    output is interpolated between the last two steps. The same stick motion therefore gives the same output
+    at any loop rate (at the times both rates sample), for at most one substep of unwind lag.
+    """
+    def __init__(self):
+        self.current_winding_angle = 0.0 # At the latest substep
+        self.previous_winding_angle = 0.0 # One substep earlier; the output interpolates from here
+        self.previous_angle = None # Stick angle (deg) at the last call, None while it was near center
+        self.magnitude = 0.0 # Stick magnitude at the last call (held until the next one)
+        self.accumulator = 0.0 # Time not yet integrated (less than one substep)
+        self.w_range, self.buffer, self.unwind_rate = 900.0, 45.0, 1800.0
+        self.settled = False # True when repeating the last step() input would return the same output
+        if kernel_winding_step is not None: self.step = MethodType(kernel_winding_step, self)
+
+    def configure(self, config):
+        """Takes the script settings (a profile_schema.Winding, or its dict) once so step() doesn't have to every tick."""
+        if isinstance(config, dict): config = Winding(config)
+        self.w_range, self.buffer, self.unwind_rate = config.range, config.buffer, config.unwind
+
+    def take_over(self, other=None):
+        """Continues from another instance's wheel position (profile switch), or from rest."""
+        if other is None: other = WindingStickLogic()
+        self.current_winding_angle, self.previous_winding_angle = other.current_winding_angle, other.previous_winding_angle
+        self.previous_angle, self.magnitude, self.accumulator = other.previous_angle, other.magnitude, other.accumulator
+        self.settled = False
+
+    def process(self, stick_x, stick_y, dt, config):
+        self.configure(config)
+        return self.step(stick_x, stick_y, dt)
+
+    def step(self, stick_x, stick_y, dt):
+        angle, previous = self.current_winding_angle, self.previous_winding_angle
+
+        # Unwind over the time since the last call, with the stick where it was during that time
+        acc = self.accumulator + dt
+        steps = int(acc / WINDING_SUBSTEP + 1e-6)
+        if steps:
+            acc = max(0.0, acc - steps * WINDING_SUBSTEP)
+            unwind_amt = self.unwind_rate * (1.0 - self.magnitude) * WINDING_SUBSTEP if self.magnitude < 0.95 else 0.0
+            if unwind_amt:
+                for _ in range(min(steps, WINDING_MAX_STEPS)):
+                    previous = angle
+                    if angle == 0.0: break
+                    if abs(unwind_amt) >= abs(angle): angle = 0.0
+                    else: angle -= unwind_amt * (1.0 if angle > 0 else -1.0)
+            else: previous = angle
+        self.accumulator = acc if acc > 1e-9 else 0.0
+
+        # Rotation since the last stick position (one atan2; the previous angle is kept)
+        sx, sy = stick_x / 32768.0, stick_y / 32768.0
+        mag = math.sqrt(sx**2 + sy**2)
+        stick_angle = None
+        if mag > 0.1:
+            stick_angle = math.atan2(-sx, sy) * 180.0 / math.pi
+            if self.previous_angle is not None:
+                rotation = ((stick_angle - self.previous_angle + 180) % 360 - 180) * mag
+                angle += rotation
+                previous += rotation
+        max_angle = (self.w_range / 2.0) + self.buffer
+        angle = max(min(angle, max_angle), -max_angle)
+        previous = max(min(previous, max_angle), -max_angle)
+        self.current_winding_angle, self.previous_winding_angle = angle, previous
+        self.previous_angle, self.magnitude = stick_angle, mag
+
+        self.settled = angle == previous and (angle == 0.0 or mag >= 0.95 or self.unwind_rate == 0.0)
+        output = (previous + (angle - previous) * (self.accumulator / WINDING_SUBSTEP)) * 2.0 / self.w_range
+        return max(-1.0, min(1.0, output))
+
+def winding_rate_check(samples, rates=(250, 500, 1000, 2000)):
+    """
+    Runs winding steering (left stick) over the same recorded stick motion at each loop rate; every tick sees
+    the latest sample recorded by then. Returns {rate: max output difference from the slowest rate at the ticks
+    both share}. With a sample at least every 1/min(rates) s this is 0.0 if the steering doesn't depend on the
+    loop rate; faster samples add what the slowest rate hasn't seen yet.
+    """
+    if not samples: return {}
+    start_ns = round(samples[0][0] * 1e9)
+    times = [round(sample[0] * 1e9) - start_ns for sample in samples]
+    def run(rate):
+        logic = WindingStickLogic()
+        step_ns, outputs, i = 10**9 // rate, {}, 0
+        for t in range(step_ns, times[-1] + 1, step_ns):
+            while i + 1 < len(samples) and times[i + 1] <= t: i += 1
+            outputs[t] = logic.step(samples[i][5], samples[i][6], step_ns / 1e9)
+        return outputs
+    base = run(min(rates))
+    results = {}
+    for rate in rates:
+        outputs = run(rate)
+        results[rate] = max(abs(outputs[t] - value) for t, value in base.items())
+    return results
+
+@register_script
+class WindingScript(MappingScript):
+    """Turns stick rotation into a steering wheel angle that unwinds when the stick is released."""
+    key, schema, order, time_dependent = "winding_steering", Winding, 100, True
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.enabled = settings.enabled_for != "Disabled"
+        self.inputs = ("lx", "ly") if settings.enabled_for == "Left Stick" else ("rx", "ry")
+        self.writes = (settings.target_axis,) if settings.target_axis != "None" else ()
+        self.state = WindingStickLogic()
+        self.state.configure(settings)
+
+    def compile(self, engine, build):
+        target = self.settings.target_axis
+        field_x, field_y = self.inputs
+        step = self.state.step
+        if target == "None":
+            def stage(gamepad, out, dt): step(getattr(gamepad, field_x), getattr(gamepad, field_y), dt)
+        elif build.lut_active:
+            emit = engine._vjoy_emitter(build, target)
+            if build.range_fold and build.range_fold[0] == target: self.inputs += ("buttons",) # The folded range modifier reads them
+            def stage(gamepad, out, dt): emit(out, step(getattr(gamepad, field_x), getattr(gamepad, field_y), dt), gamepad.buttons)
+        else:
+            def stage(gamepad, out, dt): out[target] = step(getattr(gamepad, field_x), getattr(gamepad, field_y), dt)
+        return stage
+
+# --- Range modifier ---
+@register_script
+class RangeModifierScript(MappingScript):
+    """Scales one axis by press_mult while the modifier button is held, release_mult otherwise."""
+    key, schema, order = "range_modifier", RangeModifier, 200
+    skip_unchanged = False # A multiply is cheaper than checking whether it could be skipped
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.enabled = settings.enabled
+        self.inputs = ("buttons",)
+        self.reads = self.writes = (settings.modified_axis,)
+
+    def compile(self, engine, build):
+        if build.range_fold: return None # LUT mode: already folded into the stages that write the axis
+        target_axis, mask = self.settings.modified_axis, XINPUT_MASKS[self.settings.modifier_key]
+        press_mult, release_mult = self.settings.press_mult, self.settings.release_mult
+        def stage(gamepad, out, dt):
+            if target_axis in out:
+                mult = press_mult if (gamepad.buttons & mask) != 0 else release_mult
+                out[target_axis] = max(-1.0, min(1.0, out[target_axis] * mult))
+        return stage
+
+# --- Auto clutch ---
+@register_script
+class AutoClutchScript(MappingScript):
+    """Presses the clutch (and blips or lifts the throttle) while a shift button is held."""
+    key, schema, order = "auto_clutch", AutoClutch, 300
+    skip_unchanged = False # Two mask tests; cheaper than checking whether they could be skipped
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.enabled = settings.enabled
+        self.inputs = ("buttons",)
+        throttle = (settings.throttle_axis,) if settings.auto_blip or settings.auto_lift else ()
+        self.writes = (settings.clutch_axis,) + throttle
+
+    def compile(self, engine, build):
+        settings = self.settings
+        up_mask, dn_mask = XINPUT_MASKS[settings.upshift_btn], XINPUT_MASKS[settings.downshift_btn]
+        clutch_axis, throttle_axis = settings.clutch_axis, settings.throttle_axis
+        auto_blip, auto_lift = settings.auto_blip, settings.auto_lift
+        full, lifted = (VJOY_MAX, VJOY_MIN) if build.lut_active else (1.0, -1.0)
+        def stage(gamepad, out, dt):
+            buttons = gamepad.buttons
+            is_up, is_dn = (buttons & up_mask) != 0, (buttons & dn_mask) != 0
+            if is_up or is_dn:
+                out[clutch_axis] = full
+                if is_dn and auto_blip: out[throttle_axis] = full
+                if is_up and auto_lift: out[throttle_axis] = lifted
+        return stage
@@ -0,0 +1,185 @@
+"""
+Typed view of a profile. parse_profile() turns the JSON-style config dict (which the UI edits)
+into __slots__ objects with every value already converted, so compiled stages and the loop never
+parse strings. A field that can't be used is reported as ("section.field", message) and replaced
+by its default; the rest of the profile still loads.
+"""
+import math
+
+from axis_filters import FILTERS
+from telemetry import AXIS_ORDER
+
+XINPUT_MASKS = {
+    "A": 0x1000, "B": 0x2000, "X": 0x4000, "Y": 0x8000,
+    "LB": 0x0100, "RB": 0x0200, "Back": 0x0020, "Start": 0x0010,
+    "LS_Click": 0x0040, "RS_Click": 0x0080,
+    "DPad_Up": 0x0001, "DPad_Down": 0x0002, "DPad_Left": 0x0004, "DPad_Right": 0x0008
+}
+XINPUT_BUTTON_NAMES = tuple(XINPUT_MASKS)
+AXIS_TARGETS = tuple(AXIS_ORDER) + ("None",)
+
+# --- Field parsers: value -> converted value, or ValueError with a readable message ---
+def number(lo=None, hi=None, cast=float):
+    def parse(value):
+        if isinstance(value, bool): raise ValueError(f"expected a number, got {value!r}")
+        try: result = float(value)
+        except (TypeError, ValueError, OverflowError): raise ValueError(f"expected a number, got {value!r}")
+        if not math.isfinite(result): raise ValueError(f"expected a finite number, got {value!r}")
+        if cast is int:
+            if not result.is_integer(): raise ValueError(f"expected a whole number, got {value!r}")
+            result = int(result)
+        if (lo is not None and result < lo) or (hi is not None and result > hi):
+            raise ValueError(f"{value!r} is outside {lo}..{hi}")
+        return result
+    return parse
+
+def flag(value):
+    if isinstance(value, bool): return value
+    if value in (0, 1): return bool(value)
+    raise ValueError(f"expected true/false, got {value!r}")
+
+def text(value):
+    if not isinstance(value, str): raise ValueError(f"expected text, got {value!r}")
+    return value.strip()
+
+def button_list(value):
+    if not isinstance(value, (list, tuple)) or any(b not in XINPUT_BUTTON_NAMES for b in value):
+        raise ValueError(f"expected a list of XInput buttons, got {value!r}")
+    return tuple(value)
+
+def cpu_list(value):
+    if not isinstance(value, (list, tuple)) or any(isinstance(c, bool) or not isinstance(c, int) or c < 0 for c in value):
+        raise ValueError(f"expected a list of CPU numbers, got {value!r}")
+    return tuple(value)
+
+def choice(options):
+    def parse(value):
+        if value not in options: raise ValueError(f"{value!r} is not one of {', '.join(map(str, options))}")
+        return value
+    return parse
+
+class Section:
+    """Base for the typed sections. FIELDS is a list of (name, parser, default)."""
+    __slots__ = ()
+    FIELDS = ()
+
+    def __init__(self, data=None, path="", errors=None):
+        if errors is None: errors = []
+        if not isinstance(data, dict):
+            if data is not None: errors.append((path, f"expected an object, got {data!r}; using defaults"))
+            data = {}
+        for name, parse, default in self.FIELDS:
+            value = data.get(name, default)
+            try: value = parse(value)
+            except ValueError as e:
+                errors.append((f"{path}.{name}", f"{e}; using {default!r}"))
+                value = parse(default)
+            setattr(self, name, value)
+        self.check(path, errors)
+
+    def check(self, path, errors):
+        """Checks that span several fields. Report like a field error and reset() what can't be used."""
+
+    def reset(self, *names):
+        for name, parse, default in self.FIELDS:
+            if name in names: setattr(self, name, parse(default))
+
+    def __repr__(self): return f"{type(self).__name__}({', '.join(f'{n}={getattr(self, n)!r}' for n, _, _ in self.FIELDS)})"
+
+class GlobalSettings(Section):
+    __slots__ = ("update_rate", "use_lut", "output_mode", "scheduler_mode", "spin_window_us", "adaptive_polling",
+                 "idle_rate", "idle_after_ms", "instrument_latency", "profile_cache", "high_priority", "cpu_affinity")
+    FIELDS = [("update_rate", number(1, 20000, int), 1000), ("use_lut", flag, False),
+              ("output_mode", choice(("per_call", "batched")), "per_call"),
+              ("scheduler_mode", choice(("sleep", "deadline", "hybrid", "busy")), "hybrid"),
+              ("spin_window_us", number(0, 100000, int), 2000), ("adaptive_polling", flag, False),
+              ("idle_rate", number(1, 20000, int), 125), ("idle_after_ms", number(0, None, int), 100),
+              ("instrument_latency", flag, False), ("profile_cache", flag, False),
+              ("high_priority", flag, False), ("cpu_affinity", cpu_list, [])]
+
+# Smoothing, shared by sticks and triggers (see axis_filters)
+FILTER_FIELDS = [("filter", choice(FILTERS), "none"), ("filter_cutoff", number(0.01, 1000.0), 5.0),
+                 ("filter_beta", number(0.0, 1000.0), 1.0), ("filter_size", number(3, 15, int), 5)]
+
+class Axis(Section):
+    """Stick/trigger base: the deadzones must leave some travel between them."""
+    __slots__ = ()
+
+    def check(self, path, errors):
+        if self.dz_in + self.dz_out >= 1.0:
+            errors.append((f"{path}.dz_out", f"dz_in + dz_out is {self.dz_in + self.dz_out:g}, must be below 1; using defaults"))
+            self.reset("dz_in", "dz_out")
+
+class StickAxis(Axis):
+    __slots__ = ("target", "dz_in", "dz_out", "anti_dz", "lin", "inv", "square", "filter", "filter_cutoff", "filter_beta", "filter_size")
+    FIELDS = [("target", choice(AXIS_TARGETS), "None"), ("dz_in", number(0.0, 1.0), 0.0), ("dz_out", number(0.0, 1.0), 0.0),
+              ("anti_dz", number(0.0, 1.0), 0.0), ("lin", number(-100.0, 100.0), 0.0), ("inv", flag, False), ("square", flag, False)] + FILTER_FIELDS
+
+    @property
+    def args(self): return (self.dz_in, self.dz_out, self.anti_dz, self.lin, self.inv)
+
+class TriggerAxis(Axis):
+    __slots__ = ("target", "dz_in", "dz_out", "start", "end", "lin", "filter", "filter_cutoff", "filter_beta", "filter_size")
+    FIELDS = [("target", choice(AXIS_TARGETS), "None"), ("dz_in", number(0.0, 1.0), 0.0), ("dz_out", number(0.0, 1.0), 0.0),
+              ("start", number(-1.0, 1.0), -1.0), ("end", number(-1.0, 1.0), 1.0), ("lin", number(-100.0, 100.0), 0.0)] + FILTER_FIELDS
+
+    @property
+    def args(self): return (self.dz_in, self.dz_out, self.start, self.end, self.lin)
+
+class Winding(Section):
+    __slots__ = ("enabled_for", "target_axis", "range", "buffer", "unwind")
+    FIELDS = [("enabled_for", choice(("Disabled", "Left Stick", "Right Stick")), "Disabled"), ("target_axis", choice(AXIS_TARGETS), "X"),
+              ("range", number(1.0, None), 900.0), ("buffer", number(), 45.0), ("unwind", number(), 1800.0)]
+
+class RangeModifier(Section):
+    __slots__ = ("enabled", "modifier_key", "mute_key", "modified_axis", "press_mult", "release_mult")
+    FIELDS = [("enabled", flag, False), ("modifier_key", choice(XINPUT_BUTTON_NAMES), "X"), ("mute_key", flag, False),
+              ("modified_axis", choice(AXIS_TARGETS), "X"), ("press_mult", number(), 1.0), ("release_mult", number(), 0.5)]
+
+class AutoClutch(Section):
+    __slots__ = ("enabled", "upshift_btn", "downshift_btn", "throttle_axis", "clutch_axis", "auto_blip", "auto_lift")
+    FIELDS = [("enabled", flag, False), ("upshift_btn", choice(XINPUT_BUTTON_NAMES), "RB"), ("downshift_btn", choice(XINPUT_BUTTON_NAMES), "LB"),
+              ("throttle_axis", choice(AXIS_TARGETS), "RZ"), ("clutch_axis", choice(AXIS_TARGETS), "RY"),
+              ("auto_blip", flag, False), ("auto_lift", flag, False)]
+
+class Switching(Section):
+    """How to switch to this profile while mapping: a global hotkey ("ctrl+alt+1") and/or a pad button combo."""
+    __slots__ = ("hotkey", "combo")
+    FIELDS = [("hotkey", text, ""), ("combo", button_list, [])]
+
+# "scripts" section key -> Section class; mapping_scripts.register_script() adds plugin scripts' sections
+SCRIPT_SECTIONS = {"winding_steering": Winding, "range_modifier": RangeModifier, "auto_clutch": AutoClutch}
+
+class Profile:
+    """
+    The whole profile, typed. scripts is {section key: parsed section} for every registered script
+    (winding, range_modifier and auto_clutch are the built-in ones). buttons is [(xinput name, vJoy button id), ...]
+    for mapped buttons only.
+    """
+    __slots__ = ("global_settings", "axes", "scripts", "winding", "range_modifier", "auto_clutch", "switching", "buttons", "errors")
+
+    def __init__(self, config):
+        errors = self.errors = []
+        self.global_settings = GlobalSettings(config.get("global_settings"), "global_settings", errors)
+        axes = config.get("axes") if isinstance(config.get("axes"), dict) else {}
+        self.axes = {}
+        for name in ("LX", "LY", "RX", "RY"): self.axes[name] = StickAxis(axes.get(name), f"axes.{name}", errors)
+        for name in ("LT", "RT"): self.axes[name] = TriggerAxis(axes.get(name), f"axes.{name}", errors)
+        scripts = config.get("scripts") if isinstance(config.get("scripts"), dict) else {}
+        self.scripts = {key: section(scripts.get(key), f"scripts.{key}", errors) for key, section in SCRIPT_SECTIONS.items()}
+        self.winding = self.scripts["winding_steering"]
+        self.range_modifier = self.scripts["range_modifier"]
+        self.auto_clutch = self.scripts["auto_clutch"]
+        self.switching = Switching(config.get("switching"), "switching", errors)
+        self.buttons = []
+        buttons = config.get("buttons") if isinstance(config.get("buttons"), dict) else {}
+        parse_button = number(1, 128, int)
+        for name, vjoy_btn_id in buttons.items():
+            if name not in XINPUT_BUTTON_NAMES: errors.append((f"buttons.{name}", "unknown XInput button; ignored")); continue
+            if vjoy_btn_id == "None": continue
+            try: self.buttons.append((name, parse_button(vjoy_btn_id)))
+            except ValueError as e: errors.append((f"buttons.{name}", f"vJoy button {e}; not mapped"))
+
+def parse_profile(config):
+    """Profile for a config dict. Problems are listed in profile.errors as (field path, message)."""
+    return Profile(config if isinstance(config, dict) else {})
@@ -0,0 +1,232 @@
+"""
+Offline profile simulator: runs a whole input grid or a recorded trace through a profile's axis
+mapping in one vectorized NumPy pass (numpy is optional; only this module needs it).
+
+    python profile_sim.py [--profile mapping_profile.json] [--trace session.xtrace]
+
+Results match the scalar engine exactly:
+- Axes that only depend on their own raw value gather from a table built with the engine's own
+  scalar functions.
+- Square-mode sticks (which depend on both axes) run squarify/deadzone/linearity with the same
+  float operations in the same order. np.sin/np.cos are only used if they agree bit-for-bit with
+  math.sin/math.cos on this machine; otherwise those two go through math.
+The winding script is stateful and is not simulated (its target axis keeps the stick/trigger output).
+tests/test_profile_sim.py checks random profiles against the scalar engine with parity_mismatches().
+"""
+import argparse
+import copy
+import math
+import sys
+import time
+from array import array
+
+try: import numpy as np
+except ImportError: np = None
+
+from mapping_engine import MappingEngine, XINPUT_MASKS, DEFAULT_PROFILE
+from profile_schema import parse_profile
+from vjoy_output import FakeVJoyDevice
+
+# Same layout as input_trace.RECORD (<qIHBBhhhh), so a trace maps straight onto an array
+TRACE_DTYPE = [("t_ns", "<i8"), ("packet", "<u4"), ("buttons", "<u2"), ("lt", "u1"), ("rt", "u1"),
+               ("lx", "<i2"), ("ly", "<i2"), ("rx", "<i2"), ("ry", "<i2")]
+STICK_FIELDS = {"LX": "lx", "LY": "ly", "RX": "rx", "RY": "ry", "LT": "lt", "RT": "rt"}
+
+def require_numpy():
+    if np is None: raise RuntimeError("The profile simulator needs numpy (pip install numpy)")
+
+_trig_exact = None
+def _trig_is_exact():
+    """Whether np.sin/np.cos return exactly what math.sin/math.cos do here (SIMD builds may differ by an ulp)."""
+    global _trig_exact
+    if _trig_exact is None:
+        probe = np.linspace(0.0, math.pi / 2, 100003)
+        _trig_exact = all(np.array_equal(npf(probe), np.array([mf(v) for v in probe.tolist()]))
+                          for npf, mf in ((np.sin, math.sin), (np.cos, math.cos)))
+    return _trig_exact
+
+def _trig(np_func, math_func, values):
+    if _trig_is_exact(): return np_func(values)
+    return np.fromiter(map(math_func, values.tolist()), dtype=np.float64, count=len(values))
+
+# --- Inputs ---
+def inputs_from_trace(trace):
+    """Field arrays (lx, ly, rx, ry, lt, rt, buttons, ...) over a TraceReader, without copying the file."""
+    require_numpy()
+    from input_trace import HEADER
+    records = np.frombuffer(trace._map, dtype=np.dtype(TRACE_DTYPE), count=len(trace), offset=HEADER.size)
+    return {name: records[name] for name, _ in TRACE_DTYPE}
+
+def inputs_from_samples(samples):
+    """Field arrays from ReplaySource-style tuples: (t, packet, buttons, lt, rt, lx, ly, rx, ry)."""
+    require_numpy()
+    columns = np.array(samples, dtype=np.float64).reshape(-1, 9).T
+    names = ("t", "packet", "buttons", "lt", "rt", "lx", "ly", "rx", "ry")
+    return {name: (col if name == "t" else col.astype(np.int64)) for name, col in zip(names, columns)}
+
+def stick_grid(step=1, buttons=0):
+    """Every raw stick value (step apart) on both sticks, as a 2D grid flattened (x varies fastest), triggers swept 0-255."""
+    require_numpy()
+    axis = np.arange(-32768, 32768, step, dtype=np.int64)
+    gx, gy = np.meshgrid(axis, axis)
+    gx, gy = gx.ravel(), gy.ravel()
+    trig = (np.arange(gx.size, dtype=np.int64) % 256)
+    return {"lx": gx, "ly": gy, "rx": gx, "ry": gy, "lt": trig, "rt": trig, "buttons": np.full(gx.size, buttons, dtype=np.int64)}
+
+# --- Simulator ---
+class ProfileSimulator:
+    """Evaluates a profile's axis mapping over arrays of raw inputs. Tables are cached between runs."""
+    def __init__(self, engine=None):
+        require_numpy()
+        if engine is None: engine = MappingEngine(vjoy_device=FakeVJoyDevice(), profile_path="")
+        self.engine = engine
+        self._tables = {}
+
+    def _table(self, kind, args):
+        key = (kind, args)
+        table = self._tables.get(key)
+        if table is None:
+            if kind == "stick":
+                dz = self.engine.apply_deadzone_stick
+                values = array("d", [dz(raw / 32768.0, *args) for raw in range(-32768, 32768)])
+            else:
+                dz = self.engine.apply_deadzone_trigger
+                values = array("d", [dz(raw / 255.0, *args) for raw in range(256)])
+            table = self._tables[key] = np.frombuffer(values, dtype=np.float64)
+        return table
+
+    # Vectorized twins of the MappingEngine methods (same operations, same order)
+    @staticmethod
+    def linearity(norm, linearity):
+        if linearity == 0: return norm
+        if linearity > 0: curved = _trig(np.sin, math.sin, norm * (math.pi / 2))
+        else: curved = 1.0 - _trig(np.cos, math.cos, norm * (math.pi / 2))
+        strength = abs(linearity) / 100.0
+        return (norm * (1.0 - strength)) + (curved * strength)
+
+    def deadzone_stick(self, values, dz_in, dz_out, anti_dz, linearity, invert=False):
+        val_abs = np.abs(values)
+        dead = val_abs < dz_in
+        full = val_abs > (1.0 - dz_out)
+        span = (1.0 - dz_out) - dz_in
+        if span == 0 and not (dead | full).all(): raise ZeroDivisionError("float division by zero") # As the scalar engine does
+        with np.errstate(divide="ignore", invalid="ignore"): norm = np.where(full, 1.0, (val_abs - dz_in) / span)
+        norm = self.linearity(norm, linearity)
+        norm = np.where(norm > 0, anti_dz + (norm * (1.0 - anti_dz)), norm)
+        result = np.where(dead, 0.0, norm * np.where(values >= 0, 1.0, -1.0))
+        return -result if invert else result
+
+    @staticmethod
+    def squarify(raw_x, raw_y):
+        nx, ny = raw_x / 32768.0, raw_y / 32768.0
+        mag = np.sqrt(nx * nx + ny * ny)
+        max_c = np.maximum(np.abs(nx), np.abs(ny))
+        scaled = (mag >= 0.01) & (max_c >= 0.001)
+        with np.errstate(divide="ignore", invalid="ignore"): scale = mag / max_c
+        return np.where(scaled, np.clip(nx * scale, -1.0, 1.0), nx), np.where(scaled, np.clip(ny * scale, -1.0, 1.0), ny)
+
+    def run(self, config, inputs):
+        """
+        Returns {vJoy axis: float64 array (-1.0..1.0)} for every sample, in the engine's stage order:
+        sticks, triggers, range modifier, auto clutch. Axes no stage writes are absent; NaN marks
+        samples where an axis only written by auto clutch wasn't written. Axis smoothing filters are
+        not simulated (they depend on tick timing); axes are shown unfiltered.
+        """
+        profile = parse_profile(config)
+        axes = profile.axes
+        out = {}
+        for name_x, name_y in (("LX", "LY"), ("RX", "RY")):
+            conf_x, conf_y = axes[name_x], axes[name_y]
+            if conf_x.target == "None" and conf_y.target == "None": continue
+            if conf_x.square: squared = self.squarify(inputs[STICK_FIELDS[name_x]], inputs[STICK_FIELDS[name_y]])
+            for conf, index, field in ((conf_x, 0, STICK_FIELDS[name_x]), (conf_y, 1, STICK_FIELDS[name_y])):
+                if conf.target == "None": continue
+                if conf_x.square: out[conf.target] = self.deadzone_stick(squared[index], *conf.args)
+                else: out[conf.target] = self._table("stick", conf.args)[np.asarray(inputs[field], dtype=np.int64) + 32768]
+        for name in ("LT", "RT"):
+            conf = axes[name]
+            if conf.target == "None": continue
+            out[conf.target] = self._table("trigger", conf.args)[np.asarray(inputs[STICK_FIELDS[name]], dtype=np.int64)]
+
+        buttons = np.asarray(inputs["buttons"], dtype=np.int64)
+        range_mod = self.engine._parse_range_modifier(profile.range_modifier)
+        if range_mod and range_mod[0] in out:
+            target, mask, press_mult, release_mult = range_mod
+            mult = np.where((buttons & mask) != 0, press_mult, release_mult)
+            out[target] = np.clip(out[target] * mult, -1.0, 1.0)
+
+        ac = profile.auto_clutch
+        if ac.enabled:
+            is_up = (buttons & XINPUT_MASKS[ac.upshift_btn]) != 0
+            is_dn = (buttons & XINPUT_MASKS[ac.downshift_btn]) != 0
+            shifting = is_up | is_dn
+            n = len(buttons)
+            if shifting.any(): out[ac.clutch_axis] = np.where(shifting, 1.0, out.get(ac.clutch_axis, np.full(n, np.nan)))
+            if ac.auto_blip and is_dn.any(): out[ac.throttle_axis] = np.where(is_dn, 1.0, out.get(ac.throttle_axis, np.full(n, np.nan)))
+            if ac.auto_lift and is_up.any(): out[ac.throttle_axis] = np.where(is_up, -1.0, out.get(ac.throttle_axis, np.full(n, np.nan)))
+        out.pop("None", None) # Auto clutch pointed at no axis
+        return out
+
+def to_vjoy(values):
+    """Vectorized float_to_vjoy (NaN, i.e. "not written", becomes 0)."""
+    vj = np.trunc((np.clip(values, -1.0, 1.0) + 1.0) * 16383.5 + 1)
+    return np.where(np.isnan(values), 0, vj).astype(np.int32)
+
+def summarize(outputs):
+    """Per-axis stats: range, mean, share of samples in the deadzone (0.0) / saturated, distinct vJoy values."""
+    stats = {}
+    for axis, values in outputs.items():
+        written = values[~np.isnan(values)]
+        if not written.size: continue
+        stats[axis] = {"min": float(written.min()), "max": float(written.max()), "mean": float(written.mean()),
+                       "dead_fraction": float(np.count_nonzero(written == 0.0) / written.size),
+                       "saturated_fraction": float(np.count_nonzero(np.abs(written) >= 1.0) / written.size),
+                       "distinct_vjoy_values": int(np.unique(to_vjoy(written)).size)}
+    return stats
+
+# --- Parity with the scalar engine ---
+def parity_mismatches(simulator, config, inputs, indices):
+    """Runs the samples at `indices` through the engine's analytic stages. Returns [(index, axis, scalar, vectorized), ...]."""
+    from input_sources import GamepadSnapshot
+    config = copy.deepcopy(config) # The caller's config stays as it was
+    config["global_settings"]["use_lut"] = False
+    stages = simulator.engine.compile_profile("parity", config).stages
+    vectorized = simulator.run(config, inputs)
+    mismatches = []
+    snap = GamepadSnapshot()
+    for i in indices:
+        snap.buttons, snap.lt, snap.rt = int(inputs["buttons"][i]), int(inputs["lt"][i]), int(inputs["rt"][i])
+        snap.lx, snap.ly, snap.rx, snap.ry = int(inputs["lx"][i]), int(inputs["ly"][i]), int(inputs["rx"][i]), int(inputs["ry"][i])
+        out = {}
+        for stage in stages: stage(snap, out, 0.001)
+        for axis, sim in vectorized.items():
+            value = out.get(axis)
+            if value is None: ok = math.isnan(sim[i])
+            else: ok = sim[i] == value
+            if not ok: mismatches.append((i, axis, value, float(sim[i])))
+        mismatches += [(i, axis, value, None) for axis, value in out.items() if axis not in vectorized and axis != "None"]
+    return mismatches
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate a profile's axis mapping offline.")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE)
+    parser.add_argument("--trace", default=None, help="Recorded .xtrace to evaluate (default: the full stick grid)")
+    parser.add_argument("--step", type=int, default=16, help="Grid spacing in raw units (default: %(default)s)")
+    args = parser.parse_args(argv)
+    require_numpy()
+    sim = ProfileSimulator(MappingEngine(vjoy_device=FakeVJoyDevice(), profile_path=args.profile))
+    if args.trace:
+        from input_trace import TraceReader
+        inputs = inputs_from_trace(TraceReader(args.trace))
+    else: inputs = stick_grid(args.step)
+    sim.run(sim.engine.config, inputs) # Builds the tables
+    start = time.perf_counter()
+    outputs = sim.run(sim.engine.config, inputs)
+    elapsed = time.perf_counter() - start
+    print(f"{len(inputs['lx'])} samples in {elapsed * 1000:.1f} ms")
+    for axis, st in summarize(outputs).items():
+        print(f"  {axis:<4} [{st['min']:+.3f}, {st['max']:+.3f}] mean {st['mean']:+.3f}  dead {st['dead_fraction']:.1%}  saturated {st['saturated_fraction']:.1%}  {st['distinct_vjoy_values']} vJoy steps")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+Profile persistence off the UI thread. save() takes a snapshot and returns at once; a background writer
+coalesces saves to the same file (the last snapshot wins) and writes each one atomically:
+temp file in the same folder -> fsync -> os.replace, so a crash leaves either the old or the new profile.
+
+The optional compiled cache (<profile>.cache) holds the merged config and the LUT tables built for it,
+marshalled and zlib-compressed. It is only used while the profile file's bytes hash to what the cache
+was built from, and while the curve code fingerprint matches.
+"""
+import atexit
+import copy
+import hashlib
+import json
+import marshal
+import os
+import tempfile
+import threading
+import time
+import zlib
+from array import array
+
+SAVE_DELAY = 0.5 # Seconds a save waits for more edits before it is written
+SAVE_MAX_DELAY = 2.0 # ...but a file that keeps changing is still written at least this often
+CACHE_FORMAT = 1
+
+def serialize(config): return json.dumps(config, indent=4).encode("utf-8")
+
+def source_hash(data): return hashlib.sha1(data).hexdigest()
+
+def cache_path(path): return path + ".cache"
+
+def write_atomic(path, data):
+    """Replaces path with data; readers (and a crash) see the old file or the new one, never a partial write."""
+    folder = os.path.dirname(os.path.abspath(path))
+    try: mode = os.stat(path).st_mode & 0o777
+    except OSError: mode = 0o644
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=folder)
+    try:
+        os.chmod(tmp, mode) # mkstemp makes the file private; keep the profile's usual permissions
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try: os.remove(tmp)
+        except OSError: pass
+        raise
+    if hasattr(os, "O_DIRECTORY"): # Make the rename itself durable (POSIX)
+        try:
+            dir_fd = os.open(folder, os.O_RDONLY | os.O_DIRECTORY)
+            try: os.fsync(dir_fd)
+            finally: os.close(dir_fd)
+        except OSError: pass
+
+def pack_cache(config, luts, fingerprint):
+    """Cache file bytes for a merged config and its LUTs ({key: array('H')})."""
+    payload = {"format": CACHE_FORMAT, "fingerprint": fingerprint, "source": source_hash(serialize(config)),
+               "config": config, "luts": [(key, lut.tobytes()) for key, lut in luts.items()]}
+    return zlib.compress(marshal.dumps(payload), 1)
+
+def read_cache(path, source_bytes, fingerprint):
+    """(config, {key: array('H')}) from path's cache if it was built from exactly source_bytes, else None."""
+    try:
+        with open(cache_path(path), "rb") as f: payload = marshal.loads(zlib.decompress(f.read()))
+    except (OSError, ValueError, EOFError, TypeError, zlib.error): return None
+    if not isinstance(payload, dict) or payload.get("format") != CACHE_FORMAT or payload.get("fingerprint") != fingerprint: return None
+    if payload.get("source") != source_hash(source_bytes): return None
+    luts = {}
+    for key, data in payload.get("luts", ()):
+        lut = array("H")
+        lut.frombytes(data)
+        luts[key] = lut
+    return payload["config"], luts
+
+class ProfileWriter:
+    """
+    Background, debounced profile writer. Jobs are keyed by file path; a newer job for the same path
+    replaces the pending one. flush() writes everything pending now (it also runs at interpreter exit).
+    """
+    def __init__(self, delay=SAVE_DELAY):
+        self.delay = delay
+        self._pending = {} # path -> (due time, job, first queued)
+        self._lock = threading.Lock() # Guards _pending
+        self._io_lock = threading.Lock() # One writer at a time, so an older snapshot never lands after a newer one
+        self._wake = threading.Event()
+        self._thread = None
+        atexit.register(self.flush)
+
+    def save(self, path, config):
+        """Queues config (snapshotted now) to be written to path as JSON."""
+        snapshot = copy.deepcopy(config)
+        self._queue(path, lambda: self._write_profile(path, snapshot))
+
+    def save_cache(self, path, config, luts, fingerprint):
+        """Queues the compiled cache for the profile at path (config is snapshotted now; LUTs never change once built)."""
+        snapshot = copy.deepcopy(config)
+        luts = dict(luts)
+        self._queue(cache_path(path), lambda: write_atomic(cache_path(path), pack_cache(snapshot, luts, fingerprint)))
+
+    def remove_cache(self, path):
+        """Queues deleting path's cache (replacing a pending cache write)."""
+        target = cache_path(path)
+        if os.path.exists(target) or target in self._pending: self._queue(target, lambda: self._remove(target))
+
+    def _queue(self, target, job):
+        now = time.monotonic()
+        with self._lock:
+            first = self._pending[target][2] if target in self._pending else now
+            self._pending[target] = (min(now + self.delay, first + SAVE_MAX_DELAY), job, first)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    @staticmethod
+    def _write_profile(path, config):
+        write_atomic(path, serialize(config))
+        print("Configuration Saved.")
+
+    @staticmethod
+    def _remove(target):
+        if os.path.exists(target): os.remove(target)
+
+    def _take(self, due_before):
+        with self._lock:
+            ready = [(target, job) for target, (due, job, _) in self._pending.items() if due <= due_before]
+            for target, _ in ready: del self._pending[target]
+            next_due = min((due for due, _, _ in self._pending.values()), default=None)
+        return ready, next_due
+
+    def _do(self, jobs):
+        for target, job in jobs:
+            try: job()
+            except OSError as e: print(f"Profile Error: Could not save {target}: {e}")
+
+    def _run(self):
+        while True:
+            self._wake.clear() # Before taking, so a save queued meanwhile still wakes the next wait
+            with self._io_lock:
+                ready, next_due = self._take(time.monotonic())
+                self._do(ready)
+            if next_due is None: self._wake.wait()
+            else: self._wake.wait(max(0.0, next_due - time.monotonic()))
+
+    def flush(self):
+        """Writes every pending save now, on the calling thread."""
+        with self._io_lock:
+            ready, _ = self._take(float("inf"))
+            self._do(ready)
+
+# Shared by every engine, so two bindings saving the same file go through one queue
+WRITER = ProfileWriter()
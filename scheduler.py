@@ -0,0 +1,94 @@
+import time
+from array import array
+
+SCHEDULER_MODES = ["sleep", "deadline", "hybrid", "busy"]
+
+class LoopScheduler:
+    """
+    Paces a fixed-rate loop. Call start() once, then wait() at the end of every tick.
+
+    Modes:
+      sleep    - legacy: sleep(period - time spent in the tick). Drift accumulates.
+      deadline - sleep until an absolute deadline that advances by one period per tick.
+      hybrid   - like deadline, but sleeps only until spin_window before the deadline and busy-waits the rest.
+      busy     - busy-waits the whole period (burns a core, lowest jitter).
+    """
+    def __init__(self, rate=1000, mode="hybrid", spin_window=0.002, history=4096):
+        self.mode = mode if mode in SCHEDULER_MODES else "hybrid"
+        self.spin_window = spin_window
+        self.period = 1.0 / rate
+        # Lateness of each wake-up vs. its deadline, in seconds (ring buffer)
+        self._lateness = array("d", bytes(8 * history))
+        self._history = history
+        self.reset_stats()
+
+    def configure(self, rate, mode, spin_window):
+        self.period = 1.0 / max(1, rate)
+        if mode in SCHEDULER_MODES and mode != self.mode:
+            self.mode = mode
+            self.reset_stats()
+        self.spin_window = max(0.0, spin_window)
+
+    def set_rate(self, rate):
+        """Changes the tick rate without resetting stats. Speeding up pulls the next deadline in."""
+        period = 1.0 / max(1, rate)
+        if period < self.period: self._deadline = min(self._deadline, self._tick_start + period)
+        self.period = period
+
+    def reset_stats(self):
+        self.ticks = 0
+        self.missed = 0
+        self._samples = 0
+        self._started = time.perf_counter()
+        self._tick_start = self._started
+        self._deadline = self._started + self.period
+
+    def start(self):
+        self.reset_stats()
+
+    def wait(self):
+        period = self.period
+        now = time.perf_counter()
+        mode = self.mode
+
+        if mode == "sleep":
+            deadline = self._tick_start + period
+            if deadline > now: time.sleep(deadline - now)
+        else:
+            deadline = self._deadline
+            if mode == "deadline":
+                if deadline > now: time.sleep(deadline - now)
+            elif mode == "hybrid":
+                sleep_for = deadline - now - self.spin_window
+                if sleep_for > 0: time.sleep(sleep_for)
+                while time.perf_counter() < deadline: pass
+            else:
+                while time.perf_counter() < deadline: pass
+
+        woke = time.perf_counter()
+        lateness = woke - deadline
+        self._lateness[self._samples % self._history] = lateness
+        self._samples += 1
+        self.ticks += 1
+        if lateness >= period:
+            # A whole slot was lost. Re-anchor instead of bursting to catch up.
+            self.missed += int(lateness / period)
+            self._deadline = woke + period
+        else: self._deadline = deadline + period
+        self._tick_start = woke
+
+    def stats(self):
+        """Achieved rate, wake-up jitter percentiles (microseconds) and missed deadlines."""
+        elapsed = time.perf_counter() - self._started
+        count = min(self._samples, self._history)
+        lateness = sorted(self._lateness[:count])
+        def pct(p): return lateness[min(count - 1, int(p / 100.0 * count))] * 1e6 if count else 0.0
+        return {
+            "mode": self.mode,
+            "target_hz": 1.0 / self.period,
+            "achieved_hz": self.ticks / elapsed if elapsed > 0 else 0.0,
+            "jitter_p50_us": pct(50), "jitter_p99_us": pct(99), "jitter_p999_us": pct(99.9),
+            "jitter_max_us": lateness[-1] * 1e6 if count else 0.0,
+            "missed": self.missed,
+            "ticks": self.ticks,
+        }
@@ -0,0 +1,97 @@
+from array import array
+
+AXIS_ORDER = ["X", "Y", "Z", "RX", "RY", "RZ", "SL0", "SL1"]
+AXIS_INDEX = {name: i for i, name in enumerate(AXIS_ORDER)}
+
+# Slot layout (int64 each): seq, t_ns, 8 axes (vJoy units, 0 = not written that tick), buttons 1-64, buttons 65-128
+SLOT_SEQ, SLOT_T, SLOT_AXES, SLOT_BTN_LO, SLOT_BTN_HI = 0, 1, 2, 10, 11
+SLOT_WIDTH = 12
+HEADER_WIDTH = 2 # latest seq, slot count
+
+# Enough slots for the viewer's whole history at the fastest rate Program Settings offers
+MAX_UPDATE_RATE = 2000 # Hz
+HISTORY_SECONDS = 5.0
+DEFAULT_SLOTS = int(MAX_UPDATE_RATE * HISTORY_SECONDS * 1.25) # Headroom for a loop running slightly fast
+
+class TelemetryRing:
+    """
+    Fixed-size ring of per-tick output samples backed by one flat int64 buffer.
+    One writer (the mapping loop); readers poll latest() / history() and never block it.
+
+    The writer fills a slot, then stamps the slot's seq, then publishes the seq in the header.
+    A reader trusts a slot only if its seq is the one it expected both before and after copying it,
+    so it works the same when the buffer is shared with another process.
+    """
+    def __init__(self, slots=DEFAULT_SLOTS, buffer=None):
+        size = HEADER_WIDTH + slots * SLOT_WIDTH
+        if buffer is None: self.data = array("q", bytes(8 * size))
+        else: self.data = memoryview(buffer).cast("q")[:size]
+        self.data[1] = slots
+        self.slots = slots
+        self.seq = self.data[0]
+
+    @staticmethod
+    def buffer_size(slots=DEFAULT_SLOTS): return 8 * (HEADER_WIDTH + slots * SLOT_WIDTH)
+
+    def release(self):
+        """Lets go of a shared buffer (shared memory can't be closed while views of it exist)."""
+        if isinstance(self.data, memoryview): self.data.release()
+
+    def write(self, t_ns, axes, buttons_lo, buttons_hi):
+        """axes: 8 vJoy values in AXIS_ORDER (an array('q') so it's copied without allocating)."""
+        seq = self.seq + 1
+        data = self.data
+        base = HEADER_WIDTH + (seq % self.slots) * SLOT_WIDTH
+        data[base + SLOT_SEQ] = 0 # Mark as being written
+        data[base + SLOT_T] = t_ns
+        data[base + SLOT_AXES:base + SLOT_BTN_LO] = axes
+        # Stored as signed int64; readers mask them back (see buttons_from_masks)
+        data[base + SLOT_BTN_LO] = buttons_lo - (1 << 64) if buttons_lo >> 63 else buttons_lo
+        data[base + SLOT_BTN_HI] = buttons_hi - (1 << 64) if buttons_hi >> 63 else buttons_hi
+        data[base + SLOT_SEQ] = seq
+        data[0] = seq
+        self.seq = seq
+
+    def _read_slot(self, seq):
+        data = self.data
+        base = HEADER_WIDTH + (seq % self.slots) * SLOT_WIDTH
+        if data[base + SLOT_SEQ] != seq: return None
+        sample = tuple(data[base:base + SLOT_WIDTH])
+        if data[base + SLOT_SEQ] != seq: return None # Overwritten while copying
+        return sample
+
+    def latest(self):
+        """Newest complete sample as a SLOT_WIDTH tuple, or None if nothing was written yet."""
+        for _ in range(3):
+            seq = self.data[0]
+            if seq == 0: return None
+            sample = self._read_slot(seq)
+            if sample is not None: return sample
+        return None
+
+    def history(self, axis_index, seconds, now_ns=None):
+        """[(t_ns, vjoy_value), ...] oldest first, for samples within the last `seconds` that wrote the axis."""
+        seq = self.data[0]
+        if seq == 0: return []
+        newest = self._read_slot(seq)
+        if newest is None: return []
+        cutoff = (now_ns if now_ns is not None else newest[SLOT_T]) - int(seconds * 1e9)
+        points = []
+        for s in range(seq, max(0, seq - self.slots + 1), -1):
+            sample = self._read_slot(s)
+            if sample is None or sample[SLOT_T] < cutoff: break
+            value = sample[SLOT_AXES + axis_index]
+            if value: points.append((sample[SLOT_T], value))
+        points.reverse()
+        return points
+
+def buttons_from_masks(buttons_lo, buttons_hi):
+    """Pressed vJoy button ids from the two 64-bit masks."""
+    pressed = []
+    for offset, mask in ((1, buttons_lo & 0xFFFFFFFFFFFFFFFF), (65, buttons_hi & 0xFFFFFFFFFFFFFFFF)):
+        bit = 0
+        while mask:
+            if mask & 1: pressed.append(offset + bit)
+            mask >>= 1
+            bit += 1
+    return pressed
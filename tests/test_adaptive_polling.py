@@ -0,0 +1,36 @@
+"""With adaptive_polling on, the loop drops to idle_rate while the pad is untouched and returns on new input."""
+
+import time
+
+from input_sources import SyntheticSource
+from mapping_engine import MappingEngine
+from mapping_loop import MappingLoop
+from vjoy_output import FakeVJoyDevice
+
+def run_loop(source, adaptive, seconds=0.6):
+    engine = MappingEngine(vjoy_device=FakeVJoyDevice())
+    engine.config = engine.get_default_config()
+    engine.config["global_settings"].update(update_rate=500, scheduler_mode="sleep", adaptive_polling=adaptive,
+                                            idle_rate=20, idle_after_ms=20)
+    loop = MappingLoop(source, engine)
+    loop.start()
+    time.sleep(seconds)
+    loop.stop()
+    return loop
+
+def test_untouched_pad_drops_to_idle_rate():
+    loop = run_loop(SyntheticSource(period=0.5, duty=0.2), adaptive=True)
+    stats = loop.stats()
+    assert stats["idle_seconds"] > 0.2
+    # ~0.1 s at 500 Hz active, the rest at 20 Hz
+    assert stats["ticks"] < 0.5 * 500 * 0.6
+
+def test_moving_pad_never_idles():
+    loop = run_loop(SyntheticSource(period=0.5, duty=1.0), adaptive=True)
+    assert loop.stats()["idle_seconds"] == 0.0
+
+def test_adaptive_off_keeps_full_rate():
+    loop = run_loop(SyntheticSource(period=0.5, duty=0.2), adaptive=False)
+    stats = loop.stats()
+    assert stats["idle_seconds"] == 0.0
+    assert stats["ticks"] > 0.5 * 500 * 0.6
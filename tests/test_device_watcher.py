@@ -0,0 +1,24 @@
+"""wait_for_added() returns on the first plug-in burst and drops nodes that vanish inside the settle window."""
+
+import time
+
+from device_watcher import ADDED, REMOVED, FakeDeviceWatcher, WmiDeviceWatcher
+
+def test_wait_for_added_collects_one_burst():
+    watcher = FakeDeviceWatcher([(0.05, ADDED, "HID\\PAD&COL01"), (0.02, ADDED, "HID\\PAD&COL02"),
+                                 (0.02, ADDED, "USB\\TRANSIENT"), (0.02, REMOVED, "USB\\TRANSIENT")]).start()
+    start = time.perf_counter()
+    added = watcher.wait_for_added(5.0, settle=0.2)
+    watcher.stop()
+    assert added == {"HID\\PAD&COL01", "HID\\PAD&COL02"}
+    assert time.perf_counter() - start < 1.0 # Done once the burst settled, not at the timeout
+
+def test_wait_for_added_times_out_empty():
+    watcher = FakeDeviceWatcher().start()
+    assert watcher.wait_for_added(0.1) == set()
+    watcher.stop()
+
+def test_wmi_query_is_scoped_to_controller_classes():
+    query = WmiDeviceWatcher.query("__InstanceCreationEvent")
+    assert query.startswith("SELECT * FROM __InstanceCreationEvent WITHIN 1 WHERE TargetInstance ISA 'Win32_PnPEntity'")
+    assert "TargetInstance.PNPClass = 'HIDClass'" in query and "XnaComposite" in query
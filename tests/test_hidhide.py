@@ -0,0 +1,61 @@
+"""HidHideHandler against hidhide_stub.py: only changes are sent, batched, in order, on the worker thread."""
+
+import json
+import os
+import sys
+from concurrent.futures import Future
+
+import pytest
+
+import hidhide_handler
+from hidhide_handler import HidHideHandler
+
+STUB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "hidhide_stub.py")
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    log = tmp_path / "stub.log"
+    monkeypatch.setenv("HIDHIDE_STUB_LOG", str(log))
+    cli = STUB
+    if os.name == "nt":
+        cli = str(tmp_path / "HidHideCLI.cmd")
+        with open(cli, "w") as f: f.write(f'@"{sys.executable}" "{STUB}" %*\n')
+    handler = HidHideHandler(cli)
+    def invocations():
+        if not log.exists(): return []
+        with open(log) as f: return [json.loads(line) for line in f]
+    handler.invocations = invocations
+    return handler
+
+def test_apply_sends_only_what_changed(stub):
+    assert stub.apply(["app.exe"], ["DEV\\A", "DEV\\B"], True)
+    assert stub.invocations() == [["--app-reg", "app.exe", "--dev-hide", "DEV\\A", "--dev-hide", "DEV\\B", "--cloak-on"]]
+    assert stub.plan(["app.exe"], ["DEV\\A", "DEV\\B"], True) == []
+    assert stub.apply(["app.exe"], ["DEV\\A", "DEV\\B"], True)
+    assert len(stub.invocations()) == 1 # Nothing to do, nothing run
+    assert stub.apply(["app.exe"], ["DEV\\B", "DEV\\C"], None)
+    assert stub.invocations()[-1] == ["--dev-unhide", "DEV\\A", "--dev-hide", "DEV\\C"]
+
+def test_failed_apply_resends_everything(stub, monkeypatch):
+    monkeypatch.setenv("HIDHIDE_STUB_EXIT", "1")
+    assert not stub.apply(["app.exe"], ["DEV\\A"], True)
+    monkeypatch.setenv("HIDHIDE_STUB_EXIT", "0")
+    assert stub.apply(["app.exe"], ["DEV\\A"], True)
+    assert stub.invocations()[0] == stub.invocations()[1]
+
+def test_batches_stay_under_command_limit(stub, monkeypatch):
+    monkeypatch.setattr(hidhide_handler, "MAX_COMMAND_CHARS", 200)
+    devices = [f"HID\\VID_045E&PID_{i:04X}" for i in range(20)]
+    assert stub.apply((), devices, None)
+    invocations = stub.invocations()
+    assert len(invocations) > 1
+    assert all(sum(len(arg) + 3 for arg in args) <= 200 for args in invocations)
+    # Split at command boundaries, order kept
+    assert [arg for args in invocations for arg in args] == [a for dev in sorted(devices) for a in ("--dev-hide", dev)]
+
+def test_async_returns_future_and_runs_in_order(stub):
+    first = stub.apply_async(["app.exe"], ["DEV\\A"], True)
+    second = stub.set_cloaking_async(False)
+    assert isinstance(first, Future) and isinstance(second, Future)
+    assert second.result(timeout=30) and first.result(timeout=30)
+    assert stub.invocations() == [["--app-reg", "app.exe", "--dev-hide", "DEV\\A", "--cloak-on"], ["--cloak-off"]]
@@ -0,0 +1,39 @@
+"""The loop process starts without the GUI module, runs the fake rig and reports status over the pipe."""
+
+import multiprocessing
+import os
+import sys
+import time
+
+from loop_process import LoopClient, start_without_main
+
+def report_main(conn): conn.send(os.path.basename(getattr(sys.modules["__main__"], "__file__", "")))
+
+def test_child_main_is_loop_process():
+    ctx = multiprocessing.get_context("spawn")
+    conn, child_conn = ctx.Pipe()
+    process = ctx.Process(target=report_main, args=(child_conn,))
+    start_without_main(process)
+    assert conn.poll(30) and conn.recv() == "loop_process.py"
+    process.join(10)
+    assert sys.modules["__main__"] is not sys.modules["loop_process"]
+
+def test_fake_rig_runs_and_stops():
+    client = LoopClient({"fake": True})
+    try:
+        assert client.wait_ready() is not None and client.vjoy_active
+        client.start(0)
+        deadline = time.monotonic() + 10.0
+        while not client.status.get("running") and time.monotonic() < deadline:
+            time.sleep(0.05)
+            client.pump()
+        assert client.status["running"] and client.running
+        client.stop()
+        deadline = time.monotonic() + 10.0
+        while client.status.get("running") and time.monotonic() < deadline:
+            time.sleep(0.05)
+            client.pump()
+        assert not client.status["running"]
+    finally:
+        client.close()
+    assert not client.alive
@@ -0,0 +1,11 @@
+"""The compiled kernel must return exactly what the Python code does (see mapping_kernel)."""
+import pytest
+
+from mapping_kernel import kernel, parity_mismatches
+
+if kernel is None: pytest.skip("_mapping_kernel isn't built (or REMAPPER_NO_KERNEL is set)", allow_module_level=True)
+
+@pytest.mark.parametrize("seed", range(3))
+def test_kernel_matches_python(seed):
+    mismatches = parity_mismatches(cases=20000, seed=seed)
+    assert not mismatches, mismatches[:5]
@@ -0,0 +1,31 @@
+"""Unusable profile values are reported and replaced by defaults; the engine never sees them."""
+
+import pytest
+
+from input_sources import GamepadSnapshot
+from mapping_engine import MappingEngine
+from profile_schema import parse_profile
+from vjoy_output import FakeVJoyDevice
+
+@pytest.mark.parametrize("value", [float("inf"), float("-inf"), float("nan"), "inf", "nan", 10 ** 400])
+def test_non_finite_numbers_fall_back(value):
+    profile = parse_profile({"scripts": {"winding_steering": {"range": value, "buffer": value, "unwind": value},
+                                         "range_modifier": {"press_mult": value}}})
+    assert (profile.winding.range, profile.winding.buffer, profile.winding.unwind) == (900.0, 45.0, 1800.0)
+    assert profile.range_modifier.press_mult == 1.0
+    assert [path for path, _ in profile.errors] == ["scripts.winding_steering.range", "scripts.winding_steering.buffer",
+                                                    "scripts.winding_steering.unwind", "scripts.range_modifier.press_mult"]
+
+@pytest.mark.parametrize("axis", ["LX", "RT"])
+def test_deadzones_covering_the_whole_travel_fall_back(axis):
+    profile = parse_profile({"axes": {axis: {"dz_in": 0.6, "dz_out": 0.4, "lin": 20}}})
+    assert (profile.axes[axis].dz_in, profile.axes[axis].dz_out, profile.axes[axis].lin) == (0.0, 0.0, 20.0)
+    assert [path for path, _ in profile.errors] == [f"axes.{axis}.dz_out"]
+
+def test_engine_ticks_with_degenerate_deadzones():
+    engine = MappingEngine(vjoy_device=FakeVJoyDevice())
+    engine.config = engine.get_default_config()
+    for conf in engine.config["axes"].values(): conf.update(dz_in=0.5, dz_out=0.5)
+    engine.refresh_pipeline()
+    engine.update_vjoy(GamepadSnapshot(1, 0, 255, 255, 16384, 16384, 16384, 16384), 0.001)
+    assert engine.vjoy_device.calls
@@ -0,0 +1,49 @@
+"""Property test: for random profiles and random inputs the vectorized simulator equals the scalar engine."""
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from profile_sim import ProfileSimulator, parity_mismatches
+
+SAMPLES = 20000
+CHECKED = 300
+EDGES = [-32768, -32767, -1, 0, 1, 32767]
+
+@pytest.fixture(scope="module")
+def simulator(): return ProfileSimulator()
+
+def random_config(rng, engine):
+    """A random profile (winding off)."""
+    config = engine.get_default_config()
+    for conf in config["axes"].values():
+        conf.update({"dz_in": rng.choice([0.0, rng.uniform(0, 0.3)]), "dz_out": rng.choice([0.0, rng.uniform(0, 0.3)]),
+                     "lin": rng.choice([0, rng.randint(-100, 100)]), "target": rng.choice(["X", "Y", "Z", "RX", "RY", "RZ", "SL0", "None"])})
+        if "anti_dz" in conf: conf.update({"anti_dz": rng.uniform(0, 0.3), "inv": rng.random() < 0.3, "square": rng.random() < 0.5})
+        else: conf.update({"start": rng.uniform(-1, 1), "end": rng.uniform(-1, 1)})
+    config["axes"]["LY"]["square"] = config["axes"]["LX"]["square"]
+    config["axes"]["RY"]["square"] = config["axes"]["RX"]["square"]
+    config["scripts"]["range_modifier"].update({"enabled": rng.random() < 0.5, "modified_axis": rng.choice(["X", "Y", "RZ"]),
+                                                "press_mult": rng.uniform(0, 2), "release_mult": rng.uniform(0, 2)})
+    config["scripts"]["auto_clutch"].update({"enabled": rng.random() < 0.5, "auto_blip": rng.random() < 0.5, "auto_lift": rng.random() < 0.5})
+    return config
+
+@pytest.mark.parametrize("seed", range(30))
+def test_simulator_matches_engine(simulator, seed):
+    rng, gen = random.Random(seed), np.random.default_rng(seed)
+    config = random_config(rng, simulator.engine)
+    edges = np.array(EDGES, dtype=np.int64)
+    inputs = {f: np.concatenate([edges, gen.integers(-32768, 32768, SAMPLES)]) for f in ("lx", "ly", "rx", "ry")}
+    inputs.update({f: gen.integers(0, 256, SAMPLES + len(edges)) for f in ("lt", "rt")})
+    inputs["buttons"] = gen.integers(0, 65536, SAMPLES + len(edges))
+    indices = list(range(len(edges))) + rng.sample(range(len(edges), SAMPLES + len(edges)), CHECKED)
+    mismatches = parity_mismatches(simulator, config, inputs, indices)
+    assert not mismatches, mismatches[:3]
+
+def test_parity_check_leaves_config_alone(simulator):
+    config = simulator.engine.get_default_config()
+    config["global_settings"]["use_lut"] = True
+    inputs = {f: np.zeros(4, dtype=np.int64) for f in ("lx", "ly", "rx", "ry", "lt", "rt", "buttons")}
+    assert parity_mismatches(simulator, config, inputs, range(4)) == []
+    assert config["global_settings"]["use_lut"] is True
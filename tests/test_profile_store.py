@@ -0,0 +1,62 @@
+"""ProfileWriter coalesces rapid saves into one atomic write; write_atomic never leaves a partial file."""
+
+import json
+import os
+import time
+from array import array
+
+import pytest
+
+import profile_store
+from profile_store import ProfileWriter, write_atomic, pack_cache, read_cache, serialize
+
+@pytest.fixture
+def writes(monkeypatch):
+    done = []
+    def recording_write(path, data):
+        write_atomic(path, data)
+        done.append((path, json.loads(data)))
+    monkeypatch.setattr(profile_store, "write_atomic", recording_write)
+    return done
+
+def test_rapid_saves_coalesce_into_one_write(tmp_path, writes):
+    path = str(tmp_path / "profile.json")
+    writer = ProfileWriter(delay=0.05)
+    config = {"value": 0}
+    for i in range(50):
+        config["value"] = i
+        writer.save(path, config)
+    config["value"] = "edited after the last save" # The saved snapshot was taken at save()
+    deadline = time.monotonic() + 5.0
+    while not writes and time.monotonic() < deadline: time.sleep(0.01)
+    time.sleep(0.2)
+    assert writes == [(path, {"value": 49})]
+    with open(path) as f: assert json.load(f) == {"value": 49}
+
+def test_flush_writes_pending_saves_now(tmp_path, writes):
+    writer = ProfileWriter(delay=60.0)
+    a, b = str(tmp_path / "a.json"), str(tmp_path / "b.json")
+    writer.save(a, {"name": "a"})
+    writer.save(b, {"name": "b"})
+    writer.flush()
+    assert sorted(writes) == [(a, {"name": "a"}), (b, {"name": "b"})]
+    writer.flush()
+    assert len(writes) == 2 # Nothing left pending
+
+def test_failed_write_keeps_old_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "profile.json")
+    write_atomic(path, b'{"old": true}')
+    def failing_replace(src, dst): raise OSError("disk full")
+    monkeypatch.setattr(os, "replace", failing_replace)
+    with pytest.raises(OSError): write_atomic(path, b'{"new": true}')
+    with open(path, "rb") as f: assert f.read() == b'{"old": true}'
+    assert os.listdir(tmp_path) == ["profile.json"] # The temp file was cleaned up
+
+def test_cache_only_matches_its_source(tmp_path):
+    path = str(tmp_path / "profile.json")
+    config = {"axes": {}}
+    luts = {("stick", 1): array("H", range(16))}
+    write_atomic(profile_store.cache_path(path), pack_cache(config, luts, "fp"))
+    assert read_cache(path, serialize(config), "fp") == (config, luts)
+    assert read_cache(path, serialize({"axes": {"LX": {}}}), "fp") is None # Profile edited by hand
+    assert read_cache(path, serialize(config), "other") is None # Curve code changed
@@ -0,0 +1,43 @@
+"""Batched output must submit a whole tick as one JOYSTICK_POSITION, laid out the way vJoy reads it."""
+from vjoy_output import AXIS_CENTER, BatchedOutput, FakeVJoyDevice, PerCallOutput, create_output
+
+def test_per_call_output_forwards_every_write():
+    device = FakeVJoyDevice()
+    output = create_output(device)
+    assert isinstance(output, PerCallOutput)
+    output.set_button(3, 1)
+    output.set_axis(0x30, 1234)
+    output.flush()
+    assert device.calls == [("button", 3, 1), ("axis", 0x30, 1234)]
+    assert device.submitted == [] and output.driver_calls == 2
+
+def test_batched_output_submits_one_struct_per_tick():
+    device = FakeVJoyDevice(rID=2)
+    output = create_output(device, "batched")
+    assert isinstance(output, BatchedOutput)
+    output.set_button(1, 1)
+    output.set_button(32, 1) # Sign bit of lButtons
+    output.set_button(33, 1) # First bit of lButtonsEx1
+    output.set_axis(0x30, 1)
+    output.set_axis(0x35, 32768)
+    output.flush()
+    assert device.calls == [] and output.driver_calls == 1
+    (position,) = device.submitted
+    assert position.bDevice == 2
+    assert position.lButtons == 1 - (1 << 31) and position.lButtonsEx1 == 1
+    assert (position.wAxisX, position.wAxisZRot) == (1, 32768)
+    assert position.wAxisY == position.wSlider == AXIS_CENTER # Unmapped axes stay centered
+
+def test_batched_output_keeps_state_and_skips_empty_ticks():
+    device = FakeVJoyDevice()
+    output = create_output(device, "batched")
+    output.set_button(5, 1)
+    output.set_axis(0x31, 100)
+    output.flush()
+    output.flush() # Nothing changed: no driver call
+    output.set_button(5, 0)
+    output.flush()
+    assert len(device.submitted) == 2 and output.driver_calls == 2
+    first, second = device.submitted
+    assert (first.lButtons, second.lButtons) == (1 << 4, 0)
+    assert second.wAxisY == 100 # Untouched outputs keep their last value
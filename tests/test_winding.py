@@ -0,0 +1,32 @@
+"""Winding steering must give the same output whatever rate the mapping loop runs at."""
+import os
+
+import pytest
+
+from input_trace import TraceReader
+from mapping_scripts import WindingStickLogic, winding_rate_check
+
+# Left stick sampled every 1 ms for 1.9 s: 1.5 turns right at full tilt, ease off, let go (unwinds),
+# a partial turn left, let go again
+TRACE = os.path.join(os.path.dirname(__file__), "data", "winding.xtrace")
+
+@pytest.fixture(scope="module")
+def samples():
+    trace = TraceReader(TRACE)
+    try: return [trace[i] for i in range(len(trace))]
+    finally: trace.close()
+
+def test_trace_winds_and_unwinds(samples):
+    logic = WindingStickLogic()
+    outputs = [logic.step(sample[5], sample[6], 0.001) for sample in samples]
+    assert max(outputs) > 0.5 and min(outputs) < -0.05
+    assert outputs[-1] == 0.0
+
+def test_same_output_at_250_and_2000_hz(samples):
+    # A pad reporting every 4 ms: both loops see every report, so the steering must match exactly
+    reports = [sample for sample in samples if round(sample[0] * 1000) % 4 == 0]
+    assert winding_rate_check(reports, rates=(250, 2000))[2000] == 0.0
+
+def test_fast_reports_differ_by_at_most_one_slow_tick(samples):
+    # Reports every 1 ms: the 250 Hz loop is up to 4 ms behind on the stick, under 4.5 degrees of a 900 degree wheel
+    assert winding_rate_check(samples, rates=(250, 2000))[2000] < 0.01
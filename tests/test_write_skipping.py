@@ -0,0 +1,42 @@
+"""Unchanged packets and unchanged outputs must not reach the vJoy driver, and the counters must say so."""
+
+from input_sources import GamepadSnapshot
+from mapping_engine import MappingEngine, XINPUT_MASKS, VJOY_AXES, float_to_vjoy
+from vjoy_output import FakeVJoyDevice
+
+def make_engine():
+    engine = MappingEngine(vjoy_device=FakeVJoyDevice())
+    engine.config = engine.get_default_config() # 14 buttons, 6 axes
+    return engine
+
+def snapshot(packet, lx=0, buttons=0): return GamepadSnapshot(packet, buttons, lx=lx)
+
+def test_first_tick_writes_everything():
+    engine = make_engine()
+    engine.update_vjoy(snapshot(1), 0.001)
+    assert len(engine.vjoy_device.calls) == 20
+    assert (engine.driver_calls_issued, engine.driver_calls_skipped) == (20, 0)
+
+def test_same_packet_skips_every_write():
+    engine = make_engine()
+    engine.update_vjoy(snapshot(1), 0.001)
+    engine.vjoy_device.calls.clear()
+    engine.update_vjoy(snapshot(1), 0.001)
+    assert engine.vjoy_device.calls == []
+    assert (engine.driver_calls_issued, engine.driver_calls_skipped) == (20, 20)
+
+def test_new_packet_writes_only_what_changed():
+    engine = make_engine()
+    engine.update_vjoy(snapshot(1), 0.001)
+    engine.vjoy_device.calls.clear()
+    engine.update_vjoy(snapshot(2, lx=16000, buttons=XINPUT_MASKS["A"]), 0.001)
+    assert sorted(engine.vjoy_device.calls) == [("axis", VJOY_AXES["X"], float_to_vjoy(16000 / 32768.0)), ("button", 1, 1)]
+    assert (engine.driver_calls_issued, engine.driver_calls_skipped) == (22, 18)
+
+def test_batched_mode_submits_once_per_tick_with_changes():
+    engine = make_engine()
+    engine.config["global_settings"]["output_mode"] = "batched"
+    for packet, lx in [(1, 0), (1, 0), (2, 16000), (3, 16000)]: engine.update_vjoy(snapshot(packet, lx=lx), 0.001)
+    device = engine.vjoy_device
+    assert device.calls == [] and len(device.submitted) == 2 # Packet 1, then the stick move; the rest changed nothing
+    assert device.submitted[-1].wAxisX == float_to_vjoy(16000 / 32768.0)
@@ -0,0 +1,45 @@
+"""XInputHandler against FakeXInputDLL: empty ports are probed with backoff, state buffers are reused."""
+
+from xinput_handler import XInputHandler, FakeXInputDLL, CONNECTED, DISCONNECTED
+
+class Clock:
+    def __init__(self): self.now = 0.0
+    def __call__(self): return self.now
+
+def make_handler():
+    dll, clock = FakeXInputDLL(), Clock()
+    return XInputHandler(dll, probe_min=0.125, probe_max=0.5, clock=clock), dll, clock
+
+def test_connected_port_reuses_its_buffer():
+    xi, dll, _ = make_handler()
+    dll.connect(0, buttons=0x1000)
+    first = xi.get_state(0)
+    assert first.Gamepad.wButtons == 0x1000
+    dll.connect(0, buttons=0x2000)
+    assert xi.get_state(0) is first and first.Gamepad.wButtons == 0x2000
+    assert xi.take_events() == [(CONNECTED, 0)]
+    assert dll.calls[0] == 2 and xi.probes == 1
+
+def test_empty_port_backoff_doubles_to_max():
+    xi, dll, clock = make_handler()
+    probed_at = []
+    for tick in range(128): # 2 s of 64 Hz scans (binary fractions, so the times are exact)
+        clock.now = tick / 64
+        calls = dll.calls[1]
+        assert xi.get_state(1) is None
+        if dll.calls[1] != calls: probed_at.append(clock.now)
+    assert probed_at == [0.0, 0.125, 0.375, 0.875, 1.375, 1.875] # Waits 0.125, 0.25, then capped at 0.5
+    assert xi.probes == len(probed_at) and xi.skipped == 128 - len(probed_at)
+
+def test_disconnect_reconnect_and_rescan():
+    xi, dll, clock = make_handler()
+    dll.connect(2)
+    assert xi.get_state(2) is not None
+    dll.disconnect(2)
+    assert xi.get_state(2) is None
+    dll.connect(2)
+    assert xi.get_state(2) is None # Still backing off
+    xi.rescan()
+    assert xi.get_state(2) is not None
+    assert xi.take_events() == [(CONNECTED, 2), (DISCONNECTED, 2), (CONNECTED, 2)]
+    assert xi.take_events() == []
@@ -0,0 +1,119 @@
+import ctypes
+
+# Fixed-width so the layout matches vJoy's LONG/DWORD on every platform
+BYTE, LONG, DWORD = ctypes.c_ubyte, ctypes.c_int32, ctypes.c_uint32
+
+# --- vJoy Structures ---
+class JOYSTICK_POSITION(ctypes.Structure):
+    """Same layout as vJoy's JOYSTICK_POSITION_V2 (what UpdateVJD takes)."""
+    _fields_ = [
+        ("bDevice", BYTE),
+        ("wThrottle", LONG), ("wRudder", LONG), ("wAileron", LONG),
+        ("wAxisX", LONG), ("wAxisY", LONG), ("wAxisZ", LONG),
+        ("wAxisXRot", LONG), ("wAxisYRot", LONG), ("wAxisZRot", LONG),
+        ("wSlider", LONG), ("wDial", LONG), ("wWheel", LONG),
+        ("wAxisVX", LONG), ("wAxisVY", LONG), ("wAxisVZ", LONG),
+        ("wAxisVBRX", LONG), ("wAxisVBRY", LONG), ("wAxisVBRZ", LONG),
+        ("lButtons", LONG),
+        ("bHats", DWORD), ("bHatsEx1", DWORD), ("bHatsEx2", DWORD), ("bHatsEx3", DWORD),
+        ("lButtonsEx1", LONG), ("lButtonsEx2", LONG), ("lButtonsEx3", LONG),
+    ]
+
+# HID usage -> JOYSTICK_POSITION field
+AXIS_FIELDS = {
+    0x30: "wAxisX", 0x31: "wAxisY", 0x32: "wAxisZ",
+    0x33: "wAxisXRot", 0x34: "wAxisYRot", 0x35: "wAxisZRot",
+    0x36: "wSlider", 0x37: "wDial",
+}
+BUTTON_FIELDS = ["lButtons", "lButtonsEx1", "lButtonsEx2", "lButtonsEx3"]
+AXIS_CENTER = 0x4000
+VJOY_MIN, VJOY_MAX = 1, 32768
+
+OUTPUT_MODES = ["per_call", "batched"]
+
+class PerCallOutput:
+    """One pyvjoy call (one driver round-trip) per changed button/axis."""
+    mode = "per_call"
+
+    def __init__(self, device):
+        self.device = device
+        self.driver_calls = 0
+
+    def set_button(self, button_id, state):
+        self.device.set_button(button_id, state)
+        self.driver_calls += 1
+
+    def set_axis(self, usage, value):
+        self.device.set_axis(usage, value)
+        self.driver_calls += 1
+
+    def flush(self): pass
+
+class BatchedOutput:
+    """
+    Collects a whole tick into one JOYSTICK_POSITION (buttons as bitmasks, axes as ints)
+    and submits it with a single device.update() call.
+    Uses the device's own position struct (pyvjoy's VJoyDevice.data) when it has one. All state lives
+    in that struct, so several engines mapping onto one device don't overwrite each other.
+    """
+    mode = "batched"
+
+    def __init__(self, device):
+        self.device = device
+        self.driver_calls = 0
+        self.position = getattr(device, "data", None)
+        if self.position is None:
+            self.position = device.data = JOYSTICK_POSITION()
+            self.position.bDevice = getattr(device, "rID", 1)
+        # Unset axes would otherwise be submitted as 0 (full negative)
+        for field in AXIS_FIELDS.values():
+            if getattr(self.position, field) == 0: setattr(self.position, field, AXIS_CENTER)
+        self._dirty = False
+
+    def set_button(self, button_id, state):
+        index, bit = divmod(button_id - 1, 32)
+        if not 0 <= index < 4: return
+        field = BUTTON_FIELDS[index]
+        word = getattr(self.position, field) & 0xFFFFFFFF
+        word = (word | (1 << bit)) if state else (word & ~(1 << bit))
+        # LONG fields are signed; button 32 lives in the sign bit
+        setattr(self.position, field, word - (1 << 32) if word & 0x80000000 else word)
+        self._dirty = True
+
+    def set_axis(self, usage, value):
+        field = AXIS_FIELDS.get(usage)
+        if field is None: return
+        setattr(self.position, field, value)
+        self._dirty = True
+
+    def flush(self):
+        if not self._dirty: return
+        self._dirty = False
+        self.device.update()
+        self.driver_calls += 1
+
+def create_output(device, mode="per_call"):
+    if mode == "batched": return BatchedOutput(device)
+    return PerCallOutput(device)
+
+class FakeVJoyDevice:
+    """Stand-in for pyvjoy.VJoyDevice that records everything instead of talking to the driver."""
+    def __init__(self, rID=1):
+        self.rID = rID
+        self.data = JOYSTICK_POSITION()
+        self.data.bDevice = rID
+        self.calls = []
+        self.submitted = []
+        self.record = True
+
+    def set_button(self, button_id, state):
+        if self.record: self.calls.append(("button", button_id, state))
+        return True
+
+    def set_axis(self, usage, value):
+        if self.record: self.calls.append(("axis", usage, value))
+        return True
+
+    def update(self):
+        if self.record: self.submitted.append(JOYSTICK_POSITION.from_buffer_copy(self.data))
+        return True
@@ -1,5 +1,10 @@
+import collections
 import ctypes
-from ctypes import windll, wintypes
+import time
+from ctypes import wintypes
+
+try: from ctypes import windll
+except ImportError: windll = None # Not on Windows (use another source from input_sources)
 
 # --- XInput Structures ---
 class XINPUT_GAMEPAD(ctypes.Structure):
@@ -26,7 +31,7 @@ dll_name = "None"
 # Try loading latest to oldest
 dll_list = ["xinput1_4", "xinput9_1_0", "xinput1_3"]
 
-for lib in dll_list:
+for lib in (dll_list if windll else []):
     try:
         xinput_dll = getattr(windll, lib)
         dll_name = lib
@@ -44,37 +49,75 @@ else:
 
 ERROR_SUCCESS = 0
 ERROR_DEVICE_NOT_CONNECTED = 1167
+XUSER_MAX_COUNT = 4
+
+# XInputGetState on an empty port is slow (milliseconds), so a port that isn't connected is only
+# re-probed after a backoff that doubles from PROBE_MIN up to PROBE_MAX seconds.
+PROBE_MIN = 0.1
+PROBE_MAX = 1.0
+CONNECTED, DISCONNECTED = "connected", "disconnected"
 
 class XInputHandler:
-    def __init__(self):
-        # We only print the connected message once per port to avoid spamming console
-        self._logged_connections = set()
+    """
+    XInputGetState with a preallocated state buffer per port and a per-port connection cache.
+    get_state() returns that port's buffer, which the next call for the same port overwrites (copy it to keep it).
+    Connection changes are queued on self.events as (CONNECTED or DISCONNECTED, port); take_events() drains them.
+    """
+    def __init__(self, dll=None, probe_min=PROBE_MIN, probe_max=PROBE_MAX, clock=time.perf_counter):
+        self.dll = dll if dll is not None else xinput_dll
+        self.probe_min, self.probe_max = probe_min, probe_max
+        self.clock = clock
+        self._states = [XINPUT_STATE() for _ in range(XUSER_MAX_COUNT)]
+        self._refs = [ctypes.byref(state) for state in self._states]
+        self.connected = [False] * XUSER_MAX_COUNT
+        self._next_probe = [0.0] * XUSER_MAX_COUNT # Clock time before which a disconnected port isn't probed
+        self._backoff = [0.0] * XUSER_MAX_COUNT
+        self.events = collections.deque(maxlen=64)
+        self.probes = 0 # XInputGetState calls made for ports that weren't connected
+        self.skipped = 0 # ...and calls the cache saved
 
     def get_state(self, user_index):
-        if not xinput_dll:
+        if not self.dll:
             return None
+        if not self.connected[user_index]:
+            if self.clock() < self._next_probe[user_index]: self.skipped += 1; return None
+            self.probes += 1
 
-        state = XINPUT_STATE()
-        result = xinput_dll.XInputGetState(user_index, ctypes.byref(state))
+        state = self._states[user_index]
+        result = self.dll.XInputGetState(user_index, self._refs[user_index])
         
         if result == ERROR_SUCCESS:
             # Debug logging (Only prints once when a device is first seen)
-            if user_index not in self._logged_connections:
+            if not self.connected[user_index]:
                 print(f"XInputHandler: Port {user_index} CONNECTED. (Packet: {state.dwPacketNumber})")
-                self._logged_connections.add(user_index)
+                self.connected[user_index] = True
+                self._backoff[user_index] = 0.0
+                self.events.append((CONNECTED, user_index))
             return state
-        
-        elif result == ERROR_DEVICE_NOT_CONNECTED:
-            # If device disconnects, remove from log so we notify if it reconnects
-            if user_index in self._logged_connections:
-                print(f"XInputHandler: Port {user_index} Disconnected.")
-                self._logged_connections.remove(user_index)
-            return None
-            
-        else:
-            # Some other weird error (e.g. 5 = Access Denied by HidHide)
+
+        if result != ERROR_DEVICE_NOT_CONNECTED:
+            # Some other weird error (e.g. 5 = Access Denied by HidHide); backed off like an empty port
             print(f"XInputHandler: Port {user_index} Error Code {result}")
-            return None
+        if self.connected[user_index]:
+            # If device disconnects, say so once so we notify if it reconnects
+            print(f"XInputHandler: Port {user_index} Disconnected.")
+            self.connected[user_index] = False
+            self.events.append((DISCONNECTED, user_index))
+        self._backoff[user_index] = min(max(self._backoff[user_index] * 2, self.probe_min), self.probe_max)
+        self._next_probe[user_index] = self.clock() + self._backoff[user_index]
+        return None
+
+    def rescan(self):
+        """Probes every disconnected port on its next get_state (e.g. after a device-added event)."""
+        for port in range(XUSER_MAX_COUNT):
+            self._next_probe[port] = 0.0
+            self._backoff[port] = 0.0
+
+    def take_events(self):
+        """Connection changes since the last call, oldest first."""
+        events = list(self.events)
+        self.events.clear()
+        return events
 
     def is_button_pressed(self, state):
         """
@@ -83,4 +126,32 @@ class XInputHandler:
         """
         if state is None:
             return False
-        return state.Gamepad.wButtons > 0
\ No newline at end of file
+        return state.Gamepad.wButtons > 0
+
+# --- Fake DLL ---
+class FakeXInputDLL:
+    """
+    Stand-in for the XInput DLL. Ports in self.pads are connected; a call for any other port costs
+    miss_cost seconds (like the real thing) and fails. self.calls counts calls per port.
+    """
+    def __init__(self, miss_cost=0.0):
+        self.pads = {} # port -> XINPUT_STATE
+        self.miss_cost = miss_cost
+        self.calls = [0] * XUSER_MAX_COUNT
+
+    def connect(self, port, buttons=0):
+        state = self.pads.setdefault(port, XINPUT_STATE())
+        state.dwPacketNumber += 1
+        state.Gamepad.wButtons = buttons
+        return state
+
+    def disconnect(self, port): self.pads.pop(port, None)
+
+    def XInputGetState(self, user_index, state_ref):
+        self.calls[user_index] += 1
+        pad = self.pads.get(user_index)
+        if pad is None:
+            if self.miss_cost: time.sleep(self.miss_cost)
+            return ERROR_DEVICE_NOT_CONNECTED
+        ctypes.pointer(state_ref._obj)[0] = pad
+        return ERROR_SUCCESS